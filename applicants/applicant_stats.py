@@ -0,0 +1,162 @@
+"""
+Статистика абитуриентов на счетчиках.
+
+Таблица applicant_stats_counters хранит число заявлений для каждой
+комбинации (статус, программа, источник). Счетчики меняются в той же
+транзакции, что и заявления: после flush события сессии прибавляют новые и
+вычитают прежние комбинации. Поэтому статистика собирается из нескольких
+десятков строк, а не сканированием applicants. При старте сервиса счетчики
+пересчитываются из applicants.
+
+APPLICANT_STATS_MODE=query - статистика считается одним GROUP BY по
+applicants, без счетчиков. В обоих режимах ответ кэшируется в процессе на
+APPLICANT_STATS_CACHE_SECONDS и отдается с ETag.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import Counter
+from typing import Awaitable, Callable, Iterable, Optional, Tuple
+
+from sqlalchemy import event, func, inspect as sa_inspect, select, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+import models
+
+APPLICANT_STATS_MODE = os.getenv("APPLICANT_STATS_MODE", "counters")
+APPLICANT_STATS_CACHE_SECONDS = float(os.getenv("APPLICANT_STATS_CACHE_SECONDS", "5"))
+
+COUNTERS_ENABLED = APPLICANT_STATS_MODE == "counters"
+
+# (статус, программа, источник)
+Combination = Tuple[str, str, str]
+
+STAT_FIELDS = ("status", "program", "source")
+
+
+def _combination(status, program, source) -> Combination:
+    return (status or "", program or "", source or "")
+
+
+def _upsert(session: Session):
+    dialect = session.get_bind().dialect.name
+    return (sqlite if dialect == "sqlite" else postgresql).insert(models.ApplicantStatsCounter)
+
+
+def record_changes(session: Session, removed: Iterable[Combination], added: Iterable[Combination]) -> None:
+    """
+    Изменить счетчики в текущей транзакции. Вызывается после flush, а также
+    явно для bulk-запросов, которые проходят в обход flush.
+    """
+    if not COUNTERS_ENABLED:
+        return
+    deltas = Counter(_combination(*combination) for combination in added)
+    deltas.subtract(_combination(*combination) for combination in removed)
+    # Порядок строк одинаков во всех транзакциях: блокировки счетчиков без взаимоблокировок
+    rows = [
+        {"status": status, "program": program, "source": source, "count": delta}
+        for (status, program, source), delta in sorted(deltas.items()) if delta
+    ]
+    if not rows:
+        return
+    statement = _upsert(session).values(rows)
+    statement = statement.on_conflict_do_update(
+        index_elements=["status", "program", "source"],
+        set_={"count": models.ApplicantStatsCounter.count + statement.excluded["count"]},
+    )
+    session.connection().execute(statement)
+    session.info["applicant_stats_changed"] = True
+
+
+def rebuild_counters(db: Session) -> None:
+    """Пересчитать счетчики из applicants"""
+    if db.get_bind().dialect.name == "postgresql":
+        # Несколько воркеров при старте пересчитывают счетчики по очереди
+        db.execute(text(f"LOCK TABLE {models.ApplicantStatsCounter.__tablename__} IN SHARE ROW EXCLUSIVE MODE"))
+    db.query(models.ApplicantStatsCounter).delete()
+    a = models.Applicant
+    db.execute(
+        models.ApplicantStatsCounter.__table__.insert().from_select(
+            ["status", "program", "source", "count"],
+            select(
+                func.coalesce(a.status, ""),
+                func.coalesce(a.program, ""),
+                func.coalesce(a.source, ""),
+                func.count(a.id),
+            ).group_by(func.coalesce(a.status, ""), func.coalesce(a.program, ""), func.coalesce(a.source, "")),
+        )
+    )
+    db.commit()
+
+
+class StatisticsCache:
+    """Последняя статистика и ее ETag на APPLICANT_STATS_CACHE_SECONDS"""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._value: Optional[Tuple[dict, str]] = None
+        self._expires_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def get(self, load: Callable[[], Awaitable[dict]]) -> Tuple[dict, str]:
+        """(статистика, ETag); при устаревании кэша статистика загружается один раз"""
+        if self._value is not None and time.monotonic() < self._expires_at:
+            return self._value
+        async with self._lock:
+            if self._value is None or time.monotonic() >= self._expires_at:
+                statistics = await load()
+                body = json.dumps(statistics, sort_keys=True, ensure_ascii=False).encode()
+                self._value = (statistics, f'"{hashlib.sha1(body).hexdigest()}"')
+                self._expires_at = time.monotonic() + self.ttl
+            return self._value
+
+    def invalidate(self) -> None:
+        self._expires_at = 0.0
+
+
+statistics_cache = StatisticsCache(APPLICANT_STATS_CACHE_SECONDS)
+
+
+# ---------- события сессии ----------
+
+def _previous(state, field: str):
+    history = state.attrs[field].history
+    if history.deleted:
+        return history.deleted[0]
+    return getattr(state.obj(), field)
+
+
+@event.listens_for(Session, "after_flush")
+def _count_changes(session, flush_context):
+    if not COUNTERS_ENABLED:
+        return
+    removed, added = [], []
+    for obj in session.new:
+        if isinstance(obj, models.Applicant):
+            added.append((obj.status, obj.program, obj.source))
+    for obj in session.deleted:
+        if isinstance(obj, models.Applicant):
+            state = sa_inspect(obj)
+            removed.append(tuple(_previous(state, field) for field in STAT_FIELDS))
+    for obj in session.dirty:
+        if isinstance(obj, models.Applicant):
+            state = sa_inspect(obj)
+            if any(state.attrs[field].history.has_changes() for field in STAT_FIELDS):
+                removed.append(tuple(_previous(state, field) for field in STAT_FIELDS))
+                added.append((obj.status, obj.program, obj.source))
+    record_changes(session, removed, added)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_cache(session):
+    # Другие воркеры увидят изменения после истечения своего кэша
+    if session.info.pop("applicant_stats_changed", False):
+        statistics_cache.invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changes(session):
+    session.info.pop("applicant_stats_changed", None)
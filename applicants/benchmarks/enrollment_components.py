@@ -0,0 +1,110 @@
+"""
+Бенчмарк и сверка параллельного расчета зачисления (enrollment_parallel).
+
+Синтетические данные как в benchmarks/enrollment_engine.py, но программы
+разбиты на --clusters групп (факультетов), и абитуриент выбирает 1-5
+программ одной группы. Для каждого размера однопоточный
+enrollment.allocate_highest_priority сравнивается с allocate_parallel на
+--workers процессах: время и поэлементное совпадение списков. Затем
+сверка повторяется на --verify-seeds случайных наборах, включая данные без
+групп (одна компонента, расчет в текущем процессе). При расхождении
+скрипт завершается с кодом 1.
+
+Запуск (в контейнере applicants или из каталога applicants):
+    python benchmarks/enrollment_components.py
+    python benchmarks/enrollment_components.py --sizes 1000000 --clusters 40 --workers 2 4 8
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(1, str(Path(__file__).resolve().parents[2]))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import enrollment_parallel  # noqa: E402
+from enrollment import allocate_highest_priority  # noqa: E402
+from enrollment_engine import Application, Program, generate, snapshot, timed  # noqa: E402
+from enrollment_parallel import allocate_parallel, split_components  # noqa: E402
+
+
+def generate_clustered(size: int, clusters: int, seed: int):
+    """
+    size заявлений: программы разбиты на clusters групп, абитуриент выбирает
+    1-5 программ одной группы; часть заявлений - на неактивные программы
+    """
+    rng = random.Random(seed)
+    program_count = max(clusters * 5, size // 2000)
+    groups = [[f"Программа {i}" for i in range(start, program_count, clusters)] for start in range(clusters)]
+    inactive = [f"Закрытая программа {i}" for i in range(max(1, program_count // 10))]
+
+    applications: List[Application] = []
+    person = 0
+    while len(applications) < size:
+        person += 1
+        snils = f"{person:011d}"
+        group = rng.choice(groups)
+        choices = rng.sample(group, rng.randint(1, min(5, len(group))))
+        if rng.random() < 0.05:
+            choices.append(rng.choice(inactive))
+        score = rng.choice([None] + [rng.randint(120, 310) for _ in range(20)])
+        for priority, program in enumerate(choices, start=1):
+            applications.append(Application(len(applications) + 1, snils, program, priority, score))
+    del applications[size:]
+    rng.shuffle(applications)
+    for position, application in enumerate(applications, start=1):
+        application.id = position
+
+    places_per_program = max(1, person // 3 // program_count)
+    programs = [
+        Program(f"Программа {i}", rng.randint(places_per_program // 2, places_per_program * 3 // 2))
+        for i in range(program_count)
+    ]
+    return programs, applications
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--clusters", type=int, default=20)
+    parser.add_argument("--workers", type=int, nargs="+", default=[2, 4])
+    parser.add_argument("--verify-seeds", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    # Пул запускается на любом размере данных, чтобы сверка проверяла параллельный путь
+    enrollment_parallel.ENROLLMENT_PARALLEL_MIN_APPLICATIONS = 0
+
+    for size in args.sizes:
+        programs, applications = generate_clustered(size, args.clusters, args.seed)
+        components = split_components(programs, applications)
+        expected, elapsed = timed(allocate_highest_priority, programs, applications)
+        print(f"{size:>9} заявлений, {len(components)} компонент: однопоточный {elapsed * 1000:9.1f} мс")
+        for workers in args.workers:
+            results, parallel_elapsed = timed(allocate_parallel, programs, applications, None, workers)
+            same = snapshot(results) == snapshot(expected)
+            print(
+                f"{'':>9} {workers:>2} процессов {parallel_elapsed * 1000:9.1f} мс, x{elapsed / parallel_elapsed:.2f}, "
+                + ("результаты совпадают" if same else "РЕЗУЛЬТАТЫ РАЗЛИЧАЮТСЯ")
+            )
+            if not same:
+                sys.exit(1)
+
+    for seed in range(args.seed, args.seed + args.verify_seeds):
+        for name, (programs, applications) in (
+            ("группы", generate_clustered(20_000, args.clusters, seed)),
+            ("без групп", generate(20_000, seed)),
+        ):
+            same = snapshot(allocate_parallel(programs, applications, None, max(args.workers))) == snapshot(
+                allocate_highest_priority(programs, applications)
+            )
+            print(f"сверка seed={seed} {name:<9} " + ("совпадает" if same else "РАЗЛИЧАЕТСЯ"))
+            if not same:
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
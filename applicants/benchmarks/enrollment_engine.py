@@ -0,0 +1,249 @@
+"""
+Бенчмарк расчета зачисления на синтетических данных.
+
+Новый алгоритм (enrollment.allocate_highest_priority) запускается на 10k,
+100k и 1M заявлений. Прежняя реализация (копия ниже) растет квадратично,
+поэтому выполняется только до --legacy-max заявлений; на этих размерах
+результаты обеих реализаций сравниваются поэлементно. Если установлен
+NumPy, так же замеряется и сверяется столбцовый вариант (enrollment_kernel).
+Та же сверка на небольших размерах - tests/test_enrollment_engines.py.
+
+Запуск (в контейнере applicants или из каталога applicants):
+    python benchmarks/enrollment_engine.py
+    python benchmarks/enrollment_engine.py --sizes 10000 100000 --legacy-max 20000
+"""
+import argparse
+import random
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Set
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(1, str(Path(__file__).resolve().parents[2]))
+
+from enrollment import EnrollmentResult, allocate_highest_priority  # noqa: E402
+
+try:
+    from enrollment_kernel import MISSING_PRIORITY, allocate_columnar  # noqa: E402
+except ImportError:
+    allocate_columnar = None
+
+
+class Program:
+    __slots__ = ("name", "total_places")
+
+    def __init__(self, name: str, total_places: int):
+        self.name = name
+        self.total_places = total_places
+
+
+class Application:
+    __slots__ = ("id", "snils", "program", "priority", "exam_results")
+
+    def __init__(self, id: int, snils: str, program: str, priority: int, exam_results):
+        self.id = id
+        self.snils = snils
+        self.program = program
+        self.priority = priority
+        self.exam_results = exam_results
+
+
+def generate(size: int, seed: int):
+    """
+    size заявлений: у каждого абитуриента 1-5 программ, мест примерно на
+    треть абитуриентов, часть заявлений - на неактивные программы.
+    """
+    rng = random.Random(seed)
+    program_count = max(10, size // 2000)
+    active = [f"Программа {i}" for i in range(program_count)]
+    inactive = [f"Закрытая программа {i}" for i in range(max(1, program_count // 10))]
+
+    applications: List[Application] = []
+    person = 0
+    while len(applications) < size:
+        person += 1
+        snils = f"{person:011d}"
+        choices = rng.sample(active, rng.randint(1, 5))
+        if rng.random() < 0.05:
+            choices.append(rng.choice(inactive))
+        score = rng.choice([None] + [rng.randint(120, 310) for _ in range(20)])
+        for priority, program in enumerate(choices, start=1):
+            applications.append(Application(len(applications) + 1, snils, program, priority, score))
+    del applications[size:]
+    rng.shuffle(applications)
+    # Как при чтении из БД с ORDER BY id: id возрастают в порядке списка
+    for position, application in enumerate(applications, start=1):
+        application.id = position
+
+    places_per_program = max(1, person // 3 // program_count)
+    programs = [Program(name, rng.randint(places_per_program // 2, places_per_program * 3 // 2)) for name in active]
+    return programs, applications
+
+
+def legacy_allocate(programs, all_applicants) -> Dict[str, EnrollmentResult]:
+    """Копия прежней реализации calculate_enrollment без запросов к БД"""
+    program_dict = {p.name: p for p in programs}
+
+    applicants_by_snils: Dict[str, list] = defaultdict(list)
+    for applicant in all_applicants:
+        if applicant.program in program_dict:
+            applicants_by_snils[applicant.snils].append(applicant)
+
+    for snils in applicants_by_snils:
+        applicants_by_snils[snils].sort(key=lambda x: x.priority)
+
+    unique_applicants = []
+    seen_snils = set()
+
+    for applicant in all_applicants:
+        if applicant.snils not in seen_snils:
+            max_score_app = max(
+                [app for app in applicants_by_snils[applicant.snils]],
+                key=lambda x: (x.exam_results if x.exam_results is not None else 0)
+            )
+            unique_applicants.append((applicant.snils, max_score_app))
+            seen_snils.add(applicant.snils)
+
+    unique_applicants.sort(
+        key=lambda x: (x[1].exam_results if x[1].exam_results is not None else 0),
+        reverse=True
+    )
+
+    results: Dict[str, EnrollmentResult] = {}
+    budget_places = {}
+    for program_name, program in program_dict.items():
+        results[program_name] = EnrollmentResult(program_name, program.total_places)
+        budget_places[program_name] = program.total_places
+
+    enrolled_snils: Set[str] = set()
+
+    applicants_by_program: Dict[str, list] = defaultdict(list)
+    for applicant in all_applicants:
+        if applicant.program in program_dict:
+            applicants_by_program[applicant.program].append(applicant)
+
+    for snils, _ in unique_applicants:
+        if snils in enrolled_snils:
+            continue
+
+        applicant_applications = applicants_by_snils[snils]
+
+        enrolled = False
+        for application in applicant_applications:
+            program_name = application.program
+            if program_name not in program_dict:
+                continue
+
+            if budget_places[program_name] > 0:
+                results[program_name].add_enrolled(application)
+                enrolled_snils.add(snils)
+                budget_places[program_name] -= 1
+                enrolled = True
+
+                for other_program_name in applicants_by_program:
+                    if other_program_name != program_name:
+                        applicants_by_program[other_program_name] = [
+                            app for app in applicants_by_program[other_program_name]
+                            if app.snils != snils
+                        ]
+
+                break
+
+        if not enrolled:
+            for application in applicant_applications:
+                program_name = application.program
+                if program_name in results:
+                    if application not in results[program_name].rejected:
+                        results[program_name].add_rejected(application)
+
+    for program_name, applicants in applicants_by_program.items():
+        for applicant in applicants:
+            if applicant.snils not in enrolled_snils:
+                if applicant not in results[program_name].enrolled:
+                    if applicant not in results[program_name].rejected:
+                        results[program_name].add_rejected(applicant)
+
+    return results
+
+
+def encode_columns(programs, applications):
+    """
+    Столбцы для allocate_columnar так, как их возвращает load_columns:
+    ключ СНИЛС - первый id, программа - индекс или -1, NULL заменены
+    """
+    import numpy as np
+
+    program_index = {p.name: i for i, p in enumerate(programs)}
+    first_id: Dict[str, int] = {}
+    for a in applications:
+        first_id.setdefault(a.snils, a.id)
+    return (
+        np.asarray([a.id for a in applications], dtype=np.int64),
+        np.asarray([first_id[a.snils] for a in applications], dtype=np.int64),
+        np.asarray([program_index.get(a.program, -1) for a in applications], dtype=np.int64),
+        np.asarray([a.priority if a.priority is not None else MISSING_PRIORITY for a in applications], dtype=np.int64),
+        np.asarray([a.exam_results or 0 for a in applications], dtype=np.int64),
+    )
+
+
+def snapshot(results: Dict[str, EnrollmentResult]):
+    return [
+        (name, [a.id for a in result.enrolled], [a.id for a in result.rejected])
+        for name, result in results.items()
+    ]
+
+
+def timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--legacy-max", type=int, default=10_000, help="максимальный размер для прежней реализации")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        programs, applications = generate(size, args.seed)
+        # В прежней реализации max([]) падает на SNILS только с неактивными
+        # программами, поэтому сравнение идет на заявлениях активных программ
+        active = {p.name for p in programs}
+        comparable = [a for a in applications if a.program in active]
+
+        results, elapsed = timed(allocate_highest_priority, programs, applications)
+        enrolled = sum(len(r.enrolled) for r in results.values())
+        line = f"{size:>9} заявлений: новый {elapsed * 1000:9.1f} мс (зачислено {enrolled})"
+
+        if allocate_columnar is not None:
+            columns = encode_columns(programs, applications)
+            allocation, numpy_elapsed = timed(
+                allocate_columnar, [p.total_places for p in programs], *columns
+            )
+            same = snapshot(results) == [
+                (program.name, enrolled.tolist(), rejected.tolist())
+                for program, (enrolled, rejected) in zip(programs, allocation)
+            ]
+            line += f", numpy {numpy_elapsed * 1000:9.1f} мс"
+            line += "" if same else " (РЕЗУЛЬТАТЫ NUMPY РАЗЛИЧАЮТСЯ)"
+            if not same:
+                print(line)
+                sys.exit(1)
+
+        if size <= args.legacy_max:
+            legacy, legacy_elapsed = timed(legacy_allocate, programs, comparable)
+            same = snapshot(legacy) == snapshot(allocate_highest_priority(programs, comparable))
+            line += f", прежний {legacy_elapsed * 1000:9.1f} мс, x{legacy_elapsed / elapsed:.0f}"
+            line += ", результаты совпадают" if same else ", РЕЗУЛЬТАТЫ РАЗЛИЧАЮТСЯ"
+            if not same:
+                print(line)
+                sys.exit(1)
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
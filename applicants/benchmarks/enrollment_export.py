@@ -0,0 +1,111 @@
+"""
+Бенчмарк выгрузок результатов зачисления: Excel, CSV и Parquet.
+
+Для каждого размера и формата в отдельном процессе генерируются данные
+(как в benchmarks/excel_export.py) и замеряются время записи и прирост
+пикового RSS; затем в отдельном процессе файл читается целиком
+(openpyxl read-only, csv.reader, pyarrow.parquet.read_table).
+
+Запуск (в контейнере applicants или из каталога applicants):
+    python benchmarks/enrollment_export.py
+    python benchmarks/enrollment_export.py --sizes 10000 100000 --formats csv parquet
+"""
+import argparse
+import csv
+import gc
+import multiprocessing
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(1, str(Path(__file__).resolve().parents[2]))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from openpyxl import load_workbook  # noqa: E402
+
+from columnar_export import PARQUET_AVAILABLE, generate_enrollment_csv, generate_enrollment_parquet  # noqa: E402
+from excel_export import generate, reset_peak_rss, rss_kb  # noqa: E402
+from excel_generator import generate_enrollment_excel  # noqa: E402
+
+GENERATORS = {
+    "xlsx": generate_enrollment_excel,
+    "csv": generate_enrollment_csv,
+    "parquet": generate_enrollment_parquet,
+}
+
+
+def read_xlsx(path: str) -> int:
+    wb = load_workbook(path, read_only=True)
+    rows = sum(1 for ws in wb.worksheets for _ in ws.iter_rows(values_only=True))
+    wb.close()
+    return rows
+
+
+def read_csv(path: str) -> int:
+    with open(path, newline="", encoding="utf-8") as source:
+        return sum(1 for _ in csv.reader(source)) - 1
+
+
+def read_parquet(path: str) -> int:
+    import pyarrow.parquet as pq
+    return pq.read_table(path).num_rows
+
+
+READERS = {
+    "xlsx": read_xlsx,
+    "csv": read_csv,
+    "parquet": read_parquet,
+}
+
+
+def measure_write(export_format: str, size: int, seed: int, output_path: str):
+    """Выполняется в отдельном процессе: время записи и прирост пикового RSS, МБ"""
+    results = generate(size, seed)
+    gc.collect()
+    reset_peak_rss()
+    baseline_kb = rss_kb("VmRSS")
+    started = time.perf_counter()
+    GENERATORS[export_format](results, output_path)
+    elapsed = time.perf_counter() - started
+    return elapsed, (rss_kb("VmHWM") - baseline_kb) / 1024
+
+
+def measure_read(export_format: str, path: str):
+    """Выполняется в отдельном процессе: время чтения и число прочитанных строк"""
+    started = time.perf_counter()
+    rows = READERS[export_format](path)
+    return time.perf_counter() - started, rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 500_000])
+    parser.add_argument("--formats", nargs="+", choices=list(GENERATORS), default=list(GENERATORS))
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    formats = [f for f in args.formats if f != "parquet" or PARQUET_AVAILABLE]
+    if len(formats) < len(args.formats):
+        print("⚠️ pyarrow не установлен, Parquet пропущен")
+
+    # spawn: каждый замер начинается с чистого процесса, пиковый RSS не наследуется
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            for export_format in formats:
+                path = str(Path(tmp) / f"enrollment_{size}.{export_format}")
+                with context.Pool(1) as pool:
+                    write_seconds, peak_mb = pool.apply(measure_write, (export_format, size, args.seed, path))
+                with context.Pool(1) as pool:
+                    read_seconds, rows = pool.apply(measure_read, (export_format, path))
+                file_mb = Path(path).stat().st_size / 1024 / 1024
+                print(
+                    f"{size:>9} строк  {export_format:<8} запись {write_seconds:7.2f} с  пик RSS +{peak_mb:6.1f} МБ  "
+                    f"файл {file_mb:6.1f} МБ  чтение {read_seconds:7.2f} с ({rows} строк)"
+                )
+
+
+if __name__ == "__main__":
+    main()
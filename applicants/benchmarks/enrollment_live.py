@@ -0,0 +1,124 @@
+"""
+Бенчмарк инкрементального пересчета зачисления (enrollment_live).
+
+Строится живое состояние на синтетических данных, затем применяются
+случайные изменения: новый балл, перестановка приоритетов, отзыв заявления,
+новое заявление. Для каждого изменения замеряется инкрементальный пересчет;
+каждое --verify-every изменение результат сверяется с полным расчетом
+enrollment.allocate_highest_priority.
+
+Запуск (в контейнере applicants или из каталога applicants):
+    python benchmarks/enrollment_live.py --size 100000 --changes 200
+"""
+import argparse
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(1, str(Path(__file__).resolve().parents[2]))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from enrollment import allocate_highest_priority  # noqa: E402
+from enrollment_engine import Application, generate  # noqa: E402
+from enrollment_live import LiveEnrollment  # noqa: E402
+
+
+def rows_of(applications):
+    return [(a.id, a.snils, a.program, a.priority, a.exam_results) for a in applications]
+
+
+def mutate(rng: random.Random, applications, programs, next_id: int):
+    """Случайное изменение; возвращает затронутые СНИЛС и следующий свободный id"""
+    target = rng.choice(applications)
+    same_person = [a for a in applications if a.snils == target.snils]
+    kind = rng.choice(["score", "priorities", "withdraw", "new_application"])
+    if kind == "score":
+        score = rng.randint(120, 310)
+        for a in same_person:
+            a.exam_results = score
+    elif kind == "priorities":
+        priorities = [a.priority for a in same_person]
+        rng.shuffle(priorities)
+        for a, priority in zip(same_person, priorities):
+            a.priority = priority
+    elif kind == "withdraw":
+        applications.remove(target)
+    else:
+        program = rng.choice(programs).name
+        applications.append(Application(next_id, target.snils, program, len(same_person) + 1, target.exam_results))
+        next_id += 1
+    return {target.snils}, next_id
+
+
+def snapshot_live(live: LiveEnrollment, programs, applications):
+    """Списки зачисленных и не зачисленных в форме EnrollmentResult"""
+    enrolled = {p.name: [] for p in programs}
+    rejected = {p.name: [] for p in programs}
+    for snils in live.order_snils:
+        decision = live.decisions.get(snils)
+        if decision is not None:
+            enrolled[decision[1]].append(decision[0])
+        else:
+            for _, application_id, program, _ in live.applications[snils]:
+                rejected[program].append(application_id)
+    return [(p.name, enrolled[p.name], rejected[p.name]) for p in programs]
+
+
+def snapshot_full(programs, applications):
+    results = allocate_highest_priority(programs, applications)
+    return [(name, [a.id for a in r.enrolled], [a.id for a in r.rejected]) for name, r in results.items()]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=100_000)
+    parser.add_argument("--changes", type=int, default=200)
+    parser.add_argument("--verify-every", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    programs, applications = generate(args.size, args.seed)
+    program_pairs = [(p.name, p.total_places) for p in programs]
+
+    live = LiveEnrollment()
+    started = time.perf_counter()
+    live.build(program_pairs, rows_of(applications))
+    build_elapsed = time.perf_counter() - started
+
+    started = time.perf_counter()
+    allocate_highest_priority(programs, applications)
+    full_elapsed = time.perf_counter() - started
+
+    next_id = max(a.id for a in applications) + 1
+    timings, replayed = [], []
+    for change in range(1, args.changes + 1):
+        touched, next_id = mutate(rng, applications, programs, next_id)
+        touched_rows = sorted(
+            (row for row in rows_of(applications) if row[1] in touched), key=lambda row: row[0]
+        )
+        started = time.perf_counter()
+        live.apply(touched, touched_rows)
+        timings.append(time.perf_counter() - started)
+        replayed.append(live.last_update.get("replayed", 0))
+
+        if change % args.verify_every == 0:
+            applications.sort(key=lambda a: a.id)
+            if snapshot_live(live, programs, applications) != snapshot_full(programs, applications):
+                print(f"РЕЗУЛЬТАТЫ РАЗЛИЧАЮТСЯ после изменения {change}")
+                sys.exit(1)
+
+    print(f"{args.size} заявлений, полный расчет {full_elapsed * 1000:.1f} мс, построение состояния {build_elapsed * 1000:.1f} мс")
+    print(
+        f"{args.changes} изменений: медиана {statistics.median(timings) * 1000:.2f} мс, "
+        f"максимум {max(timings) * 1000:.2f} мс, "
+        f"пересчитано абитуриентов в среднем {statistics.mean(replayed):.0f}"
+    )
+    print(f"Результаты совпадают с полным расчетом (проверка каждые {args.verify_every} изменений)")
+
+
+if __name__ == "__main__":
+    main()
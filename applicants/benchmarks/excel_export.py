@@ -0,0 +1,230 @@
+"""
+Бенчмарк генерации Excel с результатами зачисления.
+
+Сравниваются потоковый генератор (excel_generator.generate_enrollment_excel)
+и прежний, строящий листы в памяти (копия ниже). Каждый замер выполняется в
+отдельном процессе: данные генерируются там же, затем пиковый RSS процесса
+сбрасывается и после записи файла сравнивается с RSS до ее начала (Linux).
+С --verify значения ячеек и объединенные ячейки обоих файлов сравниваются.
+
+Запуск (в контейнере applicants или из каталога applicants):
+    python benchmarks/excel_export.py
+    python benchmarks/excel_export.py --sizes 10000 100000 --legacy-max 100000 --verify
+"""
+import argparse
+import gc
+import multiprocessing
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(1, str(Path(__file__).resolve().parents[2]))
+
+from openpyxl import Workbook, load_workbook  # noqa: E402
+from openpyxl.styles import Alignment, Font  # noqa: E402
+
+from enrollment import EnrollmentResult  # noqa: E402
+from excel_generator import BORDER, GREEN_FILL, HEADER_FILL, HEADER_FONT, RED_FILL, generate_enrollment_excel  # noqa: E402
+
+
+class Applicant:
+    __slots__ = ("id", "snils", "name", "phone", "priority", "exam_results")
+
+    def __init__(self, id: int, snils: str, name: str, phone: str, priority: int, exam_results):
+        self.id = id
+        self.snils = snils
+        self.name = name
+        self.phone = phone
+        self.priority = priority
+        self.exam_results = exam_results
+
+
+def generate(size: int, seed: int) -> Dict[str, EnrollmentResult]:
+    """size строк, распределенных по программам; примерно треть - зачисленные"""
+    rng = random.Random(seed)
+    program_count = max(5, size // 20000)
+    results = {f"Программа {i}": EnrollmentResult(f"Программа {i}", 0) for i in range(program_count)}
+    names = list(results)
+    for i in range(size):
+        applicant = Applicant(
+            i + 1,
+            f"{i:011d}",
+            f"Фамилия{i} Имя{i % 977} Отчество{i % 113}",
+            f"+7900{i:07d}" if rng.random() < 0.9 else None,
+            rng.randint(1, 5),
+            rng.choice([None] + [rng.randint(120, 310) for _ in range(5)]),
+        )
+        result = results[rng.choice(names)]
+        (result.enrolled if rng.random() < 0.33 else result.rejected).append(applicant)
+    for result in results.values():
+        result.total_places = len(result.enrolled) + rng.randint(0, 10)
+    return results
+
+
+def legacy_generate_enrollment_excel(enrollment_results: Dict[str, EnrollmentResult], output_path: str) -> str:
+    """Прежняя реализация excel_generator.generate_enrollment_excel (для сравнения)"""
+    wb = Workbook()
+    if "Sheet" in wb.sheetnames:
+        wb.remove(wb["Sheet"])
+
+    for program_name, result in enrollment_results.items():
+        ws = wb.create_sheet(title=program_name[:31])
+
+        ws.merge_cells('A1:F1')
+        header_cell = ws['A1']
+        header_cell.value = f"Программа: {program_name} (Мест: {result.total_places})"
+        header_cell.font = Font(bold=True, size=14)
+        header_cell.alignment = Alignment(horizontal='center', vertical='center')
+        ws.row_dimensions[1].height = 25
+
+        row = 3
+        ws.merge_cells(f'A{row}:F{row}')
+        enrolled_header = ws[f'A{row}']
+        enrolled_header.value = f"ЗАЧИСЛЕНЫ ({len(result.enrolled)} из {result.total_places})"
+        enrolled_header.fill = GREEN_FILL
+        enrolled_header.font = Font(bold=True, size=12)
+        enrolled_header.alignment = Alignment(horizontal='center', vertical='center')
+        ws.row_dimensions[row].height = 20
+
+        row += 1
+        headers = ["№", "СНИЛС", "ФИО", "Телефон", "Приоритет", "Балл"]
+        for col, header in enumerate(headers, start=1):
+            cell = ws.cell(row=row, column=col)
+            cell.value = header
+            cell.fill = HEADER_FILL
+            cell.font = HEADER_FONT
+            cell.alignment = Alignment(horizontal='center', vertical='center')
+            cell.border = BORDER
+        ws.row_dimensions[row].height = 20
+
+        row += 1
+        for idx, applicant in enumerate(result.enrolled, start=1):
+            ws.cell(row=row, column=1, value=idx).border = BORDER
+            ws.cell(row=row, column=2, value=applicant.snils or "-").border = BORDER
+            ws.cell(row=row, column=3, value=applicant.name).border = BORDER
+            ws.cell(row=row, column=4, value=applicant.phone or "-").border = BORDER
+            ws.cell(row=row, column=5, value=applicant.priority).border = BORDER
+            ws.cell(row=row, column=6, value=applicant.exam_results or 0).border = BORDER
+            for col in range(1, 7):
+                ws.cell(row=row, column=col).fill = GREEN_FILL
+            row += 1
+
+        row += 1
+
+        ws.merge_cells(f'A{row}:F{row}')
+        rejected_header = ws[f'A{row}']
+        rejected_header.value = f"НЕ ЗАЧИСЛЕНЫ ({len(result.rejected)})"
+        rejected_header.fill = RED_FILL
+        rejected_header.font = Font(bold=True, size=12)
+        rejected_header.alignment = Alignment(horizontal='center', vertical='center')
+        ws.row_dimensions[row].height = 20
+
+        row += 1
+        for col, header in enumerate(headers, start=1):
+            cell = ws.cell(row=row, column=col)
+            cell.value = header
+            cell.fill = HEADER_FILL
+            cell.font = HEADER_FONT
+            cell.alignment = Alignment(horizontal='center', vertical='center')
+            cell.border = BORDER
+
+        row += 1
+        for idx, applicant in enumerate(result.rejected, start=1):
+            ws.cell(row=row, column=1, value=idx).border = BORDER
+            ws.cell(row=row, column=2, value=applicant.snils or "-").border = BORDER
+            ws.cell(row=row, column=3, value=applicant.name).border = BORDER
+            ws.cell(row=row, column=4, value=applicant.phone or "-").border = BORDER
+            ws.cell(row=row, column=5, value=applicant.priority).border = BORDER
+            ws.cell(row=row, column=6, value=applicant.exam_results or 0).border = BORDER
+            for col in range(1, 7):
+                ws.cell(row=row, column=col).fill = RED_FILL
+            row += 1
+
+        ws.column_dimensions['A'].width = 8
+        ws.column_dimensions['B'].width = 18
+        ws.column_dimensions['C'].width = 35
+        ws.column_dimensions['D'].width = 18
+        ws.column_dimensions['E'].width = 12
+        ws.column_dimensions['F'].width = 10
+
+    output_file = Path(output_path)
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    wb.save(output_path)
+    return str(output_path)
+
+
+GENERATORS = {
+    "streaming": generate_enrollment_excel,
+    "legacy": legacy_generate_enrollment_excel,
+}
+
+
+def reset_peak_rss() -> None:
+    """Сбросить пиковый RSS процесса (VmHWM), Linux"""
+    with open("/proc/self/clear_refs", "w") as clear_refs:
+        clear_refs.write("5")
+
+
+def rss_kb(field: str) -> int:
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    raise RuntimeError(f"{field} not found in /proc/self/status")
+
+
+def measure(generator: str, size: int, seed: int, output_path: str):
+    """Выполняется в отдельном процессе: время записи и прирост пикового RSS, МБ"""
+    results = generate(size, seed)
+    gc.collect()
+    reset_peak_rss()
+    baseline_kb = rss_kb("VmRSS")
+    started = time.perf_counter()
+    GENERATORS[generator](results, output_path)
+    elapsed = time.perf_counter() - started
+    return elapsed, (rss_kb("VmHWM") - baseline_kb) / 1024
+
+
+def sheet_contents(path: str):
+    wb = load_workbook(path)
+    return [
+        (ws.title, sorted(str(r) for r in ws.merged_cells.ranges), [list(row) for row in ws.iter_rows(values_only=True)])
+        for ws in wb.worksheets
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 500_000])
+    parser.add_argument("--legacy-max", type=int, default=500_000)
+    parser.add_argument("--verify", action="store_true")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    # spawn: каждый замер начинается с чистого процесса, пиковый RSS не наследуется
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            paths = {}
+            for generator in GENERATORS:
+                if generator == "legacy" and size > args.legacy_max:
+                    continue
+                paths[generator] = str(Path(tmp) / f"{generator}_{size}.xlsx")
+                with context.Pool(1) as pool:
+                    elapsed, peak_mb = pool.apply(measure, (generator, size, args.seed, paths[generator]))
+                file_mb = Path(paths[generator]).stat().st_size / 1024 / 1024
+                print(f"{size:>9} строк  {generator:<9} {elapsed:8.2f} с  пик RSS +{peak_mb:7.1f} МБ  файл {file_mb:6.1f} МБ")
+
+            if args.verify and len(paths) == 2:
+                same = sheet_contents(paths["streaming"]) == sheet_contents(paths["legacy"])
+                print(f"{size:>9} строк  содержимое {'совпадает' if same else 'РАЗЛИЧАЕТСЯ'}")
+                if not same:
+                    sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Выгрузка результатов зачисления в CSV и Parquet.
+
+Одна строка на заявление: программа, id заявления, СНИЛС, приоритет, балл,
+итог (enrolled/rejected) и место в конкурсном списке программы (сначала
+зачисленные, затем не зачисленные, как в Excel). Оба формата пишутся
+потоково: CSV - построчно, Parquet - группами строк по EXPORT_BATCH_SIZE,
+поэтому память не растет с числом заявлений.
+
+Parquet требует pyarrow; без него доступен только CSV.
+"""
+import csv
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple
+
+from enrollment import PROGRESS_STEP, EnrollmentResult, ProgressCallback
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+PARQUET_AVAILABLE = pa is not None
+
+EXPORT_COLUMNS = ("program", "application_id", "snils", "priority", "score", "outcome", "rank")
+# Строк в одной группе строк Parquet
+EXPORT_BATCH_SIZE = 50_000
+
+ExportRow = Tuple[str, int, Optional[str], Optional[int], Optional[int], str, int]
+
+
+def export_rows(enrollment_results: Dict[str, EnrollmentResult]) -> Iterator[ExportRow]:
+    """Строки выгрузки по программам в порядке конкурсных списков"""
+    for program_name, result in enrollment_results.items():
+        rank = 0
+        for outcome, applicants in (("enrolled", result.enrolled), ("rejected", result.rejected)):
+            for applicant in applicants:
+                rank += 1
+                yield (
+                    program_name,
+                    applicant.id,
+                    applicant.snils,
+                    applicant.priority,
+                    applicant.exam_results,
+                    outcome,
+                    rank,
+                )
+
+
+def _total_rows(enrollment_results: Dict[str, EnrollmentResult]) -> int:
+    return sum(len(result.enrolled) + len(result.rejected) for result in enrollment_results.values())
+
+
+def _prepare(output_path: str) -> None:
+    Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+
+
+def generate_enrollment_csv(
+    enrollment_results: Dict[str, EnrollmentResult],
+    output_path: str,
+    progress: Optional[ProgressCallback] = None
+) -> str:
+    """CSV (UTF-8, разделитель - запятая) с заголовком EXPORT_COLUMNS"""
+    _prepare(output_path)
+    total = _total_rows(enrollment_results)
+    with open(output_path, "w", newline="", encoding="utf-8") as output:
+        writer = csv.writer(output)
+        writer.writerow(EXPORT_COLUMNS)
+        for written, row in enumerate(export_rows(enrollment_results), start=1):
+            writer.writerow(row)
+            if progress and written % PROGRESS_STEP == 0:
+                progress("export", written, total)
+    if progress:
+        progress("export", total, total)
+    return str(output_path)
+
+
+def _parquet_schema():
+    return pa.schema([
+        ("program", pa.string()),
+        ("application_id", pa.int64()),
+        ("snils", pa.string()),
+        ("priority", pa.int32()),
+        ("score", pa.int32()),
+        ("outcome", pa.string()),
+        ("rank", pa.int32()),
+    ])
+
+
+def generate_enrollment_parquet(
+    enrollment_results: Dict[str, EnrollmentResult],
+    output_path: str,
+    progress: Optional[ProgressCallback] = None
+) -> str:
+    """Parquet (сжатие zstd) со столбцами EXPORT_COLUMNS"""
+    if not PARQUET_AVAILABLE:
+        raise RuntimeError("Parquet export requires pyarrow")
+    _prepare(output_path)
+    schema = _parquet_schema()
+    total = _total_rows(enrollment_results)
+    written = 0
+    with pq.ParquetWriter(output_path, schema, compression="zstd") as writer:
+        columns = [[] for _ in EXPORT_COLUMNS]
+        for row in export_rows(enrollment_results):
+            for column, value in zip(columns, row):
+                column.append(value)
+            if len(columns[0]) == EXPORT_BATCH_SIZE:
+                writer.write_batch(pa.record_batch(columns, schema=schema))
+                written += EXPORT_BATCH_SIZE
+                columns = [[] for _ in EXPORT_COLUMNS]
+                if progress:
+                    progress("export", written, total)
+        if columns[0]:
+            writer.write_batch(pa.record_batch(columns, schema=schema))
+    if progress:
+        progress("export", total, total)
+    return str(output_path)
+
+
+# Расширение файла -> генератор
+EXPORT_GENERATORS = {
+    "csv": generate_enrollment_csv,
+    "parquet": generate_enrollment_parquet,
+}
@@ -1,11 +1,18 @@
 from datetime import datetime
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Tuple
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, or_, select, tuple_, cast, Text, Select, insert, update, delete
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects.postgresql import aggregate_order_by
 from collections import defaultdict
+import base64
+import json
 import models
 import schemas
 import uuid
+from enrollment_live import track_applicant_changes
+import applicant_stats
+import data_version
 
 def get_applicant_by_id(db: Session, applicant_id: int) -> Optional[models.Applicant]:
     return db.query(models.Applicant).filter(models.Applicant.id == applicant_id).first()
@@ -76,6 +83,114 @@ def get_applicants(
     
     return query.offset(skip).limit(limit).all()
 
+def get_rating_window(
+    db: Session,
+    program: str,
+    applicant_id: Optional[str] = None,
+    top: int = 3,
+    neighbours: int = 1,
+    bottom: int = 3
+) -> Optional[schemas.RatingWindow]:
+    """
+    Место абитуриента в рейтинге программы (по убыванию баллов, при равенстве -
+    по id заявления) и строки рейтинга: первые top, соседи абитуриента на
+    neighbours мест в обе стороны и последние bottom. Ранг считается оконной
+    функцией по индексу ix_applicants_program_exam_results, в ответ попадают
+    только запрошенные строки. Возвращает None, если applicant_id указан,
+    но не участвует в рейтинге программы.
+    """
+    ranked = db.query(
+        models.Applicant.applicant_id,
+        models.Applicant.name,
+        models.Applicant.exam_results,
+        func.row_number().over(
+            order_by=(models.Applicant.exam_results.desc().nulls_last(), models.Applicant.id)
+        ).label("rank"),
+    ).filter(models.Applicant.program == program).subquery()
+
+    total = db.query(func.count(models.Applicant.id)).filter(
+        models.Applicant.program == program
+    ).scalar() or 0
+
+    rank = None
+    conditions = [ranked.c.rank <= top, ranked.c.rank > total - bottom]
+    if applicant_id is not None:
+        rank = db.query(ranked.c.rank).filter(ranked.c.applicant_id == applicant_id).scalar()
+        if rank is None:
+            return None
+        conditions.append(ranked.c.rank.between(rank - neighbours, rank + neighbours))
+
+    entries = db.query(ranked).filter(or_(*conditions)).order_by(ranked.c.rank).all()
+
+    seat_limit = db.query(models.Program.total_places).filter(models.Program.name == program).scalar()
+    if seat_limit is None:
+        seat_limit = db.query(func.max(models.Applicant.program_limit)).filter(
+            models.Applicant.program == program
+        ).scalar()
+
+    return schemas.RatingWindow(
+        program=program,
+        applicant_id=applicant_id,
+        rank=rank,
+        total=total,
+        seat_limit=seat_limit,
+        entries=[
+            schemas.RatingEntry(
+                rank=row.rank,
+                applicant_id=row.applicant_id,
+                name=row.name,
+                exam_results=row.exam_results
+            )
+            for row in entries
+        ]
+    )
+
+# Заявления абитуриента (телефон + СНИЛС): программы и приоритеты не повторяются
+PROGRAM_CONFLICT = "У абитуриента с этим телефоном и СНИЛС уже есть заявление на программу '{}'"
+PRIORITY_CONFLICT = "У абитуриента с этим телефоном и СНИЛС уже есть заявление с приоритетом {}"
+
+def _applicant_conflict(
+    db: Session, phone: str, snils: str, program: str, priority: Optional[int], exclude_id: Optional[int] = None
+) -> Optional[str]:
+    """Текст ошибки, если у абитуриента уже есть заявление с той же программой или приоритетом"""
+    query = db.query(models.Applicant.program, models.Applicant.priority).filter(
+        models.Applicant.phone == phone,
+        models.Applicant.snils == snils,
+        or_(models.Applicant.program == program, models.Applicant.priority == priority),
+    )
+    if exclude_id is not None:
+        query = query.filter(models.Applicant.id != exclude_id)
+    row = query.first()
+    if row is None:
+        return None
+    if row.program == program:
+        return PROGRAM_CONFLICT.format(program)
+    return PRIORITY_CONFLICT.format(priority)
+
+def _duplicate_field(error: IntegrityError) -> Optional[str]:
+    """
+    Поле ("program" или "priority"), повтор которого нарушил уникальный индекс
+    заявлений абитуриента: PostgreSQL называет индекс, SQLite - столбцы
+    """
+    message = str(error.orig)
+    for field in ("program", "priority"):
+        if f"ix_applicants_phone_snils_{field}_unique" in message or f"applicants.snils, applicants.{field}" in message:
+            return field
+    return None
+
+def _commit_applicant(db: Session, program: str, priority: Optional[int]) -> None:
+    """commit с понятной ошибкой, если параллельный запрос успел добавить такое же заявление"""
+    try:
+        db.commit()
+    except IntegrityError as e:
+        db.rollback()
+        field = _duplicate_field(e)
+        if field == "program":
+            raise ValueError(PROGRAM_CONFLICT.format(program))
+        if field == "priority":
+            raise ValueError(PRIORITY_CONFLICT.format(priority))
+        raise
+
 def create_applicant(db: Session, applicant: schemas.ApplicantCreate) -> models.Applicant:
     if not applicant.applicant_id:
         applicant.applicant_id = str(uuid.uuid4())[:8].upper()
@@ -90,9 +205,13 @@ def create_applicant(db: Session, applicant: schemas.ApplicantCreate) -> models.
     if existing_snils_program:
         raise ValueError(f"Абитуриент с СНИЛС {applicant.snils} уже зарегистрирован на программу '{applicant.program}'")
     
+    conflict = _applicant_conflict(db, applicant.phone, applicant.snils, applicant.program, applicant.priority)
+    if conflict:
+        raise ValueError(conflict)
+    
     db_applicant = models.Applicant(**applicant.model_dump())
     db.add(db_applicant)
-    db.commit()
+    _commit_applicant(db, db_applicant.program, db_applicant.priority)
     db.refresh(db_applicant)
     return db_applicant
 
@@ -122,11 +241,24 @@ def update_applicant(
         if existing_snils_program and existing_snils_program.id != applicant_id:
             raise ValueError(f"Абитуриент с СНИЛС {snils} уже зарегистрирован на программу '{program}'")
     
+    # Программа и приоритет не должны повторяться у других заявлений того же абитуриента
+    if update_data.keys() & {'phone', 'snils', 'program', 'priority'}:
+        conflict = _applicant_conflict(
+            db,
+            update_data.get('phone', db_applicant.phone),
+            snils,
+            program,
+            update_data.get('priority', db_applicant.priority),
+            exclude_id=applicant_id,
+        )
+        if conflict:
+            raise ValueError(conflict)
+    
     for key, value in update_data.items():
         setattr(db_applicant, key, value)
     
     db_applicant.updated_at = datetime.now()
-    db.commit()
+    _commit_applicant(db, db_applicant.program, db_applicant.priority)
     db.refresh(db_applicant)
     return db_applicant
 
@@ -273,52 +405,40 @@ def delete_exam(db: Session, exam_id: int) -> bool:
     return True
 
 def get_applicant_statistics(db: Session) -> schemas.ApplicantStatistics:
-    total_applicants = db.query(func.count(models.Applicant.id)).scalar() or 0
-    
-    new_applicants = db.query(func.count(models.Applicant.id)).filter(
-        models.Applicant.status == "new"
-    ).scalar() or 0
-    
-    contacted_applicants = db.query(func.count(models.Applicant.id)).filter(
-        models.Applicant.status == "contacted"
-    ).scalar() or 0
-    
-    documents_pending_applicants = db.query(func.count(models.Applicant.id)).filter(
-        models.Applicant.status == "documents_pending"
-    ).scalar() or 0
-    
-    enrolled_applicants = db.query(func.count(models.Applicant.id)).filter(
-        models.Applicant.status == "enrolled"
-    ).scalar() or 0
-    
-    rejected_applicants = db.query(func.count(models.Applicant.id)).filter(
-        models.Applicant.status == "rejected"
-    ).scalar() or 0
-    
-    applicants_by_program = {}
-    program_data = db.query(
-        models.Applicant.program, func.count(models.Applicant.id)
-    ).group_by(models.Applicant.program).all()
-    for program, count in program_data:
+    """
+    Статистика по абитуриентам. По умолчанию читается из счетчиков
+    applicant_stats_counters, с APPLICANT_STATS_MODE=query считается одним
+    GROUP BY по applicants.
+    """
+    if applicant_stats.COUNTERS_ENABLED:
+        counter = models.ApplicantStatsCounter
+        rows = db.query(counter.status, counter.program, counter.source, counter.count).filter(
+            counter.count != 0
+        ).all()
+    else:
+        rows = db.query(
+            models.Applicant.status, models.Applicant.program, models.Applicant.source,
+            func.count(models.Applicant.id)
+        ).group_by(models.Applicant.status, models.Applicant.program, models.Applicant.source).all()
+
+    by_status = defaultdict(int)
+    applicants_by_program = defaultdict(int)
+    applicants_by_source = defaultdict(int)
+    for status, program, source, count in rows:
+        by_status[status] += count
         if program:
-            applicants_by_program[program] = count
-    
-    applicants_by_source = {}
-    source_data = db.query(
-        models.Applicant.source, func.count(models.Applicant.id)
-    ).group_by(models.Applicant.source).all()
-    for source, count in source_data:
+            applicants_by_program[program] += count
         if source:
-            applicants_by_source[source] = count
-    
+            applicants_by_source[source] += count
+
     return schemas.ApplicantStatistics(
-        total_applicants=total_applicants,
-        new_applicants=new_applicants,
-        contacted_applicants=contacted_applicants,
-        enrolled_applicants=enrolled_applicants,
-        rejected_applicants=rejected_applicants,
-        applicants_by_program=applicants_by_program,
-        applicants_by_source=applicants_by_source
+        total_applicants=sum(by_status.values()),
+        new_applicants=by_status["new"],
+        contacted_applicants=by_status["contacted"],
+        enrolled_applicants=by_status["enrolled"],
+        rejected_applicants=by_status["rejected"],
+        applicants_by_program=dict(applicants_by_program),
+        applicants_by_source=dict(applicants_by_source)
     )
 
 # ============= ПРОГРАММЫ =============
@@ -373,70 +493,113 @@ def delete_program(db: Session, program_id: int) -> bool:
     db.commit()
     return True
 
-def get_grouped_applicants(
+def encode_group_cursor(phone: str, snils: str) -> str:
+    """Курсор страницы сгруппированных абитуриентов: ключ последней группы страницы"""
+    return base64.urlsafe_b64encode(json.dumps([phone, snils]).encode()).decode()
+
+def decode_group_cursor(cursor: str) -> Tuple[str, str]:
+    """Ключ группы из курсора; ValueError для некорректного курсора"""
+    try:
+        phone, snils = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError) as e:
+        raise ValueError("Некорректный курсор") from e
+    if not isinstance(phone, str) or not isinstance(snils, str):
+        raise ValueError("Некорректный курсор")
+    return phone, snils
+
+def _grouped_filters(status: Optional[str], program: Optional[str], source: Optional[str]) -> list:
+    conditions = []
+    if status:
+        conditions.append(models.Applicant.status == status)
+    if program:
+        conditions.append(models.Applicant.program == program)
+    if source:
+        conditions.append(models.Applicant.source == source)
+    return conditions
+
+def get_grouped_page(
     db: Session,
     status: Optional[str] = None,
     program: Optional[str] = None,
     source: Optional[str] = None,
+    after: Optional[Tuple[str, str]] = None,
     skip: int = 0,
-    limit: int = 100
-) -> List[schemas.GroupedApplicant]:
+    limit: int = 1000
+) -> Tuple[Optional[Tuple[Tuple[str, str], Tuple[str, str]]], Optional[str]]:
     """
-    Получить абитуриентов, сгруппированных по телефону и СНИЛС.
-    Каждый абитуриент возвращается один раз со списком всех его программ.
+    Ключи (телефон, СНИЛС) страницы сгруппированных абитуриентов после
+    ключа after. Возвращает первый и последний ключ страницы (None, если
+    страница пуста) и курсор следующей страницы (None, если она последняя).
+    Читаются только ключи из индекса ix_applicants_phone_snils_priority.
     """
-    # Получаем все записи абитуриентов
-    query = db.query(models.Applicant)
-    
-    if status:
-        query = query.filter(models.Applicant.status == status)
-    if program:
-        query = query.filter(models.Applicant.program == program)
-    if source:
-        query = query.filter(models.Applicant.source == source)
-    
-    all_applicants = query.order_by(models.Applicant.phone, models.Applicant.snils, models.Applicant.priority).all()
-    
-    # Группируем по телефону и СНИЛС
-    grouped_dict: Dict[str, Dict] = {}
-    
-    for applicant in all_applicants:
-        # Используем комбинацию телефона и СНИЛС как ключ
-        key = f"{applicant.phone}_{applicant.snils}"
-        
-        if key not in grouped_dict:
-            grouped_dict[key] = {
-                "phone": applicant.phone,
-                "snils": applicant.snils,
-                "name": applicant.name,
-                "email": applicant.email,
-                "applicant_id": applicant.applicant_id,
-                "max_user_id": applicant.max_user_id,
-                "programs": []
-            }
-        
-        # Добавляем программу в список
-        program_data = schemas.ApplicantProgram(
-            id=applicant.id,
-            program=applicant.program,
-            priority=applicant.priority,
-            status=applicant.status,
-            program_limit=applicant.program_limit,
-            exam_results=applicant.exam_results,
-            source=applicant.source,
-            comments=applicant.comments,
-            created_at=applicant.created_at,
-            updated_at=applicant.updated_at
-        )
-        grouped_dict[key]["programs"].append(program_data)
-    
-    # Преобразуем в список GroupedApplicant
-    grouped_list = [
-        schemas.GroupedApplicant(**data) for data in grouped_dict.values()
-    ]
-    
-    # Применяем пагинацию
-    return grouped_list[skip:skip + limit]
+    group_key = (models.Applicant.phone, models.Applicant.snils)
+    query = db.query(*group_key).filter(*_grouped_filters(status, program, source))
+    if after is not None:
+        query = query.filter(tuple_(*group_key) > tuple_(*after))
+    keys = query.group_by(*group_key).order_by(*group_key).offset(skip).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(keys) > limit:
+        keys = keys[:limit]
+        next_cursor = encode_group_cursor(*keys[-1])
+    if not keys:
+        return None, next_cursor
+    return (tuple(keys[0]), tuple(keys[-1])), next_cursor
+
+def grouped_applicants_query(
+    status: Optional[str],
+    program: Optional[str],
+    source: Optional[str],
+    first_key: Tuple[str, str],
+    last_key: Tuple[str, str]
+) -> Select:
+    """
+    Запрос групп абитуриентов с ключами от first_key до last_key включительно.
+    Каждая строка - JSON-текст объекта GroupedApplicant, собранный в
+    PostgreSQL: программы агрегируются в массив по приоритету, данные
+    абитуриента берутся из заявления с наивысшим приоритетом.
+    """
+    a = models.Applicant
+    by_priority = (a.priority, a.id)
+
+    def first(column):
+        return func.array_agg(aggregate_order_by(column, *by_priority))[1]
+
+    program_json = func.json_build_object(
+        "id", a.id,
+        "program", a.program,
+        "priority", a.priority,
+        "status", a.status,
+        "program_limit", a.program_limit,
+        "exam_results", a.exam_results,
+        "source", a.source,
+        "comments", a.comments,
+        "created_at", a.created_at,
+        "updated_at", a.updated_at,
+    )
+    group_json = func.json_build_object(
+        "phone", a.phone,
+        "snils", a.snils,
+        "name", first(a.name),
+        "email", first(a.email),
+        "applicant_id", first(a.applicant_id),
+        "max_user_id", first(a.max_user_id),
+        "programs", func.json_agg(aggregate_order_by(program_json, *by_priority)),
+    )
+    group_key = tuple_(a.phone, a.snils)
+    return (
+        select(cast(group_json, Text))
+        .where(*_grouped_filters(status, program, source))
+        .where(group_key >= tuple_(*first_key), group_key <= tuple_(*last_key))
+        .group_by(a.phone, a.snils)
+        .order_by(a.phone, a.snils)
+    )
+
+def _program_entry_id(value) -> Optional[int]:
+    """id записи из элемента списка программ; None - новая запись"""
+    if value is None or value == "null" or value == "":
+        return None
+    return int(value)
 
 def update_applicant_programs(
     db: Session,
@@ -447,6 +610,12 @@ def update_applicant_programs(
     Обновить программы и приоритеты абитуриента.
     programs: список словарей вида [{"id": 1, "program": "Программа 1", "priority": 1}, ...]
     Если id отсутствует или равен null, создается новая запись.
+
+    Записи абитуриента читаются одним запросом, итоговый набор проверяется
+    в памяти, затем удаления, обновления и вставки выполняются пакетными
+    запросами в одной транзакции. Уникальность программ и приоритетов
+    дополнительно гарантируют индексы (phone, snils, program) и
+    (phone, snils, priority).
     """
     # Проверка уникальности программ
     program_names = [p.get("program") for p in programs if p.get("program")]
@@ -458,135 +627,142 @@ def update_applicant_programs(
     if len(priorities) != len(set(priorities)):
         raise ValueError("Приоритеты должны быть уникальными для каждого абитуриента")
     
-    # Получаем первую существующую запись абитуриента для получения базовых данных
-    existing_applicant = db.query(models.Applicant).filter(
-        models.Applicant.phone == phone
-    ).first()
-    
-    if not existing_applicant:
+    # Все существующие записи абитуриента
+    existing = {
+        applicant.id: applicant
+        for applicant in db.query(models.Applicant).filter(
+            models.Applicant.phone == phone
+        ).order_by(models.Applicant.id)
+    }
+    if not existing:
         raise ValueError(f"Абитуриент с телефоном {phone} не найден")
+    base = next(iter(existing.values()))
     
-    # Получаем все существующие записи абитуриента
-    all_existing_applicants = db.query(models.Applicant).filter(
-        models.Applicant.phone == phone
-    ).all()
-    
-    # Собираем ID программ, которые должны остаться
-    programs_to_keep_ids = set()
-    for program_data in programs:
-        applicant_id = program_data.get("id")
-        if applicant_id is not None and applicant_id != "null" and applicant_id != "":
-            try:
-                applicant_id_int = int(applicant_id) if isinstance(applicant_id, str) else applicant_id
-                programs_to_keep_ids.add(applicant_id_int)
-            except (ValueError, TypeError):
-                pass
-    
-    # Удаляем программы, которых нет в новом списке
-    for existing_applicant_record in all_existing_applicants:
-        if existing_applicant_record.id not in programs_to_keep_ids:
-            db.delete(existing_applicant_record)
-    
-    updated_applicants = []
-    
+    now = datetime.now()
+    # Итоговое состояние: (id или None для новой записи, значения полей)
+    final = []
     for program_data in programs:
-        applicant_id = program_data.get("id")
-        
-        # Если есть ID (не None и не null) - обновляем существующую запись
-        if applicant_id is not None and applicant_id != "null" and applicant_id != "":
-            try:
-                # Преобразуем ID в int, если это возможно
-                applicant_id_int = int(applicant_id) if isinstance(applicant_id, str) else applicant_id
-                applicant = get_applicant_by_id(db, applicant_id_int)
-                if not applicant or applicant.phone != phone:
-                    continue
-            except (ValueError, TypeError):
-                # Если ID не может быть преобразован в int, пропускаем эту запись
-                continue
-            
-            # Проверка уникальности программы среди других записей этого абитуриента
-            if "program" in program_data:
-                existing = db.query(models.Applicant).filter(
-                    models.Applicant.phone == phone,
-                    models.Applicant.program == program_data["program"],
-                    models.Applicant.id != applicant_id_int
-                ).first()
-                if existing:
-                    raise ValueError(f"Программа '{program_data['program']}' уже существует у этого абитуриента")
-            
-            # Проверка уникальности приоритета среди других записей этого абитуриента
-            if "priority" in program_data:
-                existing = db.query(models.Applicant).filter(
-                    models.Applicant.phone == phone,
-                    models.Applicant.priority == program_data["priority"],
-                    models.Applicant.id != applicant_id_int
-                ).first()
-                if existing:
-                    raise ValueError(f"Приоритет {program_data['priority']} уже используется у этого абитуриента")
-            
-            # Обновляем программу и приоритет
-            if "program" in program_data:
-                applicant.program = program_data["program"]
-            if "priority" in program_data:
-                applicant.priority = program_data["priority"]
-            if "status" in program_data:
-                applicant.status = program_data["status"]
-            
-            applicant.updated_at = datetime.now()
-            updated_applicants.append(applicant)
+        try:
+            applicant_id = _program_entry_id(program_data.get("id"))
+        except (ValueError, TypeError):
+            # Если ID не может быть преобразован в int, пропускаем эту запись
+            continue
         
-        # Если нет ID - создаем новую запись
-        else:
-            # Проверка уникальности программы перед созданием
-            if "program" in program_data:
-                existing = db.query(models.Applicant).filter(
-                    models.Applicant.phone == phone,
-                    models.Applicant.program == program_data["program"]
-                ).first()
-                if existing:
-                    raise ValueError(f"Программа '{program_data['program']}' уже существует у этого абитуриента")
-            
-            # Проверка уникальности приоритета перед созданием
-            if "priority" in program_data:
-                existing = db.query(models.Applicant).filter(
-                    models.Applicant.phone == phone,
-                    models.Applicant.priority == program_data["priority"]
-                ).first()
-                if existing:
-                    raise ValueError(f"Приоритет {program_data['priority']} уже используется у этого абитуриента")
-            
-            # Находим максимальные баллы из всех существующих записей абитуриента
-            max_exam_results = db.query(func.max(models.Applicant.exam_results)).filter(
-                models.Applicant.phone == phone
-            ).scalar()
-            
-            # Создаем новую запись на основе существующей
-            new_applicant = models.Applicant(
-                applicant_id=str(uuid.uuid4())[:8].upper(),
-                max_user_id=existing_applicant.max_user_id,
-                name=existing_applicant.name,
-                phone=existing_applicant.phone,
-                email=existing_applicant.email,
-                snils=existing_applicant.snils,
-                program=program_data.get("program", ""),
-                priority=program_data.get("priority", 1),
-                status=program_data.get("status", "new"),
-                source=existing_applicant.source or "bot",
-                program_limit=None,
-                exam_results=max_exam_results,  # Копируем максимальные баллы из существующих записей
-                comments=None,
-                created_at=datetime.now(),
-                updated_at=datetime.now()
-            )
-            
-            db.add(new_applicant)
-            updated_applicants.append(new_applicant)
-    
-    db.commit()
+        if applicant_id is None:
+            final.append((None, {
+                "program": program_data.get("program", ""),
+                "priority": program_data.get("priority", 1),
+                "status": program_data.get("status", "new"),
+            }))
+        elif applicant_id in existing:
+            applicant = existing[applicant_id]
+            final.append((applicant_id, {
+                "program": program_data.get("program", applicant.program),
+                "priority": program_data.get("priority", applicant.priority),
+                "status": program_data.get("status", applicant.status),
+            }))
+    
+    # Проверка уникальности программ и приоритетов в итоговом наборе записей
+    # (по СНИЛС: новые записи получают СНИЛС первой записи абитуриента)
+    seen_programs, seen_priorities = set(), set()
+    for applicant_id, values in final:
+        snils = existing[applicant_id].snils if applicant_id is not None else base.snils
+        if (snils, values["program"]) in seen_programs:
+            raise ValueError(f"Программа '{values['program']}' уже существует у этого абитуриента")
+        if (snils, values["priority"]) in seen_priorities:
+            raise ValueError(f"Приоритет {values['priority']} уже используется у этого абитуриента")
+        seen_programs.add((snils, values["program"]))
+        seen_priorities.add((snils, values["priority"]))
+    
+    kept_ids = {applicant_id for applicant_id, _ in final if applicant_id is not None}
+    deleted_ids = [applicant_id for applicant_id in existing if applicant_id not in kept_ids]
+    updates = [dict(values, id=applicant_id, updated_at=now) for applicant_id, values in final if applicant_id is not None]
+    # Записи, у которых меняются программа или приоритет
+    moved_ids = [
+        row["id"] for row in updates
+        if (row["program"], row["priority"]) != (existing[row["id"]].program, existing[row["id"]].priority)
+    ]
     
-    # Обновляем объекты в сессии
-    for applicant in updated_applicants:
-        db.refresh(applicant)
+    # Максимальные баллы из всех существующих записей абитуриента
+    scores = [applicant.exam_results for applicant in existing.values() if applicant.exam_results is not None]
+    max_exam_results = max(scores) if scores else None
+    inserts = [
+        dict(
+            values,
+            applicant_id=str(uuid.uuid4())[:8].upper(),
+            max_user_id=base.max_user_id,
+            name=base.name,
+            phone=base.phone,
+            email=base.email,
+            snils=base.snils,
+            source=base.source or "bot",
+            program_limit=None,
+            exam_results=max_exam_results,  # Копируем максимальные баллы из существующих записей
+            comments=None,
+            created_at=now,
+            updated_at=now,
+        )
+        for applicant_id, values in final if applicant_id is None
+    ]
     
-    return updated_applicants
-
+    # Изменения счетчиков статистики и версия данных: bulk-запросы проходят в обход событий сессии
+    stats_removed = [
+        (applicant.status, applicant.program, applicant.source) for applicant in existing.values()
+    ]
+    stats_added = [
+        (row["status"], row["program"], existing[row["id"]].source) for row in updates
+    ] + [(row["status"], row["program"], row["source"]) for row in inserts]
+    # Прочитанное состояние: по нему ошибка индекса отличается от параллельного изменения
+    read_state = {applicant.id: (applicant.snils, applicant.program, applicant.priority) for applicant in existing.values()}
+    
+    try:
+        if deleted_ids:
+            db.execute(
+                delete(models.Applicant).where(models.Applicant.id.in_(deleted_ids)),
+                execution_options={"synchronize_session": False}
+            )
+        if moved_ids:
+            # Уникальные индексы проверяются построчно: сначала освобождаем старые
+            # программы и приоритеты временными значениями, иначе обмен
+            # приоритетами двух записей нарушит индекс на промежуточном шаге
+            db.execute(
+                update(models.Applicant),
+                [{"id": i, "program": f"#{i}", "priority": -i} for i in moved_ids]
+            )
+        if updates:
+            db.execute(update(models.Applicant), updates)
+        new_ids = []
+        if inserts:
+            new_ids = list(db.scalars(insert(models.Applicant).returning(models.Applicant.id, sort_by_parameter_order=True), inserts))
+        track_applicant_changes(db, {applicant.snils for applicant in existing.values()})
+        applicant_stats.record_changes(db, removed=stats_removed, added=stats_added)
+        data_version.bump(db)
+        db.commit()
+    except IntegrityError as e:
+        db.rollback()
+        current_state = {
+            row.id: (row.snils, row.program, row.priority)
+            for row in db.query(
+                models.Applicant.id, models.Applicant.snils, models.Applicant.program, models.Applicant.priority
+            ).filter(models.Applicant.phone == phone)
+        }
+        if current_state != read_state:
+            raise ValueError("Программы или приоритеты абитуриента были изменены параллельно, повторите запрос")
+        # Записи не менялись: запрос сам нарушает уникальность (например, приоритеты 1 и "1")
+        field = _duplicate_field(e)
+        if field == "program":
+            raise ValueError("Программы должны быть уникальными для каждого абитуриента")
+        if field == "priority":
+            raise ValueError("Приоритеты должны быть уникальными для каждого абитуриента")
+        raise
+    
+    # Итоговые записи в порядке запроса
+    new_ids = iter(new_ids)
+    result_ids = [applicant_id if applicant_id is not None else next(new_ids) for applicant_id, _ in final]
+    rows = {
+        applicant.id: applicant
+        for applicant in db.query(models.Applicant).filter(
+            models.Applicant.id.in_(result_ids)
+        ).execution_options(populate_existing=True)
+    }
+    return [rows[applicant_id] for applicant_id in result_ids]
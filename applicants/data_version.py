@@ -0,0 +1,65 @@
+"""
+Версия данных зачисления.
+
+В таблице data_versions хранится счетчик, который увеличивается в той же
+транзакции, что и любое изменение applicants или programs: после flush это
+делают события сессии, bulk-запросы вызывают bump явно. Пока версия не
+изменилась, результат расчета зачисления и Excel-файл прежней задачи
+остаются актуальными (см. enrollment_status.find_completed).
+
+Счетчик увеличивается один раз за транзакцию. Строка счетчика блокируется до
+конца транзакции, поэтому версия, прочитанная до расчета, никогда не
+оказывается новее данных, по которым он выполнен. Новое значение доступно в
+session.info["data_versions"] до конца транзакции (включая after_commit):
+по нему живой расчет отличает свои изменения от изменений других процессов.
+"""
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+import models
+
+ENROLLMENT_DATA = "enrollment"
+
+# Изменения этих моделей меняют результат зачисления
+VERSIONED_MODELS = (models.Applicant, models.Program)
+
+
+def current_version(db: Session, name: str = ENROLLMENT_DATA) -> int:
+    version = db.query(models.DataVersion.version).filter(models.DataVersion.name == name).scalar()
+    return version or 0
+
+
+def bump(session: Session, name: str = ENROLLMENT_DATA) -> None:
+    """Увеличить версию в текущей транзакции (не больше одного раза за транзакцию)"""
+    bumped = session.info.setdefault("data_versions_bumped", set())
+    if name in bumped:
+        return
+    dialect = session.get_bind().dialect.name
+    statement = (sqlite if dialect == "sqlite" else postgresql).insert(models.DataVersion).values(name=name, version=1)
+    statement = statement.on_conflict_do_update(
+        index_elements=["name"],
+        set_={"version": models.DataVersion.version + 1},
+    ).returning(models.DataVersion.version)
+    version = session.connection().execute(statement).scalar_one()
+    bumped.add(name)
+    session.info.setdefault("data_versions", {})[name] = version
+
+
+@event.listens_for(Session, "after_flush")
+def _bump_on_changes(session, flush_context):
+    for obj in (*session.new, *session.deleted):
+        if isinstance(obj, VERSIONED_MODELS):
+            bump(session)
+            return
+    for obj in session.dirty:
+        if isinstance(obj, VERSIONED_MODELS) and session.is_modified(obj):
+            bump(session)
+            return
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _reset(session, transaction):
+    if transaction.parent is None:
+        session.info.pop("data_versions_bumped", None)
+        session.info.pop("data_versions", None)
@@ -5,11 +5,21 @@
 Высший приоритет - наиболее высокий приоритет зачисления, по которому абитуриент 
 проходит по конкурсу в пределах установленного количества мест.
 """
-from typing import Dict, List, Set
-from collections import defaultdict
+import os
+from typing import Callable, Dict, Iterable, List, Optional
 from sqlalchemy.orm import Session
 import models
 
+# python - расчет над ORM-объектами, numpy - над столбцами (enrollment_kernel),
+# parallel - по независимым группам программ в пуле процессов (enrollment_parallel)
+ENROLLMENT_ENGINE = os.getenv("ENROLLMENT_ENGINE", "python")
+
+# Обратный вызов прогресса: (этап, обработано, всего). Этапы: "ranking" -
+# абитуриенты, прошедшие распределение мест, "excel" - строки, записанные в файл
+ProgressCallback = Callable[[str, int, int], None]
+# Прогресс сообщается раз в столько обработанных элементов
+PROGRESS_STEP = 10_000
+
 
 class EnrollmentResult:
     """Результат зачисления для одной программы"""
@@ -28,7 +38,7 @@ class EnrollmentResult:
         self.rejected.append(applicant)
 
 
-def calculate_enrollment(db: Session) -> Dict[str, EnrollmentResult]:
+def calculate_enrollment(db: Session, progress: Optional[ProgressCallback] = None) -> Dict[str, EnrollmentResult]:
     """
     Рассчитывает зачисление абитуриентов по алгоритму высшего приоритета.
     
@@ -41,7 +51,7 @@ def calculate_enrollment(db: Session) -> Dict[str, EnrollmentResult]:
        - Для каждого абитуриента находим его заявление с наивысшим приоритетом, 
          на программу которой еще есть свободные места
        - Если такое заявление найдено, зачисляем абитуриента на эту программу
-       - Удаляем этого абитуриента из всех других программ
+       - Иначе все его заявления попадают в списки не зачисленных
     5. Повторяем до тех пор, пока все бюджетные места не будут заняты или 
        не останется абитуриентов для зачисления
     
@@ -50,96 +60,85 @@ def calculate_enrollment(db: Session) -> Dict[str, EnrollmentResult]:
     
     Args:
         db: Сессия базы данных
+        progress: Обратный вызов прогресса распределения мест
         
     Returns:
         Словарь с результатами зачисления по программам
     """
+    if ENROLLMENT_ENGINE == "numpy":
+        from enrollment_kernel import calculate_enrollment_columnar
+        return calculate_enrollment_columnar(db, progress)
+
     programs = db.query(models.Program).filter(models.Program.is_active == 1).all()
-    program_dict = {p.name: p for p in programs}
-    
-    all_applicants = db.query(models.Applicant).filter(
+    # Порядок по id делает равные баллы детерминированными между пересчетами
+    applications = db.query(models.Applicant).filter(
         models.Applicant.status != "rejected"
-    ).all()
-    
-    applicants_by_snils: Dict[str, List[models.Applicant]] = defaultdict(list)
-    for applicant in all_applicants:
-        if applicant.program in program_dict:
-            applicants_by_snils[applicant.snils].append(applicant)
-    
-    for snils in applicants_by_snils:
-        applicants_by_snils[snils].sort(key=lambda x: x.priority)
+    ).order_by(models.Applicant.id).all()
+    if ENROLLMENT_ENGINE == "parallel":
+        from enrollment_parallel import allocate_parallel
+        return allocate_parallel(programs, applications, progress)
+    return allocate_highest_priority(programs, applications, progress)
 
-    unique_applicants = []
-    seen_snils = set()
-    
-    for applicant in all_applicants:
-        if applicant.snils not in seen_snils:
-            max_score_app = max(
-                [app for app in applicants_by_snils[applicant.snils]],
-                key=lambda x: (x.exam_results if x.exam_results is not None else 0)
-            )
-            unique_applicants.append((applicant.snils, max_score_app))
-            seen_snils.add(applicant.snils)
-    
 
-    unique_applicants.sort(
-        key=lambda x: (x[1].exam_results if x[1].exam_results is not None else 0),
-        reverse=True
-    )
-    
+def _score(application) -> int:
+    return application.exam_results if application.exam_results is not None else 0
+
+
+def allocate_highest_priority(
+    programs: Iterable,
+    applications: Iterable,
+    progress: Optional[ProgressCallback] = None,
+) -> Dict[str, EnrollmentResult]:
+    """
+    Зачисление по высшему приоритету за один проход по абитуриентам.
+
+    programs - активные программы (name, total_places), applications - заявления
+    (snils, program, priority, exam_results) в порядке, задающем очередность
+    при равных баллах. Время работы O(n log n) от числа заявлений.
+    """
     results: Dict[str, EnrollmentResult] = {}
-    budget_places = {}
-    for program_name, program in program_dict.items():
-        results[program_name] = EnrollmentResult(program_name, program.total_places)
-        budget_places[program_name] = program.total_places
-    
-    enrolled_snils: Set[str] = set()
+    free_places: Dict[str, int] = {}
+    for program in programs:
+        results[program.name] = EnrollmentResult(program.name, program.total_places)
+        free_places[program.name] = program.total_places
 
-    applicants_by_program: Dict[str, List[models.Applicant]] = defaultdict(list)
-    for applicant in all_applicants:
-        if applicant.program in program_dict:
-            applicants_by_program[applicant.program].append(applicant)
-    
-    for snils, _ in unique_applicants:
-        if snils in enrolled_snils:
+    # Заявления по SNILS; порядок ключей - первое появление SNILS среди всех заявлений
+    applications_by_snils: Dict[str, List] = {}
+    for application in applications:
+        snils_applications = applications_by_snils.setdefault(application.snils, [])
+        if application.program in results:
+            snils_applications.append(application)
+
+    candidates = []
+    for snils_applications in applications_by_snils.values():
+        # SNILS только с заявлениями на неактивные программы в конкурсе не участвует
+        if not snils_applications:
             continue
+        snils_applications.sort(key=lambda x: x.priority)
+        candidates.append((_score(max(snils_applications, key=_score)), snils_applications))
 
-        applicant_applications = applicants_by_snils[snils]
-
-        enrolled = False
-        for application in applicant_applications:
-            program_name = application.program
-            if program_name not in program_dict:
-                continue
-            
-            if budget_places[program_name] > 0:
-                results[program_name].add_enrolled(application)
-                enrolled_snils.add(snils)
-                budget_places[program_name] -= 1
-                enrolled = True
-
-                for other_program_name in applicants_by_program:
-                    if other_program_name != program_name:
-                        applicants_by_program[other_program_name] = [
-                            app for app in applicants_by_program[other_program_name]
-                            if app.snils != snils
-                        ]
-                
-                break
-
-        if not enrolled:
-            for application in applicant_applications:
-                program_name = application.program
-                if program_name in results:
-                    if application not in results[program_name].rejected:
-                        results[program_name].add_rejected(application)
-    
-    for program_name, applicants in applicants_by_program.items():
-        for applicant in applicants:
-            if applicant.snils not in enrolled_snils:
-                if applicant not in results[program_name].enrolled:
-                    if applicant not in results[program_name].rejected:
-                        results[program_name].add_rejected(applicant)
-    
-    return results
+    # Сортировка устойчивая: при равных баллах сохраняется исходный порядок
+    candidates.sort(key=lambda x: x[0], reverse=True)
+
+    programs_with_places = sum(1 for places in free_places.values() if places > 0)
+    for ranked, (_, snils_applications) in enumerate(candidates):
+        if progress and ranked % PROGRESS_STEP == 0:
+            progress("ranking", ranked, len(candidates))
+        enrolled_to: Optional[str] = None
+        if programs_with_places:
+            for application in snils_applications:
+                if free_places[application.program] > 0:
+                    enrolled_to = application.program
+                    results[enrolled_to].add_enrolled(application)
+                    free_places[enrolled_to] -= 1
+                    if free_places[enrolled_to] == 0:
+                        programs_with_places -= 1
+                    break
 
+        if enrolled_to is None:
+            for application in snils_applications:
+                results[application.program].add_rejected(application)
+
+    if progress:
+        progress("ranking", len(candidates), len(candidates))
+    return results
@@ -0,0 +1,279 @@
+"""
+Выполнение расчета зачисления в отдельном пуле процессов.
+
+Расчет и генерация Excel нагружают CPU, поэтому выполняются вне процесса
+uvicorn, в ProcessPoolExecutor из ENROLLMENT_JOB_WORKERS процессов. Статус
+задачи пишется в таблицу enrollment_jobs (см. enrollment_status), пока
+расчет идет, отдельный поток процесса обновляет время последней активности.
+
+Результаты по программам сохраняются снимком в enrollment_snapshot_programs:
+их можно читать без повторного расчета и без Excel-файла. Хранится только
+снимок последнего расчета: снимки завершенных ранее задач удаляются при
+сохранении нового.
+
+Движок расчета и генератор Excel сообщают прогресс обратным вызовом
+(JobProgress), который пишет его в строку задачи не чаще раза в
+ENROLLMENT_PROGRESS_INTERVAL_SECONDS; оттуда его читает SSE-эндпоинт.
+"""
+import json
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from enrollment_status import (
+    ENROLLMENT_JOB_HEARTBEAT_SECONDS,
+    FINISHED_STATUSES,
+    EnrollmentStatus,
+    status_manager,
+)
+
+ENROLLMENT_JOB_WORKERS = int(os.getenv("ENROLLMENT_JOB_WORKERS", "1"))
+ENROLLMENT_PROGRESS_INTERVAL_SECONDS = float(os.getenv("ENROLLMENT_PROGRESS_INTERVAL_SECONDS", "0.5"))
+# Дополнительные выгрузки к Excel через запятую: csv, parquet (columnar_export)
+ENROLLMENT_EXPORT_FORMATS = [
+    export_format.strip() for export_format in os.getenv("ENROLLMENT_EXPORT_FORMATS", "").split(",")
+    if export_format.strip()
+]
+
+EXCEL_DIR = Path("uploads/enrollment")
+
+
+# Диапазон общего прогресса задачи (в процентах) для каждого этапа
+STAGE_PROGRESS = {
+    "loading": (0, 10),
+    "ranking": (10, 50),
+    "snapshot": (50, 60),
+    "excel": (60, 90) if ENROLLMENT_EXPORT_FORMATS else (60, 99),
+    "export": (90, 99),
+}
+STAGE_MESSAGES = {
+    "ranking": "Распределение мест: {done} из {total} абитуриентов",
+    "excel": "Генерация Excel файла: {done} из {total} строк",
+    "export": "Выгрузка CSV/Parquet: {done} из {total} строк",
+}
+
+
+class JobProgress:
+    """Обратный вызов прогресса (enrollment.ProgressCallback) для задачи расчета"""
+
+    def __init__(self, task_id: str):
+        self.task_id = task_id
+        self._written_at = 0.0
+        self._programs: Dict[str, int] = {}
+
+    def __call__(self, stage: str, done: int, total: int) -> None:
+        if stage == "programs":
+            # Листы программ в Excel: пишутся вместе со следующим обновлением строк
+            self._programs = {"programs_done": done, "programs_total": total}
+            return
+        now = time.monotonic()
+        if done < total and now - self._written_at < ENROLLMENT_PROGRESS_INTERVAL_SECONDS:
+            return
+        self._written_at = now
+
+        low, high = STAGE_PROGRESS[stage]
+        percent = low + (high - low) * done // total if total else high
+        status_manager.update_status(
+            self.task_id,
+            EnrollmentStatus.PROCESSING,
+            progress=percent,
+            message=STAGE_MESSAGES[stage].format(done=done, total=total),
+            stage=stage,
+            processed=done,
+            total=total,
+            **self._programs
+        )
+
+    def start(self, stage: str, message: str) -> None:
+        """Начало этапа, у которого нет промежуточного прогресса"""
+        status_manager.update_status(
+            self.task_id,
+            EnrollmentStatus.PROCESSING,
+            progress=STAGE_PROGRESS[stage][0],
+            message=message,
+            stage=stage,
+            processed=0,
+            total=None
+        )
+
+
+def snapshot_rows(applicants: Iterable) -> List[Dict]:
+    """Строки списка зачисления для снимка, в порядке рейтинга"""
+    return [
+        {
+            "id": applicant.id,
+            "applicant_id": applicant.applicant_id,
+            "snils": applicant.snils,
+            "name": applicant.name,
+            "phone": applicant.phone,
+            "priority": applicant.priority,
+            "exam_results": applicant.exam_results,
+        }
+        for applicant in applicants
+    ]
+
+
+def save_snapshot(db, task_id: str, enrollment_results: Dict) -> None:
+    """
+    Сохранить результаты расчета по программам и удалить снимки прежних
+    задач: они относятся к устаревшим версиям данных (для текущей версии
+    готовая задача переиспользуется без нового расчета)
+    """
+    import models
+
+    running = db.query(models.EnrollmentJob.id).filter(
+        models.EnrollmentJob.status.notin_(FINISHED_STATUSES)
+    )
+    db.query(models.EnrollmentSnapshotProgram).filter(
+        models.EnrollmentSnapshotProgram.job_id != task_id,
+        models.EnrollmentSnapshotProgram.job_id.notin_(running.scalar_subquery()),
+    ).delete(synchronize_session=False)
+    db.add_all(
+        models.EnrollmentSnapshotProgram(
+            job_id=task_id,
+            program=program_name,
+            total_places=result.total_places,
+            enrolled=json.dumps(snapshot_rows(result.enrolled), ensure_ascii=False),
+            rejected=json.dumps(snapshot_rows(result.rejected), ensure_ascii=False),
+        )
+        for program_name, result in enrollment_results.items()
+    )
+    db.commit()
+
+
+def run_enrollment_job(task_id: str) -> None:
+    """Расчет зачисления и генерация Excel; выполняется в процессе пула"""
+    from database import SessionLocal
+    from enrollment import calculate_enrollment
+    from excel_generator import generate_enrollment_excel
+    from columnar_export import EXPORT_GENERATORS
+
+    stop_heartbeat = threading.Event()
+
+    def heartbeat():
+        while not stop_heartbeat.wait(ENROLLMENT_JOB_HEARTBEAT_SECONDS):
+            status_manager.heartbeat(task_id)
+
+    threading.Thread(target=heartbeat, daemon=True).start()
+
+    # Создаем новую сессию БД для расчета
+    db = SessionLocal()
+    progress = JobProgress(task_id)
+    try:
+        progress.start("loading", "Загрузка данных абитуриентов...")
+
+        # Рассчитываем зачисление
+        started = time.perf_counter()
+        enrollment_results = calculate_enrollment(db, progress)
+        calculation_seconds = time.perf_counter() - started
+
+        progress.start("snapshot", "Сохранение результатов...")
+        save_snapshot(db, task_id, enrollment_results)
+
+        status_manager.update_status(
+            task_id,
+            EnrollmentStatus.PROCESSING,
+            progress=STAGE_PROGRESS["excel"][0],
+            message="Генерация Excel файла...",
+            stage="excel",
+            processed=0,
+            total=None,
+            calculation_seconds=calculation_seconds
+        )
+
+        # Генерируем Excel файл
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        filename = f"enrollment_{timestamp}.xlsx"
+        file_path = EXCEL_DIR / filename
+
+        started = time.perf_counter()
+        generate_enrollment_excel(enrollment_results, str(file_path), progress)
+        excel_seconds = time.perf_counter() - started
+
+        # Выгрузки CSV/Parquet с тем же именем файла
+        exports = []
+        for export_format in ENROLLMENT_EXPORT_FORMATS:
+            progress.start("export", f"Выгрузка {export_format.upper()}...")
+            export_name = f"{file_path.stem}.{export_format}"
+            EXPORT_GENERATORS[export_format](enrollment_results, str(EXCEL_DIR / export_name), progress)
+            exports.append(f"/uploads/enrollment/{export_name}")
+
+        status_manager.update_status(
+            task_id,
+            EnrollmentStatus.COMPLETED,
+            progress=100,
+            message="Расчет завершен успешно!",
+            file_path=f"/uploads/enrollment/{filename}",
+            exports=json.dumps(exports) if exports else None,
+            excel_seconds=excel_seconds
+        )
+    except Exception as e:
+        status_manager.update_status(
+            task_id,
+            EnrollmentStatus.ERROR,
+            progress=0,
+            message="Ошибка при расчете",
+            error=str(e)
+        )
+    finally:
+        stop_heartbeat.set()
+        db.close()
+
+
+class EnrollmentJobRunner:
+    """Пул процессов для задач расчета зачисления"""
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # spawn: дочерний процесс не наследует потоки и соединения с БД процесса uvicorn
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._executor
+
+    def submit(self, task_id: str) -> Future:
+        future = self._get_executor().submit(run_enrollment_job, task_id)
+        future.add_done_callback(lambda f: self._on_done(task_id, f))
+        return future
+
+    def _on_done(self, task_id: str, future: Future) -> None:
+        if future.cancelled():
+            # Задача ждала в очереди при остановке сервиса (shutdown с cancel_futures)
+            # и не запускалась: без отметки она осталась бы в статусе pending
+            error = "Расчет отменен: сервис остановлен до начала расчета"
+        else:
+            # Ошибки внутри расчета записываются самой задачей; здесь - падение процесса
+            exception = future.exception()
+            if exception is None:
+                return
+            with self._lock:
+                self._executor = None
+            error = f"Процесс расчета завершился аварийно: {exception!r}"
+        status_manager.update_status(
+            task_id,
+            EnrollmentStatus.ERROR,
+            progress=0,
+            message="Ошибка при расчете",
+            error=error
+        )
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+job_runner = EnrollmentJobRunner(ENROLLMENT_JOB_WORKERS)
@@ -0,0 +1,144 @@
+"""
+Расчет зачисления по высшему приоритету над столбцами NumPy.
+
+Заявления загружаются одним SELECT целочисленных столбцов (без ORM-объектов):
+СНИЛС и программа кодируются в самом запросе, NULL заменяются через COALESCE.
+Ранжирование и упорядочивание выполняются векторно, распределение мест по
+своей природе последовательно и идет одним проходом по массивам.
+ORM используется только для итоговых списков EnrollmentResult.
+
+Результат совпадает с enrollment.allocate_highest_priority.
+"""
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import case, func
+from sqlalchemy.orm import Session
+
+import models
+from enrollment import PROGRESS_STEP, EnrollmentResult, ProgressCallback
+
+# Размер пачки id при загрузке итоговых заявлений через ORM
+MATERIALIZE_CHUNK_SIZE = 10_000
+# Приоритет для заявлений без приоритета: такие заявления рассматриваются последними
+MISSING_PRIORITY = 2 ** 31 - 1
+
+
+def allocate_columnar(
+    total_places: Sequence[int],
+    ids: np.ndarray,
+    snils_keys: np.ndarray,
+    programs: np.ndarray,
+    priorities: np.ndarray,
+    scores: np.ndarray,
+    progress: Optional[ProgressCallback] = None,
+) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """
+    total_places - места по программам; столбцы заявлений (int64):
+    ids - в порядке, задающем очередность при равных баллах;
+    snils_keys - ключ СНИЛС, возрастающий в порядке первого появления СНИЛС;
+    programs - индекс программы в total_places, -1 для неактивных программ.
+    Возвращает для каждой программы массивы id зачисленных и не зачисленных.
+    """
+    active = np.flatnonzero(programs >= 0)
+    ids = ids[active]
+    programs = programs[active]
+    priorities = priorities[active]
+    scores = scores[active]
+    _, snils_codes = np.unique(snils_keys[active], return_inverse=True)
+
+    # Лучший балл по СНИЛС; порядок абитуриентов - по убыванию балла,
+    # при равенстве - по первому появлению СНИЛС (коды возрастают в этом порядке)
+    snils_count = int(snils_codes.max()) + 1 if len(snils_codes) else 0
+    best = np.full(snils_count, np.iinfo(np.int64).min, dtype=np.int64)
+    np.maximum.at(best, snils_codes, scores)
+    rank = np.empty(snils_count, dtype=np.int64)
+    rank[np.lexsort((np.arange(snils_count), -best))] = np.arange(snils_count)
+
+    # Заявления по абитуриентам в порядке ранга, внутри - по приоритету
+    order = np.lexsort((np.arange(len(ids)), priorities, rank[snils_codes]))
+    group_of = rank[snils_codes][order]
+    starts = np.flatnonzero(np.r_[True, group_of[1:] != group_of[:-1]]) if len(order) else order
+    ends = np.r_[starts[1:], len(order)]
+
+    free_places = list(total_places)
+    programs_with_places = sum(1 for places in free_places if places > 0)
+    sorted_programs: List[int] = programs[order].tolist()
+    chosen = np.full(len(starts), -1, dtype=np.int64)
+    for group, (start, end) in enumerate(zip(starts.tolist(), ends.tolist())):
+        if not programs_with_places:
+            break
+        if progress and group % PROGRESS_STEP == 0:
+            progress("ranking", group, len(starts))
+        for k in range(start, end):
+            target = sorted_programs[k]
+            if free_places[target] > 0:
+                free_places[target] -= 1
+                if free_places[target] == 0:
+                    programs_with_places -= 1
+                chosen[group] = k
+                break
+
+    if progress:
+        progress("ranking", len(starts), len(starts))
+
+    enrolled = order[chosen[chosen >= 0]]
+    rejected = order[chosen[group_of] < 0]
+
+    enrolled_by_program = _split_by_program(ids[enrolled], programs[enrolled], len(total_places))
+    rejected_by_program = _split_by_program(ids[rejected], programs[rejected], len(total_places))
+    return list(zip(enrolled_by_program, rejected_by_program))
+
+
+def _split_by_program(ids: np.ndarray, programs: np.ndarray, program_count: int) -> List[np.ndarray]:
+    """Разложить id по программам с сохранением порядка"""
+    order = np.argsort(programs, kind="stable")
+    bounds = np.cumsum(np.bincount(programs, minlength=program_count))[:-1]
+    return np.split(ids[order], bounds)
+
+
+def load_columns(db: Session, program_names: Sequence[str]) -> Tuple[np.ndarray, ...]:
+    """Столбцы заявлений для allocate_columnar одним запросом"""
+    program_code = case(
+        {name: index for index, name in enumerate(program_names)},
+        value=models.Applicant.program,
+        else_=-1,
+    ) if program_names else -1
+    rows = db.query(
+        models.Applicant.id,
+        # Первый id заявления с этим СНИЛС: уникален для СНИЛС и задает порядок первого появления
+        func.min(models.Applicant.id).over(partition_by=models.Applicant.snils),
+        program_code,
+        func.coalesce(models.Applicant.priority, MISSING_PRIORITY),
+        func.coalesce(models.Applicant.exam_results, 0),
+    ).filter(models.Applicant.status != "rejected").order_by(models.Applicant.id).all()
+    if not rows:
+        return tuple(np.zeros(0, dtype=np.int64) for _ in range(5))
+    return tuple(np.asarray(column, dtype=np.int64) for column in zip(*rows))
+
+
+def calculate_enrollment_columnar(db: Session, progress: Optional[ProgressCallback] = None) -> Dict[str, EnrollmentResult]:
+    """Вариант calculate_enrollment для ENROLLMENT_ENGINE=numpy"""
+    programs = db.query(models.Program.name, models.Program.total_places).filter(
+        models.Program.is_active == 1
+    ).all()
+    allocation = allocate_columnar(
+        [places for _, places in programs],
+        *load_columns(db, [name for name, _ in programs]),
+        progress=progress,
+    )
+
+    needed = [i for pair in allocation for ids in pair for i in ids.tolist()]
+    applicants: Dict[int, models.Applicant] = {}
+    for offset in range(0, len(needed), MATERIALIZE_CHUNK_SIZE):
+        chunk = needed[offset:offset + MATERIALIZE_CHUNK_SIZE]
+        for applicant in db.query(models.Applicant).filter(models.Applicant.id.in_(chunk)):
+            applicants[applicant.id] = applicant
+
+    results: Dict[str, EnrollmentResult] = {}
+    for (name, total_places), (enrolled_ids, rejected_ids) in zip(programs, allocation):
+        result = EnrollmentResult(name, total_places)
+        result.enrolled = [applicants[i] for i in enrolled_ids.tolist()]
+        result.rejected = [applicants[i] for i in rejected_ids.tolist()]
+        results[name] = result
+    return results
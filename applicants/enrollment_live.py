@@ -0,0 +1,429 @@
+"""
+Живое состояние зачисления с инкрементальным пересчетом.
+
+Сервис хранит в памяти результат алгоритма высшего приоритета: порядок
+абитуриентов по баллам, решение по каждому СНИЛС и контрольные точки
+свободных мест (каждые CHECKPOINT_INTERVAL абитуриентов). При изменении
+заявлений пересчет начинается с наименьшей затронутой позиции и идет только
+до тех пор, пока счетчики свободных мест не совпадут с предыдущим расчетом -
+дальше решения гарантированно те же. Каждое примененное изменение
+публикуется как новая версия состояния.
+
+Изменения собираются событиями сессии SQLAlchemy (after_flush/after_commit)
+и применяются фоновой задачей раз в LIVE_ENROLLMENT_REFRESH_SECONDS.
+Результат совпадает с enrollment.allocate_highest_priority.
+
+События видны только в своем процессе, поэтому состояние сверяется с
+версией данных (data_version): при каждом обновлении и не реже раза в
+LIVE_ENROLLMENT_RECONCILE_SECONDS. Если версия в БД выросла на значения,
+которые не зафиксированы транзакциями этого процесса (другой воркер uvicorn,
+прямые запросы к БД), выполняется полный пересчет.
+"""
+import asyncio
+import bisect
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import event, inspect as sa_inspect
+from sqlalchemy.orm import Session
+
+import data_version
+import models
+
+LIVE_ENROLLMENT_ENABLED = os.getenv("LIVE_ENROLLMENT_ENABLED", "true").lower() == "true"
+LIVE_ENROLLMENT_REFRESH_SECONDS = float(os.getenv("LIVE_ENROLLMENT_REFRESH_SECONDS", "1"))
+# Как часто без локальных изменений проверять версию данных в БД, секунд
+LIVE_ENROLLMENT_RECONCILE_SECONDS = float(os.getenv("LIVE_ENROLLMENT_RECONCILE_SECONDS", "5"))
+CHECKPOINT_INTERVAL = 1024
+# Заявления без приоритета рассматриваются последними
+MISSING_PRIORITY = 2 ** 31 - 1
+
+# Поля заявления, от которых зависит зачисление
+TRACKED_FIELDS = ("snils", "program", "priority", "exam_results", "status")
+
+# (id, snils, program, priority, exam_results)
+Row = Tuple[int, str, str, Optional[int], Optional[int]]
+# (priority, id, program, exam_results)
+Application = Tuple[int, int, str, int]
+
+
+def _load_rows(db: Session, snils: Optional[Iterable[str]] = None) -> List[Row]:
+    query = db.query(
+        models.Applicant.id,
+        models.Applicant.snils,
+        models.Applicant.program,
+        models.Applicant.priority,
+        models.Applicant.exam_results,
+    ).filter(models.Applicant.status != "rejected")
+    if snils is not None:
+        query = query.filter(models.Applicant.snils.in_(list(snils)))
+    return [tuple(row) for row in query.order_by(models.Applicant.id)]
+
+
+def _load_programs(db: Session) -> List[Tuple[str, int]]:
+    rows = db.query(models.Program.name, models.Program.total_places).filter(
+        models.Program.is_active == 1
+    ).order_by(models.Program.id)
+    return [tuple(row) for row in rows]
+
+
+class LiveEnrollment:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending: Set[str] = set()
+        self._rebuild_requested = True
+        # Версии данных, зафиксированные транзакциями этого процесса и еще не сверенные
+        self._local_versions: Set[int] = set()
+
+        self.version = 0
+        # Версия данных в БД, которой соответствует состояние, и время последней сверки
+        self.data_version = 0
+        self.checked_at: Optional[datetime] = None
+        self.updated_at: Optional[datetime] = None
+        self.last_update: Dict[str, int] = {}
+
+        self.programs: Dict[str, int] = {}
+        self.applications: Dict[str, List[Application]] = {}
+        self.snils_by_application: Dict[int, str] = {}
+        self.keys: Dict[str, Tuple[int, int]] = {}
+        # Абитуриенты в порядке обработки: ключ (-лучший балл, первый id заявления)
+        self.order_keys: List[Tuple[int, int]] = []
+        self.order_snils: List[str] = []
+        # СНИЛС -> (id заявления, программа) зачисления или None
+        self.decisions: Dict[str, Optional[Tuple[int, str]]] = {}
+        # checkpoints[c] - свободные места перед абитуриентом c * CHECKPOINT_INTERVAL
+        self.checkpoints: List[Dict[str, int]] = []
+        self._summary: Optional[dict] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.version > 0
+
+    # ---------- отслеживание изменений ----------
+
+    def mark_changed(self, snils: Iterable[str]) -> None:
+        with self._lock:
+            self._pending.update(snils)
+
+    def request_rebuild(self) -> None:
+        with self._lock:
+            self._rebuild_requested = True
+
+    def mark_local_version(self, version: int) -> None:
+        """Версия данных, зафиксированная транзакцией этого процесса"""
+        with self._lock:
+            self._local_versions.add(version)
+
+    def has_pending(self) -> bool:
+        return self._rebuild_requested or bool(self._pending)
+
+    def refresh(self, db: Session) -> Optional[int]:
+        """
+        Применить накопленные изменения и сверить состояние с версией данных
+        в БД; возвращает новую версию состояния или None
+        """
+        db_version = data_version.current_version(db)
+        with self._lock:
+            rebuild = self._rebuild_requested
+            touched = self._pending
+            self._rebuild_requested = False
+            self._pending = set()
+            # Все версии после сверенной должны быть зафиксированы в этом процессе
+            local = sum(1 for version in self._local_versions if self.data_version < version <= db_version)
+            if db_version < self.data_version or local != db_version - self.data_version:
+                rebuild = True
+            self._local_versions = {version for version in self._local_versions if version > db_version}
+            self.data_version = db_version
+            self.checked_at = datetime.now()
+        if rebuild:
+            programs = _load_programs(db)
+            rows = _load_rows(db)
+            with self._lock:
+                self.build(programs, rows)
+        elif touched:
+            rows = _load_rows(db, touched)
+            with self._lock:
+                self.apply(touched, rows)
+        else:
+            return None
+        return self.version
+
+    # ---------- расчет ----------
+
+    def build(self, programs: Sequence[Tuple[str, int]], rows: Sequence[Row]) -> None:
+        """Полный расчет"""
+        self.programs = dict(programs)
+        self.applications = {}
+        self.snils_by_application = {}
+        self.keys = {}
+        self.decisions = {}
+
+        first_ids: Dict[str, int] = {}
+        for row in rows:
+            self._add_row(row, first_ids)
+        for snils, first_id in first_ids.items():
+            self._set_key(snils, first_id)
+
+        ordered = sorted((key, snils) for snils, key in self.keys.items())
+        self.order_keys = [key for key, _ in ordered]
+        self.order_snils = [snils for _, snils in ordered]
+        self.checkpoints = [dict(self.programs)]
+
+        replayed, changed = self._replay({}, start=0, stop_after=None, shifted=False)
+        self._publish(replayed=replayed, changed=changed, touched=len(self.keys))
+
+    def apply(self, touched: Set[str], rows: Sequence[Row]) -> None:
+        """Пересчет после изменения заявлений абитуриентов с СНИЛС из touched"""
+        delta: Dict[str, int] = {}
+        old_positions = []
+        for snils in touched:
+            key = self.keys.pop(snils, None)
+            if key is not None:
+                old_positions.append(bisect.bisect_left(self.order_keys, key))
+            decision = self.decisions.pop(snils, None)
+            if decision is not None:
+                delta[decision[1]] = delta.get(decision[1], 0) - 1
+            for _, application_id, _, _ in self.applications.pop(snils, []):
+                self.snils_by_application.pop(application_id, None)
+
+        old_count = len(self.order_keys)
+        for position in sorted(old_positions, reverse=True):
+            del self.order_keys[position]
+            del self.order_snils[position]
+
+        first_ids: Dict[str, int] = {}
+        for row in rows:
+            self._add_row(row, first_ids)
+        new_positions = []
+        for snils, first_id in first_ids.items():
+            if self._set_key(snils, first_id):
+                key = self.keys[snils]
+                position = bisect.bisect_left(self.order_keys, key)
+                self.order_keys.insert(position, key)
+                self.order_snils.insert(position, snils)
+
+        for snils in first_ids:
+            if snils in self.keys:
+                new_positions.append(bisect.bisect_left(self.order_keys, self.keys[snils]))
+
+        positions = old_positions + new_positions
+        if not positions:
+            return
+        start = min(positions)
+        # Сходимость проверяется только после всех старых и новых позиций затронутых СНИЛС
+        stop_after = max(
+            max(old_positions, default=-1) + len(touched),
+            max(new_positions, default=-1),
+        )
+        shifted = len(self.order_keys) != old_count
+        replayed, changed = self._replay(delta, start=start, stop_after=stop_after, shifted=shifted)
+        self._publish(replayed=replayed, changed=changed, touched=len(touched))
+
+    def _add_row(self, row: Row, first_ids: Dict[str, int]) -> None:
+        application_id, snils, program, priority, exam_results = row
+        # Порядок при равных баллах задает первое заявление СНИЛС, в том числе на неактивную программу
+        first_ids.setdefault(snils, application_id)
+        if program not in self.programs:
+            return
+        self.applications.setdefault(snils, []).append((
+            priority if priority is not None else MISSING_PRIORITY,
+            application_id,
+            program,
+            exam_results if exam_results is not None else 0,
+        ))
+        self.snils_by_application[application_id] = snils
+
+    def _set_key(self, snils: str, first_id: int) -> bool:
+        applications = self.applications.get(snils)
+        if not applications:
+            self.applications.pop(snils, None)
+            return False
+        applications.sort()
+        best = max(score for _, _, _, score in applications)
+        self.keys[snils] = (-best, first_id)
+        return True
+
+    def _replay(self, delta: Dict[str, int], start: int, stop_after: Optional[int], shifted: bool) -> Tuple[int, int]:
+        """
+        Пересчитать решения начиная с позиции start. delta - разница занятых мест
+        (новый расчет минус прежний) по уже учтенным абитуриентам.
+        Возвращает число пересчитанных абитуриентов и число изменившихся решений.
+        """
+        checkpoint = min(start // CHECKPOINT_INTERVAL, len(self.checkpoints) - 1)
+        free = dict(self.checkpoints[checkpoint])
+        for index in range(checkpoint * CHECKPOINT_INTERVAL, start):
+            self._save_checkpoint(index, free)
+            decision = self.decisions.get(self.order_snils[index])
+            if decision is not None:
+                free[decision[1]] -= 1
+
+        changed = 0
+        index = start
+        total = len(self.order_snils)
+        while index < total:
+            self._save_checkpoint(index, free)
+            snils = self.order_snils[index]
+            old = self.decisions.get(snils)
+            new = None
+            for _, application_id, program, _ in self.applications[snils]:
+                if free[program] > 0:
+                    free[program] -= 1
+                    new = (application_id, program)
+                    break
+            if new != old:
+                changed += 1
+                self.decisions[snils] = new
+                if old is not None:
+                    delta[old[1]] = delta.get(old[1], 0) - 1
+                    if not delta[old[1]]:
+                        del delta[old[1]]
+                if new is not None:
+                    delta[new[1]] = delta.get(new[1], 0) + 1
+                    if not delta[new[1]]:
+                        del delta[new[1]]
+            index += 1
+            if stop_after is not None and index > stop_after and not delta:
+                break
+
+        if shifted:
+            # Позиции дальше сдвинулись: контрольные точки за пройденным участком
+            # устарели и будут заново записаны при следующих проходах
+            del self.checkpoints[max(1, -(-index // CHECKPOINT_INTERVAL)):]
+        return index - start, changed
+
+    def _save_checkpoint(self, index: int, free: Dict[str, int]) -> None:
+        if index % CHECKPOINT_INTERVAL:
+            return
+        checkpoint = index // CHECKPOINT_INTERVAL
+        if checkpoint < len(self.checkpoints):
+            self.checkpoints[checkpoint] = dict(free)
+        elif checkpoint == len(self.checkpoints):
+            self.checkpoints.append(dict(free))
+
+    def _publish(self, replayed: int, changed: int, touched: int) -> None:
+        self.version += 1
+        self.updated_at = datetime.now()
+        self.last_update = {"touched": touched, "replayed": replayed, "changed": changed}
+        self._summary = None
+
+    # ---------- чтение ----------
+
+    def summary(self) -> dict:
+        with self._lock:
+            if self._summary is None:
+                enrolled = {name: 0 for name in self.programs}
+                passing_scores: Dict[str, Optional[int]] = {name: None for name in self.programs}
+                for snils, decision in self.decisions.items():
+                    if decision is None:
+                        continue
+                    program = decision[1]
+                    enrolled[program] += 1
+                    score = -self.keys[snils][0]
+                    if passing_scores[program] is None or score < passing_scores[program]:
+                        passing_scores[program] = score
+                self._summary = {
+                    "version": self.version,
+                    "updated_at": self.updated_at,
+                    "last_update": dict(self.last_update),
+                    "programs": [
+                        {
+                            "program": name,
+                            "total_places": total_places,
+                            "enrolled": enrolled[name],
+                            "free_places": max(total_places - enrolled[name], 0),
+                            "passing_score": passing_scores[name],
+                        }
+                        for name, total_places in self.programs.items()
+                    ],
+                }
+            return dict(self._summary, data_version=self.data_version, checked_at=self.checked_at)
+
+    def application_status(self, application_id: int) -> Optional[dict]:
+        with self._lock:
+            snils = self.snils_by_application.get(application_id)
+            if snils is None:
+                return None
+            decision = self.decisions.get(snils)
+            program = next(p for _, a, p, _ in self.applications[snils] if a == application_id)
+            return {
+                "version": self.version,
+                "applicant_id": application_id,
+                "program": program,
+                "passing": decision is not None and decision[0] == application_id,
+                "enrolled_program": decision[1] if decision is not None else None,
+                "position": bisect.bisect_left(self.order_keys, self.keys[snils]) + 1,
+                "score": -self.keys[snils][0],
+            }
+
+
+live_enrollment = LiveEnrollment()
+
+
+# ---------- события сессии ----------
+
+@event.listens_for(Session, "after_flush")
+def _collect_changes(session, flush_context):
+    touched = session.info.setdefault("enrollment_touched", set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, models.Program):
+            session.info["enrollment_rebuild"] = True
+        elif isinstance(obj, models.Applicant):
+            state = sa_inspect(obj)
+            if obj in session.dirty and not any(
+                state.attrs[field].history.has_changes() for field in TRACKED_FIELDS
+            ):
+                continue
+            touched.add(obj.snils)
+            # При смене СНИЛС пересчитывается и прежний
+            touched.update(state.attrs.snils.history.deleted or ())
+
+
+def track_applicant_changes(session: Session, snils: Iterable[str]) -> None:
+    """Отметить изменение заявлений, сделанное bulk-запросами в обход flush"""
+    session.info.setdefault("enrollment_touched", set()).update(snils)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_changes(session):
+    version = session.info.get("data_versions", {}).get(data_version.ENROLLMENT_DATA)
+    if version is not None:
+        live_enrollment.mark_local_version(version)
+    if session.info.pop("enrollment_rebuild", False):
+        live_enrollment.request_rebuild()
+    touched = session.info.pop("enrollment_touched", None)
+    if touched:
+        live_enrollment.mark_changed(touched)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changes(session):
+    session.info.pop("enrollment_rebuild", None)
+    session.info.pop("enrollment_touched", None)
+
+
+async def run_live_enrollment(session_factory) -> None:
+    """Фоновая задача: применяет накопленные изменения и публикует новые версии"""
+    def refresh():
+        db = session_factory()
+        try:
+            return live_enrollment.refresh(db)
+        finally:
+            db.close()
+
+    last_check = 0.0
+    while True:
+        # Без локальных изменений версия данных сверяется реже
+        if live_enrollment.has_pending() or time.monotonic() - last_check >= LIVE_ENROLLMENT_RECONCILE_SECONDS:
+            last_check = time.monotonic()
+            try:
+                version = await run_in_threadpool(refresh)
+                if version == 1:
+                    print(f"✅ Applicants Service: live enrollment ready ({len(live_enrollment.keys)} applicants)")
+            except Exception as e:
+                print(f"❌ Live enrollment refresh failed: {e}")
+                live_enrollment.request_rebuild()
+        await asyncio.sleep(LIVE_ENROLLMENT_REFRESH_SECONDS)
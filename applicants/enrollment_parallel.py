@@ -0,0 +1,227 @@
+"""
+Параллельный расчет зачисления по независимым группам программ.
+
+Заявления влияют друг на друга только через общий СНИЛС (абитуриент
+зачисляется на одну из своих программ) и общую программу (конкурс за ее
+места). Поэтому программы, связанные абитуриентами, образуют компоненты
+связности, и зачисление в разных компонентах не зависит друг от друга.
+Компоненты находятся системой непересекающихся множеств по программам,
+рассчитываются enrollment.allocate_highest_priority в пуле процессов и
+собираются обратно в порядке программ.
+
+Результат совпадает с однопоточным расчетом: в компоненту попадают все
+заявления ее СНИЛС в исходном порядке (включая заявления на неактивные
+программы, от которых зависит очередность при равных баллах), а порядок
+абитуриентов разных компонент на списки программ не влияет.
+
+Выигрыш есть, только если абитуриенты подают заявления в пределах групп
+программ (например, факультетов). Если все программы связаны, остается одна
+компонента и расчет выполняется в текущем процессе.
+"""
+import heapq
+import multiprocessing
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from enrollment import EnrollmentResult, ProgressCallback, allocate_highest_priority
+
+# Процессов расчета; 0 - по числу ядер
+ENROLLMENT_PARALLEL_WORKERS = int(os.getenv("ENROLLMENT_PARALLEL_WORKERS", "0")) or os.cpu_count() or 1
+# Меньше заявлений считается в текущем процессе: запуск пула (импорт модулей в
+# каждом процессе, около секунды) дороже расчета
+ENROLLMENT_PARALLEL_MIN_APPLICATIONS = int(os.getenv("ENROLLMENT_PARALLEL_MIN_APPLICATIONS", "500000"))
+# Пачек компонент на процесс: мелкие компоненты объединяются, крупные распределяются равномерно
+BATCHES_PER_WORKER = 4
+
+# Программа и заявление в процессе расчета: СНИЛС и программа - целочисленные коды
+_Program = namedtuple("_Program", "name total_places")
+_Application = namedtuple("_Application", "index snils program priority exam_results")
+
+
+class Component:
+    """
+    Группа программ, связанных общими абитуриентами, и заявления ее СНИЛС
+    столбцами: positions - индексы в исходном списке заявлений, snils - коды
+    СНИЛС, programs - индексы программ (-1 для неактивных)
+    """
+    __slots__ = ("program_indices", "positions", "snils", "programs", "priorities", "scores", "candidates")
+
+    def __init__(self):
+        self.program_indices: List[int] = []
+        self.positions: List[int] = []
+        self.snils: List[int] = []
+        self.programs: List[int] = []
+        self.priorities: List = []
+        self.scores: List = []
+        self.candidates = 0
+
+
+class _DisjointSet:
+    """Система непересекающихся множеств; корень - наименьший элемент"""
+
+    def __init__(self, size: int):
+        self.parent = list(range(size))
+
+    def find(self, item: int) -> int:
+        parent = self.parent
+        root = item
+        while parent[root] != root:
+            root = parent[root]
+        # Сжатие пути
+        while parent[item] != root:
+            parent[item], item = root, parent[item]
+        return root
+
+    def union(self, first: int, second: int) -> None:
+        first, second = self.find(first), self.find(second)
+        if first != second:
+            self.parent[max(first, second)] = min(first, second)
+
+
+def split_components(programs: Sequence, applications: Sequence) -> List[Component]:
+    """
+    Компоненты связности программ в порядке первой программы. СНИЛС только
+    с заявлениями на неактивные программы в конкурсе не участвуют и ни в
+    одну компоненту не входят.
+    """
+    program_index = {program.name: index for index, program in enumerate(programs)}
+    application_programs = [program_index.get(application.program, -1) for application in applications]
+    snils_codes: Dict[str, int] = {}
+    application_snils = [snils_codes.setdefault(application.snils, len(snils_codes)) for application in applications]
+
+    # Первая активная программа СНИЛС; остальные его программы связываются с ней.
+    # Различных пар программ на порядки меньше, чем заявлений
+    first_program = [-1] * len(snils_codes)
+    edges = set()
+    for code, index in zip(application_snils, application_programs):
+        if index < 0:
+            continue
+        first = first_program[code]
+        if first < 0:
+            first_program[code] = index
+        elif first != index:
+            edges.add((first, index))
+    sets = _DisjointSet(len(programs))
+    for first, index in edges:
+        sets.union(first, index)
+
+    components: Dict[int, Component] = {}
+    roots = [sets.find(index) for index in range(len(programs))]
+    for index, root in enumerate(roots):
+        components.setdefault(root, Component()).program_indices.append(index)
+    component_of = [components[roots[first]] if first >= 0 else None for first in first_program]
+    for component in component_of:
+        if component is not None:
+            component.candidates += 1
+    for position, code in enumerate(application_snils):
+        component = component_of[code]
+        if component is not None:
+            component.positions.append(position)
+
+    for component in components.values():
+        positions = component.positions
+        component.snils = [application_snils[position] for position in positions]
+        component.programs = [application_programs[position] for position in positions]
+        component.priorities = [applications[position].priority for position in positions]
+        component.scores = [applications[position].exam_results for position in positions]
+    return list(components.values())
+
+
+def _batches(components: List[Component], count: int) -> List[List[Component]]:
+    """Жадное распределение компонент по count пачкам: крупные - в наименее загруженные"""
+    heap = [(0, index, []) for index in range(count)]
+    for component in sorted(components, key=lambda c: len(c.positions), reverse=True):
+        load, index, batch = heapq.heappop(heap)
+        batch.append(component)
+        heapq.heappush(heap, (load + len(component.positions), index, batch))
+    return [batch for _, _, batch in sorted(heap, key=lambda item: item[1]) if batch]
+
+
+def _allocate_batch(batch: List[Tuple]) -> List[List[Tuple[int, List[int], List[int]]]]:
+    """
+    Выполняется в процессе пула: расчет компонент пачки. Для каждой
+    компоненты - (индекс программы, номера зачисленных и не зачисленных
+    заявлений в компоненте)
+    """
+    allocations = []
+    for program_indices, total_places, snils, programs, priorities, scores in batch:
+        results = allocate_highest_priority(
+            [_Program(*program) for program in zip(program_indices, total_places)],
+            [_Application(*application) for application in zip(range(len(snils)), snils, programs, priorities, scores)],
+        )
+        allocations.append([
+            (
+                index,
+                [application.index for application in result.enrolled],
+                [application.index for application in result.rejected],
+            )
+            for index, result in results.items()
+        ])
+    return allocations
+
+
+def allocate_parallel(
+    programs: Sequence,
+    applications: Sequence,
+    progress: Optional[ProgressCallback] = None,
+    workers: int = ENROLLMENT_PARALLEL_WORKERS,
+) -> Dict[str, EnrollmentResult]:
+    """
+    То же, что enrollment.allocate_highest_priority, с расчетом компонент
+    связности в workers процессах. Списки EnrollmentResult содержат
+    исходные объекты applications.
+    """
+    programs = list(programs)
+    applications = list(applications)
+    components = split_components(programs, applications)
+    if workers <= 1 or len(components) <= 1 or len(applications) < ENROLLMENT_PARALLEL_MIN_APPLICATIONS:
+        return allocate_highest_priority(programs, applications, progress)
+
+    batches = _batches(components, workers * BATCHES_PER_WORKER)
+    total_candidates = sum(component.candidates for component in components)
+    # Индекс программы -> (зачисленные, не зачисленные) как исходные заявления
+    allocations: Dict[int, Tuple[List, List]] = {}
+    done = 0
+    if progress:
+        progress("ranking", 0, total_candidates)
+    # spawn: процесс расчета держит соединение с БД, дочерние процессы его не наследуют
+    with ProcessPoolExecutor(
+        max_workers=min(workers, len(batches)),
+        mp_context=multiprocessing.get_context("spawn"),
+    ) as executor:
+        futures = {}
+        for batch in batches:
+            payload = [
+                (
+                    component.program_indices,
+                    [programs[index].total_places for index in component.program_indices],
+                    component.snils,
+                    component.programs,
+                    component.priorities,
+                    component.scores,
+                )
+                for component in batch
+            ]
+            futures[executor.submit(_allocate_batch, payload)] = batch
+        for future in as_completed(futures):
+            batch = futures[future]
+            for component, component_allocations in zip(batch, future.result()):
+                positions = component.positions
+                for index, enrolled, rejected in component_allocations:
+                    allocations[index] = (
+                        [applications[positions[number]] for number in enrolled],
+                        [applications[positions[number]] for number in rejected],
+                    )
+                done += component.candidates
+            if progress:
+                progress("ranking", done, total_candidates)
+
+    # Сборка в порядке программ, независимо от порядка завершения пачек
+    results: Dict[str, EnrollmentResult] = {}
+    for index, program in enumerate(programs):
+        result = EnrollmentResult(program.name, program.total_places)
+        result.enrolled, result.rejected = allocations[index]
+        results[program.name] = result
+    return results
@@ -1,10 +1,28 @@
 """
 Модуль для отслеживания статуса расчета зачисления.
+
+Статусы хранятся в таблице enrollment_jobs, поэтому видны из любого воркера
+uvicorn и из процессов, выполняющих расчет, и переживают перезапуск сервиса.
 """
+import json
+import os
+import uuid
+from datetime import datetime, timedelta
 from enum import Enum
-from typing import Optional, Dict
-from datetime import datetime
-import threading
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy.exc import IntegrityError
+
+import models
+from database import SessionLocal
+
+# Процесс расчета обновляет updated_at задачи с этим интервалом
+ENROLLMENT_JOB_HEARTBEAT_SECONDS = int(os.getenv("ENROLLMENT_JOB_HEARTBEAT_SECONDS", "15"))
+# Задача без обновлений дольше этого времени считается прерванной
+ENROLLMENT_JOB_STALE_SECONDS = int(os.getenv("ENROLLMENT_JOB_STALE_SECONDS", "120"))
+
+# Значение active_key у выполняющегося расчета зачисления
+ACTIVE_ENROLLMENT_KEY = "enrollment"
 
 
 class EnrollmentStatus(str, Enum):
@@ -15,26 +33,74 @@ class EnrollmentStatus(str, Enum):
     ERROR = "error"
 
 
+FINISHED_STATUSES = (EnrollmentStatus.COMPLETED.value, EnrollmentStatus.ERROR.value)
+
+
+def _as_dict(job: models.EnrollmentJob) -> Dict:
+    return {
+        "task_id": job.id,
+        "status": job.status,
+        "progress": job.progress,
+        "message": job.message,
+        "file_path": job.file_path,
+        "exports": json.loads(job.exports) if job.exports else [],
+        "error": job.error,
+        "created_at": job.created_at.isoformat(),
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "completed_at": job.completed_at.isoformat() if job.completed_at else None,
+        "calculation_seconds": job.calculation_seconds,
+        "excel_seconds": job.excel_seconds,
+        "data_version": job.data_version,
+        "stage": job.stage,
+        "processed": job.processed,
+        "total": job.total,
+        "programs_done": job.programs_done,
+        "programs_total": job.programs_total,
+    }
+
+
 class EnrollmentStatusManager:
     """Менеджер для отслеживания статуса расчета зачисления"""
-    
-    def __init__(self):
-        self._status: Dict[str, Dict] = {}
-        self._lock = threading.Lock()
-    
-    def create_task(self, task_id: str) -> None:
-        """Создать новую задачу"""
-        with self._lock:
-            self._status[task_id] = {
-                "status": EnrollmentStatus.PENDING,
-                "progress": 0,
-                "message": "Ожидание начала расчета...",
-                "file_path": None,
-                "error": None,
-                "created_at": datetime.now().isoformat(),
-                "completed_at": None
-            }
-    
+
+    def create_task(self, data_version: Optional[int] = None) -> Tuple[str, bool]:
+        """
+        Создать задачу расчета для версии данных data_version. Если расчет уже
+        ожидает или выполняется, новая задача не создается. Возвращает
+        (task_id, создана ли задача).
+        """
+        db = SessionLocal()
+        try:
+            for _ in range(2):
+                now = datetime.now()
+                job = models.EnrollmentJob(
+                    id=str(uuid.uuid4()),
+                    status=EnrollmentStatus.PENDING.value,
+                    progress=0,
+                    message="Ожидание начала расчета...",
+                    active_key=ACTIVE_ENROLLMENT_KEY,
+                    data_version=data_version,
+                    created_at=now,
+                    updated_at=now,
+                )
+                db.add(job)
+                try:
+                    db.commit()
+                    return job.id, True
+                except IntegrityError:
+                    db.rollback()
+
+                active = db.query(models.EnrollmentJob).filter(
+                    models.EnrollmentJob.active_key == ACTIVE_ENROLLMENT_KEY
+                ).first()
+                if active is None:
+                    continue
+                if active.updated_at >= now - timedelta(seconds=ENROLLMENT_JOB_STALE_SECONDS):
+                    return active.id, False
+                self._mark_interrupted(db, active)
+            raise RuntimeError("Could not create enrollment job")
+        finally:
+            db.close()
+
     def update_status(
         self,
         task_id: str,
@@ -42,41 +108,125 @@ class EnrollmentStatusManager:
         progress: Optional[int] = None,
         message: Optional[str] = None,
         file_path: Optional[str] = None,
-        error: Optional[str] = None
+        error: Optional[str] = None,
+        **fields
     ) -> None:
-        """Обновить статус задачи"""
-        with self._lock:
-            if task_id not in self._status:
+        """
+        Обновить статус задачи; fields - прочие столбцы задачи
+        (calculation_seconds, excel_seconds, stage, processed, total, ...)
+        """
+        db = SessionLocal()
+        try:
+            job = db.query(models.EnrollmentJob).filter(models.EnrollmentJob.id == task_id).first()
+            if not job:
                 return
-            
+
+            now = datetime.now()
             if status:
-                self._status[task_id]["status"] = status
-            
+                job.status = status.value
+                if status == EnrollmentStatus.PROCESSING and job.started_at is None:
+                    job.started_at = now
+                if status.value in FINISHED_STATUSES:
+                    job.completed_at = now
+                    job.active_key = None
+
             if progress is not None:
-                self._status[task_id]["progress"] = progress
-            
+                job.progress = progress
+
             if message is not None:
-                self._status[task_id]["message"] = message
-            
+                job.message = message
+
             if file_path is not None:
-                self._status[task_id]["file_path"] = file_path
-            
+                job.file_path = file_path
+
             if error is not None:
-                self._status[task_id]["error"] = error
-            
-            if status == EnrollmentStatus.COMPLETED:
-                self._status[task_id]["completed_at"] = datetime.now().isoformat()
-    
+                job.error = error
+
+            for name, value in fields.items():
+                setattr(job, name, value)
+
+            job.updated_at = now
+            db.commit()
+        finally:
+            db.close()
+
+    def heartbeat(self, task_id: str) -> None:
+        """Отметить, что процесс расчета жив"""
+        db = SessionLocal()
+        try:
+            db.query(models.EnrollmentJob).filter(
+                models.EnrollmentJob.id == task_id,
+                models.EnrollmentJob.status.notin_(FINISHED_STATUSES),
+            ).update({models.EnrollmentJob.updated_at: datetime.now()}, synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
     def get_status(self, task_id: str) -> Optional[Dict]:
         """Получить статус задачи"""
-        with self._lock:
-            return self._status.get(task_id)
-    
+        db = SessionLocal()
+        try:
+            job = db.query(models.EnrollmentJob).filter(models.EnrollmentJob.id == task_id).first()
+            return _as_dict(job) if job else None
+        finally:
+            db.close()
+
+    def find_completed(self, data_version: int) -> Optional[Dict]:
+        """Последняя успешно завершенная задача для версии данных"""
+        db = SessionLocal()
+        try:
+            job = db.query(models.EnrollmentJob).filter(
+                models.EnrollmentJob.data_version == data_version,
+                models.EnrollmentJob.status == EnrollmentStatus.COMPLETED.value,
+            ).order_by(models.EnrollmentJob.completed_at.desc()).first()
+            return _as_dict(job) if job else None
+        finally:
+            db.close()
+
+    def get_snapshot_program(self, task_id: str, program: str) -> Optional[models.EnrollmentSnapshotProgram]:
+        """Результат задачи расчета по программе"""
+        db = SessionLocal()
+        try:
+            return db.query(models.EnrollmentSnapshotProgram).filter(
+                models.EnrollmentSnapshotProgram.job_id == task_id,
+                models.EnrollmentSnapshotProgram.program == program,
+            ).first()
+        finally:
+            db.close()
+
     def delete_task(self, task_id: str) -> None:
         """Удалить задачу"""
-        with self._lock:
-            if task_id in self._status:
-                del self._status[task_id]
+        db = SessionLocal()
+        try:
+            db.query(models.EnrollmentJob).filter(models.EnrollmentJob.id == task_id).delete()
+            db.commit()
+        finally:
+            db.close()
 
-status_manager = EnrollmentStatusManager()
+    def fail_stale_tasks(self) -> int:
+        """Пометить ошибкой задачи, которые давно не обновлялись (например, после падения сервиса)"""
+        db = SessionLocal()
+        try:
+            deadline = datetime.now() - timedelta(seconds=ENROLLMENT_JOB_STALE_SECONDS)
+            stale = db.query(models.EnrollmentJob).filter(
+                models.EnrollmentJob.status.notin_(FINISHED_STATUSES),
+                models.EnrollmentJob.updated_at < deadline,
+            ).all()
+            for job in stale:
+                self._mark_interrupted(db, job)
+            return len(stale)
+        finally:
+            db.close()
+
+    @staticmethod
+    def _mark_interrupted(db, job: models.EnrollmentJob) -> None:
+        now = datetime.now()
+        job.status = EnrollmentStatus.ERROR.value
+        job.message = "Ошибка при расчете"
+        job.error = "Расчет прерван: задача не обновлялась дольше допустимого времени"
+        job.active_key = None
+        job.completed_at = now
+        job.updated_at = now
+        db.commit()
 
+status_manager = EnrollmentStatusManager()
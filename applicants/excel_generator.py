@@ -1,13 +1,20 @@
 """
 Модуль для генерации Excel файлов с результатами зачисления.
+
+Файл пишется в потоковом (write-only) режиме openpyxl: строки сразу
+сериализуются во временный XML листа, поэтому память не растет с числом
+абитуриентов. Оформление задано именованными стилями книги, которые
+разделяются всеми ячейками, вместо отдельных объектов заливки и границ.
 """
+from copy import copy
+
 from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-from openpyxl.utils import get_column_letter
-from typing import Dict
-from enrollment import EnrollmentResult
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill, Alignment, Border, Side, NamedStyle
+from openpyxl.worksheet.dimensions import RowDimension
+from typing import Dict, Iterable, Iterator, List, Optional
+from enrollment import PROGRESS_STEP, EnrollmentResult, ProgressCallback
 from pathlib import Path
-import datetime
 
 
 # Цвета для Excel
@@ -21,128 +28,157 @@ BORDER = Border(
     top=Side(style='thin'),
     bottom=Side(style='thin')
 )
+CENTER = Alignment(horizontal='center', vertical='center')
+
+COLUMN_HEADERS = ["№", "СНИЛС", "ФИО", "Телефон", "Приоритет", "Балл"]
+# Ширина столбцов: №, СНИЛС, ФИО, Телефон, Приоритет, Балл
+COLUMN_WIDTHS = {'A': 8, 'B': 18, 'C': 35, 'D': 18, 'E': 12, 'F': 10}
+
+
+def _named_styles() -> List[NamedStyle]:
+    return [
+        NamedStyle(name="program_title", font=Font(bold=True, size=14), alignment=CENTER),
+        NamedStyle(name="enrolled_title", font=Font(bold=True, size=12), fill=GREEN_FILL, alignment=CENTER),
+        NamedStyle(name="rejected_title", font=Font(bold=True, size=12), fill=RED_FILL, alignment=CENTER),
+        NamedStyle(name="column_header", font=HEADER_FONT, fill=HEADER_FILL, alignment=CENTER, border=BORDER),
+        NamedStyle(name="enrolled_row", fill=GREEN_FILL, border=BORDER),
+        NamedStyle(name="rejected_row", fill=RED_FILL, border=BORDER),
+    ]
+
+
+def _styled(ws, value, style: str) -> WriteOnlyCell:
+    cell = WriteOnlyCell(ws, value=value)
+    cell.style = style
+    return cell
+
+
+class _RowStyle:
+    """
+    Именованный стиль для строк данных. Поиск стиля по имени при каждой
+    ячейке заметен на сотнях тысяч строк, поэтому набор индексов стиля
+    вычисляется один раз и копируется в новые ячейки.
+    """
+
+    def __init__(self, ws, style: str):
+        self.ws = ws
+        self.style_array = _styled(ws, None, style)._style
+
+    def row(self, values: tuple) -> List[WriteOnlyCell]:
+        cells = []
+        for value in values:
+            cell = WriteOnlyCell(self.ws, value=value)
+            cell._style = copy(self.style_array)
+            cells.append(cell)
+        return cells
+
+
+def _applicant_rows(applicants: Iterable) -> Iterator[tuple]:
+    """Значения строк таблицы в порядке списка"""
+    for idx, applicant in enumerate(applicants, start=1):
+        yield (
+            idx,
+            applicant.snils or "-",
+            applicant.name,
+            applicant.phone or "-",
+            applicant.priority,
+            applicant.exam_results or 0,
+        )
+
+
+class _RowProgress:
+    """Сообщает число записанных строк данных каждые PROGRESS_STEP строк"""
+
+    def __init__(self, progress: ProgressCallback, total: int):
+        self.progress = progress
+        self.total = total
+        self.written = 0
+
+    def rows(self, rows: Iterable[tuple]) -> Iterator[tuple]:
+        for values in rows:
+            yield values
+            self.written += 1
+            if self.written % PROGRESS_STEP == 0:
+                self.progress("excel", self.written, self.total)
+
+
+def _write_section(ws, row: int, title: str, title_style: str, rows: Iterable[tuple], row_style: str) -> int:
+    """Заголовок зоны, заголовки столбцов и строки; возвращает номер следующей строки"""
+    ws.merged_cells.add(f'A{row}:F{row}')
+    ws.row_dimensions[row] = RowDimension(ws, index=row, ht=20)
+    ws.row_dimensions[row + 1] = RowDimension(ws, index=row + 1, ht=20)
+    ws.append([_styled(ws, title, title_style)])
+    ws.append([_styled(ws, header, "column_header") for header in COLUMN_HEADERS])
+    row += 2
+    row_style = _RowStyle(ws, row_style)
+    for values in rows:
+        ws.append(row_style.row(values))
+        row += 1
+    return row
 
 
 def generate_enrollment_excel(
     enrollment_results: Dict[str, EnrollmentResult],
-    output_path: str
+    output_path: str,
+    progress: Optional[ProgressCallback] = None
 ) -> str:
     """
     Генерирует Excel файл с результатами зачисления.
-    
+
     Args:
         enrollment_results: Словарь с результатами зачисления по программам
         output_path: Путь для сохранения файла
-        
+        progress: Обратный вызов прогресса: этап "programs" - листы программ,
+            "excel" - записанные строки абитуриентов
+
     Returns:
         Путь к созданному файлу
     """
-    wb = Workbook()
-    
-    # Удаляем дефолтный лист
-    if "Sheet" in wb.sheetnames:
-        wb.remove(wb["Sheet"])
-    
+    wb = Workbook(write_only=True)
+    for style in _named_styles():
+        wb.add_named_style(style)
+
+    total_rows = sum(len(result.enrolled) + len(result.rejected) for result in enrollment_results.values())
+    row_progress = _RowProgress(progress, total_rows) if progress else None
+
+    def rows_of(applicants):
+        rows = _applicant_rows(applicants)
+        return row_progress.rows(rows) if row_progress else rows
+
     # Создаем лист для каждой программы
-    for program_name, result in enrollment_results.items():
+    for index, (program_name, result) in enumerate(enrollment_results.items()):
+        if progress:
+            progress("programs", index, len(enrollment_results))
         ws = wb.create_sheet(title=program_name[:31])  # Excel ограничивает длину названия листа
-        
+
+        # Размеры столбцов и строк в потоковом режиме задаются до записи строк
+        for letter, width in COLUMN_WIDTHS.items():
+            ws.column_dimensions[letter].width = width
+
         # Заголовок программы
-        ws.merge_cells('A1:F1')
-        header_cell = ws['A1']
-        header_cell.value = f"Программа: {program_name} (Мест: {result.total_places})"
-        header_cell.font = Font(bold=True, size=14)
-        header_cell.alignment = Alignment(horizontal='center', vertical='center')
-        ws.row_dimensions[1].height = 25
-        
-        # Заголовок для зачисленных (зеленая зона)
-        row = 3
-        ws.merge_cells(f'A{row}:F{row}')
-        enrolled_header = ws[f'A{row}']
-        enrolled_header.value = f"ЗАЧИСЛЕНЫ ({len(result.enrolled)} из {result.total_places})"
-        enrolled_header.fill = GREEN_FILL
-        enrolled_header.font = Font(bold=True, size=12)
-        enrolled_header.alignment = Alignment(horizontal='center', vertical='center')
-        ws.row_dimensions[row].height = 20
-        
-        # Заголовки столбцов для зачисленных
-        row += 1
-        headers = ["№", "СНИЛС", "ФИО", "Телефон", "Приоритет", "Балл"]
-        for col, header in enumerate(headers, start=1):
-            cell = ws.cell(row=row, column=col)
-            cell.value = header
-            cell.fill = HEADER_FILL
-            cell.font = HEADER_FONT
-            cell.alignment = Alignment(horizontal='center', vertical='center')
-            cell.border = BORDER
-        ws.row_dimensions[row].height = 20
-        
-        # Данные зачисленных
-        row += 1
-        for idx, applicant in enumerate(result.enrolled, start=1):
-            ws.cell(row=row, column=1, value=idx).border = BORDER
-            ws.cell(row=row, column=2, value=applicant.snils or "-").border = BORDER
-            ws.cell(row=row, column=3, value=applicant.name).border = BORDER
-            ws.cell(row=row, column=4, value=applicant.phone or "-").border = BORDER
-            ws.cell(row=row, column=5, value=applicant.priority).border = BORDER
-            ws.cell(row=row, column=6, value=applicant.exam_results or 0).border = BORDER
-            
-            # Зеленая заливка для всех ячеек строки
-            for col in range(1, 7):
-                ws.cell(row=row, column=col).fill = GREEN_FILL
-            
-            row += 1
-        
-        # Пустая строка
-        row += 1
-        
-        # Заголовок для не зачисленных (красная зона)
-        ws.merge_cells(f'A{row}:F{row}')
-        rejected_header = ws[f'A{row}']
-        rejected_header.value = f"НЕ ЗАЧИСЛЕНЫ ({len(result.rejected)})"
-        rejected_header.fill = RED_FILL
-        rejected_header.font = Font(bold=True, size=12)
-        rejected_header.alignment = Alignment(horizontal='center', vertical='center')
-        ws.row_dimensions[row].height = 20
-        
-        # Заголовки столбцов для не зачисленных
-        row += 1
-        for col, header in enumerate(headers, start=1):
-            cell = ws.cell(row=row, column=col)
-            cell.value = header
-            cell.fill = HEADER_FILL
-            cell.font = HEADER_FONT
-            cell.alignment = Alignment(horizontal='center', vertical='center')
-            cell.border = BORDER
-        
-        # Данные не зачисленных
-        row += 1
-        for idx, applicant in enumerate(result.rejected, start=1):
-            ws.cell(row=row, column=1, value=idx).border = BORDER
-            ws.cell(row=row, column=2, value=applicant.snils or "-").border = BORDER
-            ws.cell(row=row, column=3, value=applicant.name).border = BORDER
-            ws.cell(row=row, column=4, value=applicant.phone or "-").border = BORDER
-            ws.cell(row=row, column=5, value=applicant.priority).border = BORDER
-            ws.cell(row=row, column=6, value=applicant.exam_results or 0).border = BORDER
-            
-            # Красная заливка для всех ячеек строки
-            for col in range(1, 7):
-                ws.cell(row=row, column=col).fill = RED_FILL
-            
-            row += 1
-        
-        # Настройка ширины столбцов
-        ws.column_dimensions['A'].width = 8   # №
-        ws.column_dimensions['B'].width = 18  # СНИЛС
-        ws.column_dimensions['C'].width = 35  # ФИО
-        ws.column_dimensions['D'].width = 18  # Телефон
-        ws.column_dimensions['E'].width = 12 # Приоритет
-        ws.column_dimensions['F'].width = 10  # Балл
-    
+        ws.merged_cells.add('A1:F1')
+        ws.row_dimensions[1] = RowDimension(ws, index=1, ht=25)
+        ws.append([_styled(ws, f"Программа: {program_name} (Мест: {result.total_places})", "program_title")])
+        ws.append([])
+
+        # Зачисленные (зеленая зона), пустая строка, не зачисленные (красная зона)
+        row = _write_section(
+            ws, 3,
+            f"ЗАЧИСЛЕНЫ ({len(result.enrolled)} из {result.total_places})", "enrolled_title",
+            rows_of(result.enrolled), "enrolled_row"
+        )
+        ws.append([])
+        _write_section(
+            ws, row + 1,
+            f"НЕ ЗАЧИСЛЕНЫ ({len(result.rejected)})", "rejected_title",
+            rows_of(result.rejected), "rejected_row"
+        )
+
     # Сохраняем файл
     output_file = Path(output_path)
     output_file.parent.mkdir(parents=True, exist_ok=True)
     wb.save(output_path)
-    
-    return str(output_path)
+    if progress:
+        progress("programs", len(enrollment_results), len(enrollment_results))
+        progress("excel", total_rows, total_rows)
 
+    return str(output_path)
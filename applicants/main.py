@@ -1,21 +1,36 @@
+import asyncio
+import json
+import os
+import time
+from datetime import datetime
 from typing import List, Optional
-from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, Form, BackgroundTasks
+from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, Form, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-import uuid
 from pathlib import Path
-from datetime import datetime
 
 import schemas
 import crud
-from database import get_db, init_db
+from common.file_storage import MB, save_upload
+from database import get_db, run_db, stream_db, init_db, get_db_metrics, dispose_db
+from common.instrumentation import MetricsMiddleware, metrics_response
 from init_data import init_test_data
-from auth_dependency import get_current_user
-from enrollment import calculate_enrollment
-from excel_generator import generate_enrollment_excel
-from enrollment_status import status_manager, EnrollmentStatus
+from auth_dependency import (
+    get_current_user,
+    get_auth_metrics,
+    startup_auth_client,
+    shutdown_auth_client,
+)
+from enrollment_status import FINISHED_STATUSES, status_manager
+from data_version import current_version
+from common.storage_janitor import STORAGE_JANITOR_ENABLED, run_storage_janitor
+from storage_janitor import ApplicantsStorageJanitor, touch_enrollment_file
+from enrollment_jobs import EXCEL_DIR, job_runner
+from enrollment_live import live_enrollment, run_live_enrollment, LIVE_ENROLLMENT_ENABLED
+from applicant_stats import COUNTERS_ENABLED as STATS_COUNTERS_ENABLED, rebuild_counters, statistics_cache
 
 app = FastAPI(title="Applicants Service", version="1.0.0")
 
@@ -23,7 +38,26 @@ app = FastAPI(title="Applicants Service", version="1.0.0")
 UPLOAD_DIR = Path("uploads/documents")
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 
-EXCEL_DIR = Path("uploads/enrollment")
+# Максимальный размер файла документа по типу, МБ
+DOCUMENT_MAX_MB = {
+    "passport": int(os.getenv("DOCUMENT_PASSPORT_MAX_MB", "10")),
+    "certificate": int(os.getenv("DOCUMENT_CERTIFICATE_MAX_MB", "20")),
+    "diploma": int(os.getenv("DOCUMENT_DIPLOMA_MAX_MB", "20")),
+    "photo": int(os.getenv("DOCUMENT_PHOTO_MAX_MB", "5")),
+}
+DOCUMENT_DEFAULT_MAX_MB = int(os.getenv("DOCUMENT_DEFAULT_MAX_MB", "10"))
+
+# Типы файлов результатов зачисления для скачивания
+ENROLLMENT_MEDIA_TYPES = {
+    ".xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    ".csv": "text/csv",
+    ".parquet": "application/vnd.apache.parquet",
+}
+
+# Как часто SSE-поток прогресса перечитывает задачу и шлет keepalive, секунд
+ENROLLMENT_PROGRESS_POLL_SECONDS = float(os.getenv("ENROLLMENT_PROGRESS_POLL_SECONDS", "0.5"))
+ENROLLMENT_PROGRESS_KEEPALIVE_SECONDS = float(os.getenv("ENROLLMENT_PROGRESS_KEEPALIVE_SECONDS", "15"))
+
 EXCEL_DIR.mkdir(parents=True, exist_ok=True)
 
 # Подключаем статические файлы для доступа к загруженным файлам
@@ -35,14 +69,45 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
+app.add_middleware(MetricsMiddleware)
+
+storage_janitor = ApplicantsStorageJanitor(UPLOAD_DIR, EXCEL_DIR)
+
 @app.on_event("startup")
 async def startup_event():
     init_db()
     init_test_data()
+    if STATS_COUNTERS_ENABLED:
+        from database import SessionLocal
+        db = SessionLocal()
+        try:
+            rebuild_counters(db)
+        finally:
+            db.close()
+    stale = status_manager.fail_stale_tasks()
+    if stale:
+        print(f"⚠️ Applicants Service: {stale} interrupted enrollment jobs marked as failed")
+    await startup_auth_client()
+    if LIVE_ENROLLMENT_ENABLED:
+        from database import SessionLocal
+        app.state.live_enrollment = asyncio.create_task(run_live_enrollment(SessionLocal))
+    if STORAGE_JANITOR_ENABLED:
+        app.state.storage_janitor = asyncio.create_task(run_storage_janitor(storage_janitor))
     print("✅ Applicants Service: Database initialized")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    if LIVE_ENROLLMENT_ENABLED:
+        app.state.live_enrollment.cancel()
+    if STORAGE_JANITOR_ENABLED:
+        app.state.storage_janitor.cancel()
+    job_runner.shutdown()
+    await shutdown_auth_client()
+    await dispose_db()
+
 @app.get("/")
 async def root():
     return {"service": "applicants", "version": "1.0.0", "status": "running"}
@@ -51,6 +116,22 @@ async def root():
 async def health():
     return {"status": "healthy"}
 
+@app.get("/metrics/auth")
+async def auth_metrics():
+    return get_auth_metrics()
+
+@app.get("/metrics")
+async def metrics():
+    return metrics_response()
+
+@app.get("/metrics/db")
+async def db_metrics():
+    return get_db_metrics()
+
+@app.get("/metrics/storage")
+async def storage_metrics():
+    return await run_in_threadpool(storage_janitor.usage)
+
 @app.get("/api/applicants/applicants", response_model=List[schemas.Applicant])
 async def get_applicants(
     status: Optional[str] = None,
@@ -64,7 +145,8 @@ async def get_applicants(
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    return crud.get_applicants(
+    return await run_db(
+        crud.get_applicants,
         db,
         status=status,
         program=program,
@@ -76,28 +158,84 @@ async def get_applicants(
         limit=limit
     )
 
+async def _json_array(partitions):
+    """Тело ответа - JSON-массив из строк, уже сериализованных в БД"""
+    yield "["
+    separator = ""
+    async for partition in partitions:
+        yield separator + ",".join(row[0] for row in partition)
+        separator = ","
+    yield "]"
+
 @app.get("/api/applicants/applicants-grouped", response_model=List[schemas.GroupedApplicant])
 async def get_grouped_applicants(
     status: Optional[str] = None,
     program: Optional[str] = None,
     source: Optional[str] = None,
-    skip: int = 0,
-    limit: int = 1000,
+    cursor: Optional[str] = None,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(1000, ge=1),
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
     """
     Получить абитуриентов, сгруппированных по телефону и СНИЛС.
     Каждый абитуриент возвращается один раз со списком всех его программ.
+    Группы упорядочены по (телефон, СНИЛС); курсор следующей страницы
+    возвращается в заголовке X-Next-Cursor.
     """
-    return crud.get_grouped_applicants(
+    try:
+        after = crud.decode_group_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    page, next_cursor = await run_db(
+        crud.get_grouped_page,
         db,
         status=status,
         program=program,
         source=source,
+        after=after,
         skip=skip,
         limit=limit
     )
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    if page is None:
+        return Response("[]", media_type="application/json", headers=headers)
+
+    query = crud.grouped_applicants_query(status, program, source, *page)
+    return StreamingResponse(
+        _json_array(stream_db(query)),
+        media_type="application/json",
+        headers=headers
+    )
+
+@app.get("/api/applicants/applicants-rating", response_model=schemas.RatingWindow)
+async def get_rating_window(
+    program: str,
+    applicant_id: Optional[str] = None,
+    top: int = Query(3, ge=0, le=100),
+    neighbours: int = Query(1, ge=0, le=100),
+    bottom: int = Query(3, ge=0, le=100),
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Место абитуриента в рейтинге программы, число заявлений и мест,
+    начало и конец списка и соседи абитуриента.
+    """
+    window = await run_db(
+        crud.get_rating_window,
+        db,
+        program=program,
+        applicant_id=applicant_id,
+        top=top,
+        neighbours=neighbours,
+        bottom=bottom
+    )
+    if window is None:
+        raise HTTPException(status_code=404, detail="Applicant not found in program rating")
+    return window
 
 @app.put("/api/applicants/applicants-programs", response_model=List[schemas.Applicant])
 async def update_applicant_programs(
@@ -109,7 +247,7 @@ async def update_applicant_programs(
     Обновить программы и приоритеты абитуриента.
     """
     try:
-        return crud.update_applicant_programs(db, data.phone, data.programs)
+        return await run_db(crud.update_applicant_programs, db, data.phone, data.programs)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -119,7 +257,7 @@ async def get_applicant(
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    applicant = crud.get_applicant_by_id(db, applicant_id)
+    applicant = await run_db(crud.get_applicant_by_id, db, applicant_id)
     if not applicant:
         raise HTTPException(status_code=404, detail="Applicant not found")
     return applicant
@@ -131,7 +269,7 @@ async def create_applicant(
     current_user: dict = Depends(get_current_user)
 ):
     try:
-        return crud.create_applicant(db, applicant)
+        return await run_db(crud.create_applicant, db, applicant)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -143,7 +281,7 @@ async def update_applicant(
     current_user: dict = Depends(get_current_user)
 ):
     try:
-        updated = crud.update_applicant(db, applicant_id, applicant)
+        updated = await run_db(crud.update_applicant, db, applicant_id, applicant)
         if not updated:
             raise HTTPException(status_code=404, detail="Applicant not found")
         return updated
@@ -156,7 +294,7 @@ async def delete_applicant(
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    if not crud.delete_applicant(db, applicant_id):
+    if not await run_db(crud.delete_applicant, db, applicant_id):
         raise HTTPException(status_code=404, detail="Applicant not found")
     return {"message": "Applicant deleted successfully"}
 
@@ -172,7 +310,7 @@ async def update_applicant_max_id_by_phone(
     If max_user_id is None, it will be set to None (clearing the value).
     Returns a list of all updated applicants.
     """
-    applicants = crud.update_applicant_max_id_by_phone(db, data.phone, data.max_user_id)
+    applicants = await run_db(crud.update_applicant_max_id_by_phone, db, data.phone, data.max_user_id)
     if not applicants:
         raise HTTPException(status_code=404, detail="No applicants found with this phone number")
     return applicants
@@ -185,7 +323,7 @@ async def get_documents(
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    return crud.get_documents(db, applicant_id=applicant_id, skip=skip, limit=limit)
+    return await run_db(crud.get_documents, db, applicant_id=applicant_id, skip=skip, limit=limit)
 
 @app.get("/api/applicants/documents/{document_id}", response_model=schemas.ApplicantDocument)
 async def get_document(
@@ -193,7 +331,7 @@ async def get_document(
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    document = crud.get_document_by_id(db, document_id)
+    document = await run_db(crud.get_document_by_id, db, document_id)
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
     return document
@@ -209,28 +347,25 @@ async def upload_document(
 ):
     """Загрузить файл документа на сервер"""
     try:
-        # Генерируем уникальное имя файла
-        file_extension = Path(file.filename).suffix
-        unique_filename = f"{uuid.uuid4()}{file_extension}"
-        file_path = UPLOAD_DIR / unique_filename
-        
-        # Сохраняем файл
-        with open(file_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
+        # Сохраняем файл потоково под уникальным именем
+        max_mb = DOCUMENT_MAX_MB.get(document_type, DOCUMENT_DEFAULT_MAX_MB)
+        stored = await save_upload(file, UPLOAD_DIR, max_mb * MB)
         
         # Формируем URL для доступа к файлу
-        file_url = f"/uploads/documents/{unique_filename}"
+        file_url = f"/uploads/documents/{stored.filename}"
         
         # Создаем запись в БД
         document_data = schemas.ApplicantDocumentCreate(
             applicant_id=applicant_id,
             document_type=document_type,
             document_name=document_name,
-            file_url=file_url
+            file_url=file_url,
+            sha256=stored.sha256
         )
         
-        return crud.create_document(db, document_data)
+        return await run_db(crud.create_document, db, document_data)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Ошибка загрузки файла: {str(e)}")
 
@@ -240,7 +375,7 @@ async def create_document(
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    return crud.create_document(db, document)
+    return await run_db(crud.create_document, db, document)
 
 @app.put("/api/applicants/documents/{document_id}", response_model=schemas.ApplicantDocument)
 async def update_document(
@@ -249,7 +384,7 @@ async def update_document(
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    updated = crud.update_document(db, document_id, document)
+    updated = await run_db(crud.update_document, db, document_id, document)
     if not updated:
         raise HTTPException(status_code=404, detail="Document not found")
     return updated
@@ -260,7 +395,7 @@ async def delete_document(
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    if not crud.delete_document(db, document_id):
+    if not await run_db(crud.delete_document, db, document_id):
         raise HTTPException(status_code=404, detail="Document not found")
     return {"message": "Document deleted successfully"}
 
@@ -272,7 +407,7 @@ async def get_exams(
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    return crud.get_exams(db, applicant_id=applicant_id, skip=skip, limit=limit)
+    return await run_db(crud.get_exams, db, applicant_id=applicant_id, skip=skip, limit=limit)
 
 @app.get("/api/applicants/exams/{exam_id}", response_model=schemas.ApplicantExam)
 async def get_exam(
@@ -280,7 +415,7 @@ async def get_exam(
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    exam = crud.get_exam_by_id(db, exam_id)
+    exam = await run_db(crud.get_exam_by_id, db, exam_id)
     if not exam:
         raise HTTPException(status_code=404, detail="Exam not found")
     return exam
@@ -291,7 +426,7 @@ async def create_exam(
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    return crud.create_exam(db, exam)
+    return await run_db(crud.create_exam, db, exam)
 
 @app.put("/api/applicants/exams/{exam_id}", response_model=schemas.ApplicantExam)
 async def update_exam(
@@ -300,7 +435,7 @@ async def update_exam(
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    updated = crud.update_exam(db, exam_id, exam)
+    updated = await run_db(crud.update_exam, db, exam_id, exam)
     if not updated:
         raise HTTPException(status_code=404, detail="Exam not found")
     return updated
@@ -311,16 +446,25 @@ async def delete_exam(
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    if not crud.delete_exam(db, exam_id):
+    if not await run_db(crud.delete_exam, db, exam_id):
         raise HTTPException(status_code=404, detail="Exam not found")
     return {"message": "Exam deleted successfully"}
 
 @app.get("/api/applicants/statistics", response_model=schemas.ApplicantStatistics)
 async def get_statistics(
+    request: Request,
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    return crud.get_applicant_statistics(db)
+    async def load():
+        statistics = await run_db(crud.get_applicant_statistics, db)
+        return statistics.model_dump()
+
+    statistics, etag = await statistics_cache.get(load)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag in (tag.strip() for tag in request.headers.get("if-none-match", "").split(",")):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(statistics, headers=headers)
 
 @app.get("/api/applicants/programs", response_model=List[schemas.Program])
 async def get_programs(
@@ -330,7 +474,7 @@ async def get_programs(
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    return crud.get_programs(db, is_active=is_active, skip=skip, limit=limit)
+    return await run_db(crud.get_programs, db, is_active=is_active, skip=skip, limit=limit)
 
 @app.get("/api/applicants/programs/{program_id}", response_model=schemas.Program)
 async def get_program(
@@ -338,7 +482,7 @@ async def get_program(
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    program = crud.get_program_by_id(db, program_id)
+    program = await run_db(crud.get_program_by_id, db, program_id)
     if not program:
         raise HTTPException(status_code=404, detail="Program not found")
     return program
@@ -349,10 +493,10 @@ async def create_program(
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    existing = crud.get_program_by_name(db, program.name)
+    existing = await run_db(crud.get_program_by_name, db, program.name)
     if existing:
         raise HTTPException(status_code=400, detail="Program with this name already exists")
-    return crud.create_program(db, program)
+    return await run_db(crud.create_program, db, program)
 
 @app.put("/api/applicants/programs/{program_id}", response_model=schemas.Program)
 async def update_program(
@@ -361,7 +505,7 @@ async def update_program(
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    updated = crud.update_program(db, program_id, program)
+    updated = await run_db(crud.update_program, db, program_id, program)
     if not updated:
         raise HTTPException(status_code=404, detail="Program not found")
     return updated
@@ -372,91 +516,46 @@ async def delete_program(
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    if not crud.delete_program(db, program_id):
+    if not await run_db(crud.delete_program, db, program_id):
         raise HTTPException(status_code=404, detail="Program not found")
     return {"message": "Program deleted successfully"}
 
 
 # ============= РАСЧЕТ ЗАЧИСЛЕНИЯ =============
 
-def process_enrollment_calculation(task_id: str):
-    """Асинхронная функция для расчета зачисления"""
-    from database import SessionLocal
-    
-    # Создаем новую сессию БД для фоновой задачи
-    db = SessionLocal()
-    try:
-        status_manager.update_status(
-            task_id,
-            EnrollmentStatus.PROCESSING,
-            progress=10,
-            message="Начало расчета зачисления..."
-        )
-        
-        # Рассчитываем зачисление
-        status_manager.update_status(
-            task_id,
-            EnrollmentStatus.PROCESSING,
-            progress=30,
-            message="Обработка данных абитуриентов..."
-        )
-        
-        enrollment_results = calculate_enrollment(db)
-        
-        status_manager.update_status(
-            task_id,
-            EnrollmentStatus.PROCESSING,
-            progress=60,
-            message="Генерация Excel файла..."
-        )
-        
-        # Генерируем Excel файл
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"enrollment_{timestamp}.xlsx"
-        file_path = EXCEL_DIR / filename
-        
-        generate_enrollment_excel(enrollment_results, str(file_path))
-        
-        status_manager.update_status(
-            task_id,
-            EnrollmentStatus.COMPLETED,
-            progress=100,
-            message="Расчет завершен успешно!",
-            file_path=f"/uploads/enrollment/{filename}"
-        )
-    except Exception as e:
-        status_manager.update_status(
-            task_id,
-            EnrollmentStatus.ERROR,
-            progress=0,
-            message="Ошибка при расчете",
-            error=str(e)
-        )
-    finally:
-        db.close()
-
-
 @app.post("/api/applicants/enrollment/calculate")
 async def start_enrollment_calculation(
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
     """
     Запустить расчет зачисления по алгоритму высшего приоритета.
-    Расчет выполняется асинхронно в фоновом режиме.
+    Расчет выполняется в отдельном процессе; если расчет уже идет,
+    возвращается его task_id. Если данные не менялись с последнего
+    успешного расчета, возвращается его задача с готовым файлом.
     """
-    import uuid as uuid_lib
-    
-    # Генерируем уникальный ID задачи
-    task_id = str(uuid_lib.uuid4())
-    
-    # Создаем задачу
-    status_manager.create_task(task_id)
-    
-    # Запускаем расчет в фоновом режиме
-    background_tasks.add_task(process_enrollment_calculation, task_id)
-    
+    version = await run_db(current_version, db)
+    completed = await run_in_threadpool(status_manager.find_completed, version)
+    if completed and completed["file_path"] and (EXCEL_DIR / Path(completed["file_path"]).name).exists():
+        await run_in_threadpool(touch_enrollment_file, Path(completed["file_path"]).name)
+        return {
+            "task_id": completed["task_id"],
+            "status": completed["status"],
+            "file_path": completed["file_path"],
+            "data_version": version,
+            "message": "Данные не менялись с последнего расчета, результат уже готов."
+        }
+
+    task_id, created = await run_in_threadpool(status_manager.create_task, version)
+    if not created:
+        return {
+            "task_id": task_id,
+            "status": "pending",
+            "message": "Расчет уже выполняется. Используйте task_id для проверки статуса."
+        }
+
+    job_runner.submit(task_id)
+
     return {
         "task_id": task_id,
         "status": "pending",
@@ -470,7 +569,7 @@ async def get_enrollment_status(
     current_user: dict = Depends(get_current_user)
 ):
     """Получить статус расчета зачисления"""
-    status = status_manager.get_status(task_id)
+    status = await run_in_threadpool(status_manager.get_status, task_id)
     
     if not status:
         raise HTTPException(status_code=404, detail="Task not found")
@@ -478,24 +577,137 @@ async def get_enrollment_status(
     return status
 
 
+def _eta_seconds(status: dict) -> Optional[float]:
+    """Оценка оставшегося времени по доле выполненной работы"""
+    if status["status"] != "processing" or not status["started_at"] or not status["progress"]:
+        return None
+    elapsed = (datetime.now() - datetime.fromisoformat(status["started_at"])).total_seconds()
+    return round(elapsed * (100 - status["progress"]) / status["progress"], 1)
+
+
+async def _progress_events(request: Request, task_id: str, status: dict):
+    """События SSE при каждом изменении задачи; поток закрывается после завершения"""
+    last_status = None
+    last_sent = time.monotonic()
+    while True:
+        event = "progress"
+        if status["status"] in FINISHED_STATUSES:
+            event = status["status"]
+        if status != last_status:
+            data = json.dumps(dict(status, eta_seconds=_eta_seconds(status)), ensure_ascii=False)
+            yield f"event: {event}\ndata: {data}\n\n"
+            last_status, last_sent = status, time.monotonic()
+        elif time.monotonic() - last_sent >= ENROLLMENT_PROGRESS_KEEPALIVE_SECONDS:
+            yield ": keepalive\n\n"
+            last_sent = time.monotonic()
+        if event != "progress":
+            return
+
+        await asyncio.sleep(ENROLLMENT_PROGRESS_POLL_SECONDS)
+        if await request.is_disconnected():
+            return
+        status = await run_in_threadpool(status_manager.get_status, task_id)
+        if status is None:
+            return
+
+
+@app.get("/api/applicants/enrollment/progress/{task_id}")
+async def stream_enrollment_progress(
+    task_id: str,
+    request: Request,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Прогресс расчета зачисления потоком Server-Sent Events: событие progress
+    при каждом изменении задачи, завершающее completed или error.
+    """
+    status = await run_in_threadpool(status_manager.get_status, task_id)
+    if not status:
+        raise HTTPException(status_code=404, detail="Task not found")
+
+    return StreamingResponse(
+        _progress_events(request, task_id, status),
+        media_type="text/event-stream",
+        # Без буферизации в nginx события доходят до клиента сразу
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.get("/api/applicants/enrollment/results")
+async def get_enrollment_results(
+    program: str,
+    task_id: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Результат расчета зачисления по программе из сохраненного снимка.
+    Без task_id - из последнего расчета для текущей версии данных.
+    """
+    if task_id is None:
+        version = await run_db(current_version, db)
+        completed = await run_in_threadpool(status_manager.find_completed, version)
+        if not completed:
+            raise HTTPException(status_code=404, detail="No enrollment results for the current data, start a calculation")
+        task_id = completed["task_id"]
+
+    snapshot = await run_in_threadpool(status_manager.get_snapshot_program, task_id, program)
+    if not snapshot:
+        raise HTTPException(status_code=404, detail="Enrollment results not found")
+
+    # Списки хранятся готовым JSON и отдаются без разбора
+    header = json.dumps({"task_id": task_id, "program": snapshot.program, "total_places": snapshot.total_places}, ensure_ascii=False)
+    body = f'{header[:-1]}, "enrolled": {snapshot.enrolled}, "rejected": {snapshot.rejected}}}'
+    return Response(body, media_type="application/json")
+
+
 @app.get("/api/applicants/enrollment/download/{filename}")
 async def download_enrollment_file(
     filename: str,
     current_user: dict = Depends(get_current_user)
 ):
-    """Скачать Excel файл с результатами зачисления"""
+    """Скачать файл с результатами зачисления (Excel или выгрузку CSV/Parquet)"""
     file_path = EXCEL_DIR / filename
+    media_type = ENROLLMENT_MEDIA_TYPES.get(file_path.suffix)
     
-    if not file_path.exists():
+    if media_type is None or not file_path.exists():
         raise HTTPException(status_code=404, detail="File not found")
+    await run_in_threadpool(touch_enrollment_file, filename)
     
     return FileResponse(
         path=str(file_path),
         filename=filename,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        media_type=media_type
     )
 
 
+def _require_live_enrollment():
+    if not LIVE_ENROLLMENT_ENABLED:
+        raise HTTPException(status_code=404, detail="Live enrollment is disabled")
+    if not live_enrollment.ready:
+        raise HTTPException(status_code=503, detail="Live enrollment is not ready yet")
+
+
+@app.get("/api/applicants/enrollment/live", response_model=schemas.LiveEnrollmentSummary)
+async def get_live_enrollment(current_user: dict = Depends(get_current_user)):
+    """Текущая версия расчета зачисления, обновляемого при каждом изменении заявлений"""
+    _require_live_enrollment()
+    return live_enrollment.summary()
+
+
+@app.get("/api/applicants/enrollment/live/{applicant_id}", response_model=schemas.LiveApplicationStatus)
+async def get_live_application_status(
+    applicant_id: int,
+    current_user: dict = Depends(get_current_user)
+):
+    """Проходит ли заявление по текущей версии расчета"""
+    _require_live_enrollment()
+    status = live_enrollment.application_status(applicant_id)
+    if not status:
+        raise HTTPException(status_code=404, detail="Application does not take part in the competition")
+    return status
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8004)
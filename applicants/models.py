@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, DateTime, Text, Float
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, Text, Float, Index
 from database import Base
 
 class Applicant(Base):
@@ -29,6 +29,24 @@ class Applicant(Base):
     created_at = Column(DateTime, default=datetime.now())
     updated_at = Column(DateTime, default=datetime.now(), onupdate=datetime.now())
 
+    __table_args__ = (
+        # Рейтинг по программе: упорядоченное чтение без сортировки (crud.get_rating_window).
+        # NULLS LAST в индексе поддерживает PostgreSQL
+        Index(
+            "ix_applicants_program_exam_results",
+            "program",
+            exam_results.desc().nulls_last(),
+            "id",
+        ).ddl_if(dialect="postgresql"),
+        # Группировка по абитуриенту и постраничный вывод по ключу (crud.get_grouped_page)
+        Index("ix_applicants_phone_snils_priority", "phone", "snils", "priority", "id"),
+        # Программы и приоритеты абитуриента (телефон + СНИЛС) не повторяются
+        Index("ix_applicants_phone_snils_program_unique", "phone", "snils", "program", unique=True),
+        Index("ix_applicants_phone_snils_priority_unique", "phone", "snils", "priority", unique=True),
+        # Прежние индексы только по телефону удаляются при старте (database.init_db)
+        {"info": {"obsolete_indexes": ("ix_applicants_phone_program", "ix_applicants_phone_priority")}},
+    )
+
 # 1. Иванов Иван - 300
 # ... ... ...
 # 298.
@@ -47,6 +65,7 @@ class ApplicantDocument(Base):
     document_type = Column(String(100), nullable=False)
     document_name = Column(String(200), nullable=False)
     file_url = Column(String(500), nullable=True)
+    sha256 = Column(String(64), nullable=True)  # SHA-256 загруженного файла, hex
     status = Column(String(50), default="pending")
     uploaded_at = Column(DateTime, default=datetime.now())
     verified_at = Column(DateTime, nullable=True)
@@ -77,3 +96,66 @@ class Program(Base):
     created_at = Column(DateTime, default=datetime.now())
     updated_at = Column(DateTime, default=datetime.now(), onupdate=datetime.now())
 
+
+class EnrollmentJob(Base):
+    __tablename__ = "enrollment_jobs"
+
+    id = Column(String(36), primary_key=True)
+    status = Column(String(20), nullable=False, index=True)
+    progress = Column(Integer, nullable=False, default=0)
+    message = Column(Text, nullable=True)
+    file_path = Column(String(500), nullable=True)
+    # JSON-массив URL выгрузок CSV/Parquet рядом с file_path (ENROLLMENT_EXPORT_FORMATS)
+    exports = Column(Text, nullable=True)
+    error = Column(Text, nullable=True)
+    # Заполнен, пока задача ожидает или выполняется: уникальность не дает
+    # запустить два расчета одновременно. У завершенных задач - NULL
+    active_key = Column(String(50), unique=True, nullable=True)
+    created_at = Column(DateTime, nullable=False)
+    started_at = Column(DateTime, nullable=True)
+    completed_at = Column(DateTime, nullable=True)
+    # Обновляется при каждом изменении статуса; по нему находятся зависшие задачи
+    updated_at = Column(DateTime, nullable=False)
+    calculation_seconds = Column(Float, nullable=True)
+    excel_seconds = Column(Float, nullable=True)
+    # Текущий этап расчета (enrollment_jobs.JobProgress) и обработано элементов этапа из total
+    stage = Column(String(20), nullable=True)
+    processed = Column(Integer, nullable=True)
+    total = Column(Integer, nullable=True)
+    programs_done = Column(Integer, nullable=True)
+    programs_total = Column(Integer, nullable=True)
+    # Последнее скачивание файла; по нему вытесняются давно не нужные файлы (storage_janitor)
+    last_accessed_at = Column(DateTime, nullable=True)
+    # Версия данных зачисления на момент запуска; результат годится, пока она не изменилась
+    data_version = Column(BigInteger, nullable=True, index=True)
+
+
+class ApplicantStatsCounter(Base):
+    """Число заявлений с данными статусом, программой и источником (applicant_stats)"""
+    __tablename__ = "applicant_stats_counters"
+
+    # NULL хранится как пустая строка: столбцы входят в первичный ключ
+    status = Column(String(50), primary_key=True)
+    program = Column(String(200), primary_key=True)
+    source = Column(String(50), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+
+class DataVersion(Base):
+    """Счетчик изменений набора данных (data_version)"""
+    __tablename__ = "data_versions"
+
+    name = Column(String(50), primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
+
+
+class EnrollmentSnapshotProgram(Base):
+    """Результат расчета зачисления по одной программе (снимок задачи расчета)"""
+    __tablename__ = "enrollment_snapshot_programs"
+
+    job_id = Column(String(36), primary_key=True)
+    program = Column(String(200), primary_key=True)
+    total_places = Column(Integer, nullable=False)
+    # JSON-массивы строк списков в порядке рейтинга (enrollment_jobs.snapshot_rows)
+    enrolled = Column(Text, nullable=False)
+    rejected = Column(Text, nullable=False)
@@ -121,6 +121,7 @@ class ApplicantDocumentBase(BaseModel):
     document_type: str
     document_name: str
     file_url: Optional[str] = None
+    sha256: Optional[str] = None
     status: str = "pending"
 
 class ApplicantDocumentCreate(ApplicantDocumentBase):
@@ -237,3 +238,47 @@ class UpdateApplicantPrograms(BaseModel):
     phone: str
     programs: List[dict]  # [{"id": 1, "program": "Программа 1", "priority": 1}, ...]
 
+
+class RatingEntry(BaseModel):
+    """Строка рейтингового списка программы"""
+    rank: int
+    applicant_id: str
+    name: str
+    exam_results: Optional[int] = None
+
+class RatingWindow(BaseModel):
+    """Место абитуриента в рейтинге программы и окно строк вокруг него"""
+    program: str
+    applicant_id: Optional[str] = None
+    rank: Optional[int] = None  # Место абитуриента, если applicant_id указан
+    total: int  # Всего заявлений на программу
+    seat_limit: Optional[int] = None  # Количество мест на программе
+    entries: List[RatingEntry]  # Начало списка, соседи абитуриента и конец списка по рангу
+
+
+class LiveEnrollmentProgram(BaseModel):
+    """Текущее состояние конкурса на программу"""
+    program: str
+    total_places: int
+    enrolled: int
+    free_places: int
+    passing_score: Optional[int] = None  # Балл последнего проходящего абитуриента
+
+class LiveEnrollmentSummary(BaseModel):
+    """Версия живого расчета зачисления"""
+    version: int
+    updated_at: datetime
+    last_update: dict  # touched, replayed, changed
+    data_version: int  # Версия данных в БД, с которой сверено состояние
+    checked_at: Optional[datetime] = None  # Время последней сверки
+    programs: List[LiveEnrollmentProgram]
+
+class LiveApplicationStatus(BaseModel):
+    """Проходит ли заявление в текущей версии расчета"""
+    version: int
+    applicant_id: int
+    program: str
+    passing: bool
+    enrolled_program: Optional[str] = None  # Программа, на которую абитуриент проходит
+    position: int  # Место абитуриента в общем рейтинге
+    score: int
@@ -0,0 +1,114 @@
+"""
+Очистка каталогов загрузок абитуриентов (основа - common.storage_janitor).
+
+Проход очистки:
+- удаляет файлы расчетов зачисления (Excel и выгрузки), к которым не обращались дольше
+  ENROLLMENT_FILES_MAX_AGE_DAYS, а при превышении ENROLLMENT_FILES_MAX_MB -
+  давно не скачивавшиеся (LRU по enrollment_jobs.last_accessed_at). Файл
+  последнего успешного расчета не удаляется. У задачи удаленного файла
+  очищается file_path и удаляется снимок результатов, поэтому следующий
+  запрос расчета для той же версии данных выполнит его заново;
+- удаляет файлы документов и расчетов, на которые не ссылается ни одна
+  строка БД.
+"""
+import json
+import os
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict
+
+from sqlalchemy import or_
+
+import models
+from common.storage_janitor import MB, StorageJanitor, list_files, referenced_names, remove_file
+from database import SessionLocal
+
+ENROLLMENT_FILES_MAX_MB = int(os.getenv("ENROLLMENT_FILES_MAX_MB", "1024"))
+ENROLLMENT_FILES_MAX_AGE_DAYS = float(os.getenv("ENROLLMENT_FILES_MAX_AGE_DAYS", "30"))
+
+
+class ApplicantsStorageJanitor(StorageJanitor):
+    """Очистка каталогов документов и файлов расчетов зачисления"""
+
+    def __init__(self, documents_dir: Path, enrollment_dir: Path):
+        super().__init__(SessionLocal)
+        self.documents_dir = documents_dir
+        self.enrollment_dir = enrollment_dir
+
+    def directories(self) -> Dict[str, Path]:
+        return {"documents": self.documents_dir, "enrollment": self.enrollment_dir}
+
+    def clean(self, db, grace_deadline: float, stats: Dict) -> None:
+        stats["enrollment_evicted"] = 0
+        self._evict_enrollment_files(db, grace_deadline, stats)
+
+        document_urls = db.query(models.ApplicantDocument.file_url).filter(
+            models.ApplicantDocument.file_url.isnot(None)
+        )
+        self.remove_orphans(self.documents_dir, referenced_names(url for url, in document_urls), grace_deadline, stats)
+
+    def _evict_enrollment_files(self, db, grace_deadline: float, stats: Dict) -> None:
+        jobs = db.query(models.EnrollmentJob).filter(
+            models.EnrollmentJob.file_path.isnot(None)
+        ).order_by(models.EnrollmentJob.completed_at).all()
+        # Файлы задачи (Excel и выгрузки CSV/Parquet) вытесняются вместе
+        job_files = {
+            job.id: referenced_names([job.file_path, *(json.loads(job.exports) if job.exports else [])])
+            for job in jobs
+        }
+        files = {entry.name: entry for entry in list_files(self.enrollment_dir)}
+        self.remove_orphans(self.enrollment_dir, set().union(*job_files.values()), grace_deadline, stats)
+
+        def size(job) -> int:
+            return sum(files[name].stat().st_size for name in job_files[job.id] if name in files)
+
+        def last_used(job) -> datetime:
+            return job.last_accessed_at or job.completed_at or datetime.now()
+
+        # Excel-файл уже удален с диска: результат задачи недоступен
+        evicted = [job for job in jobs if Path(job.file_path).name not in files]
+        # Результат последнего успешного расчета остается всегда; остальные - от давно не использованных к недавним
+        candidates = sorted((job for job in jobs[:-1] if job not in evicted), key=last_used)
+        total = sum(size(job) for job in jobs)
+        age_deadline = datetime.now() - timedelta(days=ENROLLMENT_FILES_MAX_AGE_DAYS)
+        for job in candidates:
+            if last_used(job) >= age_deadline and total <= ENROLLMENT_FILES_MAX_MB * MB:
+                break
+            freed = sum(remove_file(files[name]) for name in job_files[job.id] if name in files)
+            total -= freed
+            stats["freed_bytes"] += freed
+            stats["enrollment_evicted"] += 1
+            evicted.append(job)
+
+        if evicted:
+            job_ids = [job.id for job in evicted]
+            db.query(models.EnrollmentJob).filter(models.EnrollmentJob.id.in_(job_ids)).update(
+                {models.EnrollmentJob.file_path: None, models.EnrollmentJob.exports: None},
+                synchronize_session=False
+            )
+            db.query(models.EnrollmentSnapshotProgram).filter(
+                models.EnrollmentSnapshotProgram.job_id.in_(job_ids)
+            ).delete(synchronize_session=False)
+            db.commit()
+
+    def usage(self) -> Dict:
+        usage = super().usage()
+        usage["enrollment"].update(
+            max_bytes=ENROLLMENT_FILES_MAX_MB * MB,
+            max_age_days=ENROLLMENT_FILES_MAX_AGE_DAYS,
+        )
+        return usage
+
+
+def touch_enrollment_file(filename: str) -> None:
+    """Отметить скачивание файла расчета или его выгрузки (для вытеснения по давности использования)"""
+    url = f"/uploads/enrollment/{filename}"
+    db = SessionLocal()
+    try:
+        db.query(models.EnrollmentJob).filter(
+            or_(models.EnrollmentJob.file_path == url, models.EnrollmentJob.exports.contains(f'"{url}"'))
+        ).update({models.EnrollmentJob.last_accessed_at: datetime.now()}, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
@@ -0,0 +1,65 @@
+"""
+Общие настройки тестов applicants: модули сервиса импортируются из каталога
+applicants, БД - временный файл SQLite, фоновые задачи выключены.
+
+Запуск из каталога applicants:
+    python -m pytest tests
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+# Корень репозитория - для пакета common
+sys.path.insert(1, str(Path(__file__).resolve().parents[2]))
+
+# Переменные задаются до импорта database: движок создается при импорте.
+# Дочерние процессы пула расчета наследуют окружение
+os.environ.setdefault(
+    "DATABASE_URL", f"sqlite:///{Path(tempfile.mkdtemp(prefix='applicants-tests-')) / 'test.db'}"
+)
+os.environ.setdefault("LIVE_ENROLLMENT_ENABLED", "false")
+os.environ.setdefault("STORAGE_JANITOR_ENABLED", "false")
+
+
+@pytest.fixture
+def applicants_db():
+    """
+    Пустая БД и функция заполнения: fill(programs, applications,
+    inactive=(), rejected=()) добавляет программы (name, total_places) и
+    заявления (id, snils, program, priority, exam_results) с их id и
+    возвращает сессию. inactive - названия неактивных программ, rejected -
+    id отклоненных заявлений
+    """
+    import database
+    import models
+
+    models.Base.metadata.drop_all(database.engine)
+    models.Base.metadata.create_all(database.engine)
+    db = database.SessionLocal()
+
+    def fill(programs, applications, inactive=(), rejected=()):
+        db.add_all(models.Program(name=program.name, total_places=program.total_places) for program in programs)
+        db.add_all(models.Program(name=name, total_places=10, is_active=0) for name in inactive)
+        db.add_all(
+            models.Applicant(
+                id=application.id,
+                applicant_id=f"A{application.id}",
+                name=f"Абитуриент {application.snils}",
+                phone=f"+7{application.snils[-10:]}",
+                snils=application.snils,
+                program=application.program,
+                priority=application.priority,
+                exam_results=application.exam_results,
+                status="rejected" if application.id in rejected else "new",
+            )
+            for application in applications
+        )
+        db.commit()
+        return db
+
+    yield fill
+    db.close()
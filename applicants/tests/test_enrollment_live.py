@@ -0,0 +1,195 @@
+"""
+Живой расчет зачисления (enrollment_live): после каждой последовательности
+случайных вставок, изменений и удалений заявлений инкрементальный пересчет
+должен совпадать с полным расчетом allocate_highest_priority. Отдельно
+проверяется сверка с версией данных: изменения других процессов (без событий
+сессии этого процесса) приводят к полному пересчету.
+"""
+import random
+
+import pytest
+from sqlalchemy import update
+
+import database
+import enrollment
+import enrollment_live
+import models
+from benchmarks.enrollment_engine import Application, generate
+from enrollment import allocate_highest_priority
+from enrollment_live import LiveEnrollment
+
+
+def rows_of(applications):
+    return [(a.id, a.snils, a.program, a.priority, a.exam_results) for a in applications]
+
+
+def snapshot_live(live: LiveEnrollment):
+    """Списки зачисленных и не зачисленных в порядке полного расчета"""
+    enrolled = {name: [] for name in live.programs}
+    rejected = {name: [] for name in live.programs}
+    for snils in live.order_snils:
+        decision = live.decisions.get(snils)
+        if decision is not None:
+            enrolled[decision[1]].append(decision[0])
+        else:
+            for _, application_id, program, _ in live.applications[snils]:
+                rejected[program].append(application_id)
+    return {name: (enrolled[name], rejected[name]) for name in live.programs}
+
+
+def snapshot_full(results):
+    return {
+        name: ([a.id for a in result.enrolled], [a.id for a in result.rejected])
+        for name, result in results.items()
+    }
+
+
+def mutate(rng: random.Random, applications, programs, next_id: int):
+    """
+    Случайное изменение: балл, приоритеты, программа (в том числе неактивная),
+    СНИЛС, отзыв заявления, новое заявление или новый абитуриент.
+    Возвращает затронутые СНИЛС и следующий свободный id
+    """
+    target = rng.choice(applications)
+    same_person = [a for a in applications if a.snils == target.snils]
+    kind = rng.choice(["score", "priorities", "program", "snils", "delete", "insert", "new_person"])
+    touched = {target.snils}
+    if kind == "score":
+        score = rng.choice([None, 200, rng.randint(120, 310)])
+        for a in same_person:
+            a.exam_results = score
+    elif kind == "priorities":
+        priorities = [a.priority for a in same_person]
+        rng.shuffle(priorities)
+        for a, priority in zip(same_person, priorities):
+            a.priority = priority
+    elif kind == "program":
+        target.program = rng.choice([p.name for p in programs] + ["Закрытая программа 0"])
+    elif kind == "snils":
+        other = rng.choice(applications)
+        target.snils = other.snils
+        touched.add(other.snils)
+    elif kind == "delete":
+        applications.remove(target)
+    elif kind == "insert":
+        program = rng.choice(programs).name
+        applications.append(Application(next_id, target.snils, program, len(same_person) + 1, target.exam_results))
+        next_id += 1
+    else:
+        snils = f"9{next_id:010d}"
+        applications.append(Application(next_id, snils, rng.choice(programs).name, 1, rng.randint(120, 310)))
+        touched.add(snils)
+        next_id += 1
+    return touched, next_id
+
+
+@pytest.fixture
+def small_checkpoints(monkeypatch):
+    """Контрольные точки чаще, чтобы пересчет начинался с их середины"""
+    monkeypatch.setattr(enrollment_live, "CHECKPOINT_INTERVAL", 8)
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+@pytest.mark.parametrize("batch", [1, 5])
+def test_random_changes_match_full_calculation(small_checkpoints, seed, batch):
+    """batch - сколько изменений накапливается до пересчета, как между обновлениями фоновой задачи"""
+    rng = random.Random(seed)
+    programs, applications = generate(600, seed)
+    program_pairs = [(p.name, p.total_places) for p in programs]
+
+    live = LiveEnrollment()
+    live.build(program_pairs, rows_of(applications))
+    assert snapshot_live(live) == snapshot_full(allocate_highest_priority(programs, applications))
+
+    next_id = max(a.id for a in applications) + 1
+    for _ in range(200 // batch):
+        touched = set()
+        for _ in range(batch):
+            changed, next_id = mutate(rng, applications, programs, next_id)
+            touched |= changed
+        applications.sort(key=lambda a: a.id)
+        live.apply(touched, [row for row in rows_of(applications) if row[1] in touched])
+
+        assert snapshot_live(live) == snapshot_full(allocate_highest_priority(programs, applications))
+
+
+@pytest.fixture
+def live(monkeypatch, applicants_db):
+    """Живое состояние над БД с заявлениями; события сессии попадают в него"""
+    state = LiveEnrollment()
+    monkeypatch.setattr(enrollment_live, "live_enrollment", state)
+    monkeypatch.setattr(enrollment, "ENROLLMENT_ENGINE", "python")
+    programs, applications = generate(400, seed=5)
+    inactive = sorted({a.program for a in applications} - {p.name for p in programs})
+    db = applicants_db(programs, applications, inactive=inactive)
+
+    assert state.refresh(db) == 1
+    assert state.data_version == 1
+    return state, db
+
+
+def assert_matches_database(state: LiveEnrollment, db):
+    db.expire_all()
+    assert snapshot_live(state) == snapshot_full(enrollment.calculate_enrollment(db))
+
+
+def foreign_update(*statements):
+    """Транзакция другого процесса: изменения и увеличение версии данных без событий сессии"""
+    with database.engine.begin() as connection:
+        for statement in statements:
+            connection.execute(statement)
+        connection.execute(update(models.DataVersion).values(version=models.DataVersion.version + 1))
+
+
+def test_local_changes_are_incremental(live):
+    state, db = live
+    applicant = db.query(models.Applicant).order_by(models.Applicant.id).first()
+    applicant.exam_results = 310
+    db.commit()
+
+    assert state.has_pending()
+    assert state.refresh(db) == 2
+    assert state.last_update["touched"] == 1
+    assert state.data_version == 2
+    assert_matches_database(state, db)
+
+    assert state.refresh(db) is None
+
+
+def test_foreign_changes_trigger_rebuild(live):
+    state, db = live
+    first = db.query(models.Applicant).order_by(models.Applicant.id).first()
+    foreign_update(
+        update(models.Applicant).where(models.Applicant.id == first.id).values(exam_results=310),
+        update(models.Applicant).where(models.Applicant.id % 7 == 0).values(status="rejected"),
+    )
+
+    assert not state.has_pending()
+    assert state.refresh(db) == 2
+    assert state.last_update["touched"] == len(state.keys)
+    assert state.data_version == 2
+    assert_matches_database(state, db)
+
+
+def test_foreign_change_between_local_commits(live):
+    """Версии этого процесса и чужая версия между ними: нужен полный пересчет"""
+    state, db = live
+    applicants = db.query(models.Applicant).order_by(models.Applicant.id).limit(3).all()
+
+    applicants[0].exam_results = 120
+    db.commit()
+    foreign_update(update(models.Applicant).where(models.Applicant.id == applicants[1].id).values(exam_results=310))
+    applicants[2].priority = 9
+    db.commit()
+
+    assert state.refresh(db) == 2
+    assert state.data_version == 4
+    assert state.last_update["touched"] == len(state.keys)
+    assert_matches_database(state, db)
+
+    # Дальше локальные изменения снова применяются инкрементально
+    applicants[0].exam_results = 300
+    db.commit()
+    assert state.refresh(db) == 3
+    assert state.last_update["touched"] == 1
+    assert_matches_database(state, db)
@@ -0,0 +1,128 @@
+"""
+Сверка параллельного расчета зачисления (ENROLLMENT_ENGINE=parallel) с
+однопоточным (ENROLLMENT_ENGINE=python) на случайных данных с фиксированным
+зерном: списки зачисленных и не зачисленных должны совпадать поэлементно.
+"""
+import random
+from collections import namedtuple
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import pytest
+
+import enrollment
+import enrollment_parallel
+from enrollment import allocate_highest_priority
+from enrollment_parallel import allocate_parallel, split_components
+
+WORKERS = 2
+
+Program = namedtuple("Program", "name total_places")
+
+
+@dataclass
+class Application:
+    id: int
+    snils: str
+    program: str
+    priority: int
+    exam_results: Optional[int]
+
+
+def generate(seed: int, people: int, clusters: int) -> Tuple[List[Program], List[Application]]:
+    """
+    Абитуриенты выбирают 1-4 программы одной из clusters групп; часть заявлений -
+    на неактивные программы, часть баллов - пустые или равные. Последние
+    программы групп остаются без заявлений, одна программа - без мест.
+    """
+    rng = random.Random(seed)
+    groups = [[f"Программа {cluster}-{i}" for i in range(5)] for cluster in range(clusters)]
+    applications: List[Application] = []
+    for person in range(people):
+        snils = f"{person:011d}"
+        choices = rng.sample(groups[rng.randrange(clusters)][:4], rng.randint(1, 4))
+        if rng.random() < 0.1:
+            choices.insert(rng.randrange(len(choices) + 1), "Закрытая программа")
+        score = rng.choice([None, 200, 250] + [rng.randint(120, 310) for _ in range(5)])
+        for priority, program in enumerate(choices, start=1):
+            applications.append(Application(len(applications) + 1, snils, program, priority, score))
+    rng.shuffle(applications)
+
+    programs = [Program(name, rng.randint(1, people // (clusters * 3) + 1)) for group in groups for name in group]
+    programs[0] = Program(programs[0].name, 0)
+    return programs, applications
+
+
+def snapshot(results: Dict) -> Dict[str, Tuple[List[int], List[int]]]:
+    return {
+        name: ([application.id for application in result.enrolled], [application.id for application in result.rejected])
+        for name, result in results.items()
+    }
+
+
+@pytest.fixture
+def parallel_pool(monkeypatch):
+    """Пул процессов запускается на любом объеме данных"""
+    monkeypatch.setattr(enrollment_parallel, "ENROLLMENT_PARALLEL_MIN_APPLICATIONS", 0)
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_matches_python_engine(parallel_pool, seed):
+    programs, applications = generate(seed, people=600, clusters=6)
+    assert len(split_components(programs, applications)) > 1
+
+    expected = allocate_highest_priority(programs, applications)
+    actual = allocate_parallel(programs, applications, workers=WORKERS)
+
+    assert list(actual) == list(expected)
+    assert snapshot(actual) == snapshot(expected)
+    assert all(
+        actual_application is expected_application
+        for name in expected
+        for actual_application, expected_application in zip(actual[name].enrolled, expected[name].enrolled)
+    )
+
+
+def test_single_component(parallel_pool):
+    programs, applications = generate(4, people=300, clusters=1)
+    assert len([c for c in split_components(programs, applications) if c.positions]) == 1
+
+    expected = allocate_highest_priority(programs, applications)
+    assert snapshot(allocate_parallel(programs, applications, workers=WORKERS)) == snapshot(expected)
+
+
+def test_programs_without_applications(parallel_pool):
+    programs, applications = generate(5, people=200, clusters=4)
+    programs.append(Program("Программа без заявлений", 10))
+
+    actual = allocate_parallel(programs, applications, workers=WORKERS)
+
+    assert snapshot(actual) == snapshot(allocate_highest_priority(programs, applications))
+    assert actual["Программа без заявлений"].enrolled == []
+    assert actual["Программа без заявлений"].rejected == []
+    assert actual[programs[0].name].enrolled == []
+
+
+def test_no_applications(parallel_pool):
+    programs = [Program("Программа 1", 5), Program("Программа 2", 0)]
+
+    actual = allocate_parallel(programs, [], workers=WORKERS)
+
+    assert snapshot(actual) == {"Программа 1": ([], []), "Программа 2": ([], [])}
+    assert allocate_parallel([], [], workers=WORKERS) == {}
+
+
+def test_calculate_enrollment_engines(parallel_pool, monkeypatch, applicants_db):
+    """calculate_enrollment над БД: неактивные программы и отклоненные заявления"""
+    programs, applications = generate(6, people=400, clusters=4)
+    rng = random.Random(6)
+    rejected = {application.id for application in applications if rng.random() < 0.05}
+    db = applicants_db(programs, applications, inactive=["Закрытая программа"], rejected=rejected)
+
+    results = {}
+    for engine in ("python", "parallel"):
+        monkeypatch.setattr(enrollment, "ENROLLMENT_ENGINE", engine)
+        results[engine] = snapshot(enrollment.calculate_enrollment(db))
+
+    assert "Закрытая программа" not in results["python"]
+    assert results["parallel"] == results["python"]
@@ -0,0 +1,180 @@
+"""
+crud.update_applicant_programs: обмен и перенос приоритетов через временные
+значения ("#id" и отрицательные приоритеты), вставка и удаление в одном
+запросе, ошибки уникальности. После каждого изменения счетчики статистики
+должны совпадать с applicants, а версия данных - вырасти ровно на единицу;
+при ошибке не меняется ни то, ни другое.
+"""
+import pytest
+from sqlalchemy import event, func, insert
+
+import crud
+import data_version
+import database
+import models
+from applicant_stats import _combination
+from benchmarks.enrollment_engine import Application, Program
+
+SNILS = "12345678901"
+PHONE = "+72345678901"
+
+
+@pytest.fixture
+def db(applicants_db):
+    """Абитуриент с тремя программами и еще один абитуриент"""
+    programs = [Program(f"Программа {i}", 10) for i in range(1, 5)]
+    return applicants_db(programs, [
+        Application(1, SNILS, "Программа 1", 1, 250),
+        Application(2, SNILS, "Программа 2", 2, 270),
+        Application(3, SNILS, "Программа 3", 3, None),
+        Application(10, "00000000010", "Программа 1", 1, 200),
+    ])
+
+
+def programs_of(db, phone=PHONE):
+    """(id, программа, приоритет) записей абитуриента"""
+    db.expire_all()
+    return [
+        (a.id, a.program, a.priority)
+        for a in db.query(models.Applicant).filter(models.Applicant.phone == phone).order_by(models.Applicant.id)
+    ]
+
+
+def counters(db):
+    return {
+        (row.status, row.program, row.source): row.count
+        for row in db.query(models.ApplicantStatsCounter) if row.count
+    }
+
+
+def assert_counters_match(db):
+    """Счетчики совпадают с GROUP BY по applicants"""
+    a = models.Applicant
+    expected = {
+        _combination(status, program, source): count
+        for status, program, source, count in db.query(a.status, a.program, a.source, func.count()).group_by(
+            a.status, a.program, a.source
+        )
+    }
+    assert counters(db) == expected
+
+
+def test_swap_priorities(db):
+    version = data_version.current_version(db)
+    before = counters(db)
+
+    result = crud.update_applicant_programs(db, PHONE, [
+        {"id": 1, "program": "Программа 1", "priority": 2},
+        {"id": 2, "program": "Программа 2", "priority": 1},
+        {"id": 3, "program": "Программа 3", "priority": 3},
+    ])
+
+    assert [(a.id, a.priority) for a in result] == [(1, 2), (2, 1), (3, 3)]
+    assert programs_of(db) == [(1, "Программа 1", 2), (2, "Программа 2", 1), (3, "Программа 3", 3)]
+    assert counters(db) == before
+    assert_counters_match(db)
+    assert data_version.current_version(db) == version + 1
+
+
+def test_move_program_to_other_priority(db):
+    version = data_version.current_version(db)
+    before = counters(db)
+
+    crud.update_applicant_programs(db, PHONE, [
+        {"id": 3, "program": "Программа 3", "priority": 1},
+        {"id": 1, "program": "Программа 4", "priority": 2},
+        {"id": 2, "program": "Программа 2", "priority": 3},
+    ])
+
+    assert programs_of(db) == [(1, "Программа 4", 2), (2, "Программа 2", 3), (3, "Программа 3", 1)]
+    after = counters(db)
+    assert after[("new", "Программа 1", "bot")] == before[("new", "Программа 1", "bot")] - 1
+    assert after[("new", "Программа 4", "bot")] == 1
+    assert not any(program.startswith("#") for _, program, _ in after)
+    assert_counters_match(db)
+    assert data_version.current_version(db) == version + 1
+
+
+def test_insert_and_delete(db):
+    version = data_version.current_version(db)
+
+    result = crud.update_applicant_programs(db, PHONE, [
+        {"id": 2, "program": "Программа 2", "priority": 1},
+        {"id": None, "program": "Программа 4", "priority": 2},
+        {"id": 1, "program": "Программа 1", "priority": 3},
+    ])
+
+    new = result[1]
+    assert [a.id for a in result] == [2, new.id, 1]
+    assert (new.snils, new.exam_results, new.status) == (SNILS, 270, "new")
+    assert programs_of(db) == [(1, "Программа 1", 3), (2, "Программа 2", 1), (new.id, "Программа 4", 2)]
+    after = counters(db)
+    assert ("new", "Программа 3", "bot") not in after
+    assert after[("new", "Программа 4", "bot")] == 1
+    assert_counters_match(db)
+    assert data_version.current_version(db) == version + 1
+
+
+@pytest.mark.parametrize(
+    "programs, message",
+    [
+        (
+            [{"id": 1, "program": "Программа 2", "priority": 1}, {"id": 2, "program": "Программа 2", "priority": 2}],
+            "Программы должны быть уникальными",
+        ),
+        (
+            [{"id": 1, "program": "Программа 1", "priority": 1}, {"id": None, "priority": 2}, {"id": None, "priority": 3}],
+            "Программа '' уже существует",
+        ),
+        # Приоритеты 1 и "1" различаются в запросе, повтор находит уникальный индекс (IntegrityError)
+        (
+            [{"id": 1, "program": "Программа 1", "priority": 2}, {"id": 2, "program": "Программа 2", "priority": "2"}],
+            "Приоритеты должны быть уникальными",
+        ),
+    ],
+    ids=["request", "empty-programs", "unique-index"],
+)
+def test_duplicates_change_nothing(db, programs, message):
+    version = data_version.current_version(db)
+    before_programs, before_counters = programs_of(db), counters(db)
+
+    with pytest.raises(ValueError, match=message):
+        crud.update_applicant_programs(db, PHONE, programs)
+
+    assert programs_of(db) == before_programs
+    assert counters(db) == before_counters
+    assert data_version.current_version(db) == version
+
+
+def test_duplicate_program_from_concurrent_request(db):
+    """Параллельный запрос успел добавить ту же программу: IntegrityError и откат"""
+    version = data_version.current_version(db)
+    before_counters = counters(db)
+
+    def add_same_program(orm_execute_state):
+        if orm_execute_state.is_update and not add_same_program.done:
+            add_same_program.done = True
+            with database.engine.begin() as connection:
+                connection.execute(insert(models.Applicant).values(
+                    id=20, applicant_id="A20", name="Абитуриент", phone=PHONE, snils=SNILS,
+                    program="Программа 4", priority=4, status="new", source="bot",
+                ))
+
+    add_same_program.done = False
+    event.listen(db, "do_orm_execute", add_same_program)
+    try:
+        with pytest.raises(ValueError, match="изменены параллельно"):
+            crud.update_applicant_programs(db, PHONE, [
+                {"id": 1, "program": "Программа 4", "priority": 1},
+                {"id": 2, "program": "Программа 2", "priority": 2},
+                {"id": 3, "program": "Программа 3", "priority": 3},
+            ])
+    finally:
+        event.remove(db, "do_orm_execute", add_same_program)
+
+    assert programs_of(db) == [
+        (1, "Программа 1", 1), (2, "Программа 2", 2), (3, "Программа 3", 3), (20, "Программа 4", 4),
+    ]
+    # Вставка в обход сессии не меняет ни счетчики, ни версию данных
+    assert counters(db) == before_counters
+    assert data_version.current_version(db) == version
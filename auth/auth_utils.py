@@ -1,17 +1,48 @@
+import asyncio
+import contextvars
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
-from jose import JWTError, jwt
+from functools import partial
+from typing import Callable, Optional, Tuple, TypeVar
+from jose import jwt
 from passlib.context import CryptContext
-from sqlalchemy.orm import Session
+from common.jwt_tokens import JWT_ALGORITHM, JWT_SECRET_KEY, decode_token, token_digest  # noqa: F401
 import crud
+import database
 import models
 import schemas
 
-SECRET_KEY = "your-secret-key-here-change-in-production"
-ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24
+SECRET_KEY = JWT_SECRET_KEY
+ALGORITHM = JWT_ALGORITHM
+# Срок действия токена. В режиме локальной проверки (AUTH_VERIFY_MODE=local) сессия,
+# удаленная в обход crud (напрямую в БД), остается действительной до exp токена
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", str(60 * 24)))
+
+# Пул потоков для bcrypt и синхронных запросов к БД, чтобы они не блокировали event loop
+AUTH_WORKER_THREADS = int(os.getenv("AUTH_WORKER_THREADS", "4"))
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+worker_pool = ThreadPoolExecutor(max_workers=AUTH_WORKER_THREADS, thread_name_prefix="auth-worker")
+
+T = TypeVar("T")
+
+async def run_in_worker(func: Callable[..., T], *args, **kwargs) -> T:
+    """Выполнить блокирующую функцию в ограниченном пуле потоков"""
+    loop = asyncio.get_running_loop()
+    # Контекст запроса передается в поток, чтобы SQL-запросы попадали в метрики запроса
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(worker_pool, partial(context.run, func, *args, **kwargs))
+
+async def run_db_in_worker(func: Callable[..., T], db, *args, **kwargs) -> T:
+    """
+    Выполнить функцию crud без блокировки event loop: в режиме DB_MODE=async
+    через AsyncSession, иначе в пуле потоков.
+    """
+    if database.DB_MODE == "async":
+        return await database.run_db(func, db, *args, **kwargs)
+    return await run_in_worker(func, db, *args, **kwargs)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
@@ -26,33 +57,52 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     else:
         expire = datetime.now() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     
-    to_encode.update({"exp": expire})
+    # jti делает токены уникальными, даже если они выданы в одну секунду
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
 def verify_token(token: str) -> Optional[schemas.TokenData]:
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        user_id: int = payload.get("user_id")
-        user_type: str = payload.get("user_type")
-        
-        if username is None:
-            return None
-        
-        return schemas.TokenData(
-            username=username,
-            user_id=user_id,
-            user_type=user_type
-        )
-    except JWTError:
-        return None
+    claims = decode_token(token)
+    return schemas.TokenData(**claims) if claims else None
 
-def authenticate_admin(db: Session, username: str, password: str) -> Optional[models.Admin]:
-    admin = crud.get_admin_by_username(db, username)
+async def authenticate_admin(db, username: str, password: str) -> Optional[models.Admin]:
+    admin = await run_db_in_worker(crud.get_admin_by_username, db, username)
     if not admin:
         return None
-    if not verify_password(password, admin.hashed_password):
+    if not await run_in_worker(verify_password, password, admin.hashed_password):
         return None
     return admin
 
+
+async def login_admin(db, username: str, password: str) -> Optional[Tuple[schemas.Admin, str]]:
+    """
+    Проверяет пароль, выпускает токен и создает сессию.
+    bcrypt выполняется в пуле потоков, запросы к БД - через run_db_in_worker.
+    """
+    admin = await authenticate_admin(db, username, password)
+    if not admin:
+        return None
+    admin_data = schemas.Admin.model_validate(admin)
+
+    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    expires_at = datetime.now() + access_token_expires
+
+    access_token = create_access_token(
+        data={
+            "sub": admin.username,
+            "user_id": admin.id,
+            "user_type": "admin"
+        },
+        expires_delta=access_token_expires
+    )
+
+    session_create = schemas.SessionCreate(
+        user_id=admin.id,
+        user_type="admin",
+        token=access_token,
+        expires_at=expires_at
+    )
+    await run_db_in_worker(crud.create_session, db, session_create)
+
+    return admin_data, access_token
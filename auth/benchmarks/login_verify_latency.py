@@ -0,0 +1,85 @@
+"""
+Бенчмарк: задержка /api/auth/verify во время параллельных логинов.
+
+Сначала измеряется задержка /verify без нагрузки, затем - пока несколько
+клиентов непрерывно вызывают /api/auth/login (bcrypt). Если логин не
+блокирует event loop, задержка /verify в обеих фазах должна быть близкой.
+
+Запуск (сервис auth должен быть запущен):
+    python benchmarks/login_verify_latency.py --url http://localhost:8001
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from typing import List
+
+import httpx
+
+
+async def login(client: httpx.AsyncClient, username: str, password: str) -> str:
+    response = await client.post(
+        "/api/auth/login", json={"username": username, "password": password}
+    )
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+async def measure_verify(client: httpx.AsyncClient, token: str, requests: int) -> List[float]:
+    latencies = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        response = await client.post("/api/auth/verify", json={"token": token})
+        latencies.append((time.perf_counter() - started) * 1000)
+        response.raise_for_status()
+    return latencies
+
+
+async def login_loop(client: httpx.AsyncClient, username: str, password: str, stop: asyncio.Event) -> int:
+    count = 0
+    while not stop.is_set():
+        await login(client, username, password)
+        count += 1
+    return count
+
+
+def report(title: str, latencies: List[float]) -> None:
+    ordered = sorted(latencies)
+    p95 = ordered[int(len(ordered) * 0.95) - 1]
+    print(
+        f"{title:<28} p50={statistics.median(ordered):7.2f} мс  "
+        f"p95={p95:7.2f} мс  max={ordered[-1]:7.2f} мс"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8001")
+    parser.add_argument("--username", default="admin")
+    parser.add_argument("--password", default="admin123")
+    parser.add_argument("--requests", type=int, default=200, help="число запросов /verify в каждой фазе")
+    parser.add_argument("--logins", type=int, default=8, help="число параллельных клиентов, выполняющих логин")
+    args = parser.parse_args()
+
+    async with httpx.AsyncClient(base_url=args.url, timeout=30.0) as client:
+        token = await login(client, args.username, args.password)
+
+        baseline = await measure_verify(client, token, args.requests)
+
+        stop = asyncio.Event()
+        loops = [
+            asyncio.create_task(login_loop(client, args.username, args.password, stop))
+            for _ in range(args.logins)
+        ]
+        await asyncio.sleep(0.2)
+        under_load = await measure_verify(client, token, args.requests)
+        stop.set()
+        logins_done = sum(await asyncio.gather(*loops))
+
+    report("/verify без нагрузки", baseline)
+    report(f"/verify + {args.logins} логинов", under_load)
+    print(f"Логинов выполнено во время замера: {logins_done}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,8 +1,10 @@
 from datetime import datetime
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from sqlalchemy.orm import Session
 import models
 import schemas
+import auth_utils
+from session_index import session_index
 
 def get_admin_by_username(db: Session, username: str) -> Optional[models.Admin]:
     return db.query(models.Admin).filter(models.Admin.username == username).first()
@@ -45,34 +47,99 @@ def update_admin(
     return db_admin
 
 def delete_admin(db: Session, admin_id: int) -> bool:
+    """Удаляет администратора вместе с его сессиями (токены заносятся в отозванные)"""
     db_admin = get_admin_by_id(db, admin_id)
     if not db_admin:
         return False
+    sessions = db.query(models.Session).filter(
+        models.Session.user_id == admin_id,
+        models.Session.user_type == "admin"
+    ).all()
+    revoked = _revoke_sessions(db, sessions)
     db.delete(db_admin)
     db.commit()
+    session_index.remove_hashes(revoked)
     return True
 
 def create_session(db: Session, session: schemas.SessionCreate) -> models.Session:
-    db_session = models.Session(**session.model_dump())
+    db_session = models.Session(
+        user_id=session.user_id,
+        user_type=session.user_type,
+        token_hash=auth_utils.token_digest(session.token),
+        expires_at=session.expires_at
+    )
     db.add(db_session)
     db.commit()
     db.refresh(db_session)
+    session_index.add(session.token, db_session.expires_at)
     return db_session
 
 def get_session_by_token(db: Session, token: str) -> Optional[models.Session]:
-    return db.query(models.Session).filter(models.Session.token == token).first()
+    token_hash = auth_utils.token_digest(token)
+    return db.query(models.Session).filter(models.Session.token_hash == token_hash).first()
+
+def _revoke_sessions(db: Session, sessions: List[models.Session]) -> List[str]:
+    """
+    Удаляет сессии и заносит их неистекшие токены в список отозванных,
+    чтобы сервисы с локальной проверкой JWT перестали их принимать.
+    Фиксирует изменения вызывающий; возвращает отпечатки удаленных токенов.
+    """
+    now = datetime.now()
+    for db_session in sessions:
+        if db_session.expires_at > now:
+            db.add(models.RevokedToken(
+                token_hash=db_session.token_hash,
+                expires_at=db_session.expires_at
+            ))
+        db.delete(db_session)
+    return [db_session.token_hash for db_session in sessions]
 
 def delete_session(db: Session, token: str) -> bool:
+    """Удаляет сессию (logout/refresh) и отзывает ее токен"""
     db_session = get_session_by_token(db, token)
     if not db_session:
         return False
-    db.delete(db_session)
+    _revoke_sessions(db, [db_session])
     db.commit()
+    session_index.remove(token)
     return True
 
+def get_revoked_token_hashes(db: Session) -> List[str]:
+    now = datetime.now()
+    rows = db.query(models.RevokedToken.token_hash).filter(
+        models.RevokedToken.expires_at >= now
+    ).all()
+    return [row.token_hash for row in rows]
+
 def delete_expired_sessions(db: Session) -> int:
     now = datetime.now()
     count = db.query(models.Session).filter(models.Session.expires_at < now).delete()
+    db.query(models.RevokedToken).filter(models.RevokedToken.expires_at < now).delete()
     db.commit()
+    session_index.remove_expired(now)
     return count
 
+def delete_expired_sessions_batch(db: Session, batch_size: int) -> Tuple[int, int]:
+    """
+    Удаляет не более batch_size истекших сессий и не более batch_size
+    истекших отозванных токенов. Возвращает число удаленных тех и других.
+    """
+    now = datetime.now()
+
+    expired_sessions = db.query(models.Session.id).filter(
+        models.Session.expires_at < now
+    ).limit(batch_size).scalar_subquery()
+    count = db.query(models.Session).filter(
+        models.Session.id.in_(expired_sessions)
+    ).delete(synchronize_session=False)
+
+    expired_revocations = db.query(models.RevokedToken.id).filter(
+        models.RevokedToken.expires_at < now
+    ).limit(batch_size).scalar_subquery()
+    revoked_count = db.query(models.RevokedToken).filter(
+        models.RevokedToken.id.in_(expired_revocations)
+    ).delete(synchronize_session=False)
+
+    db.commit()
+    session_index.remove_expired(now)
+    return count, revoked_count
@@ -1,3 +1,4 @@
+import asyncio
 from datetime import timedelta, datetime
 from typing import List
 from fastapi import FastAPI, Depends, HTTPException, status
@@ -8,8 +9,11 @@ import models
 import schemas
 import crud
 import auth_utils
-from database import get_db, init_db
+from database import get_db, run_db, init_db, get_db_metrics, dispose_db, SessionLocal
+from common.instrumentation import MetricsMiddleware, metrics_response
 from init_data import init_test_data
+from session_index import session_index
+from session_sweeper import run_session_sweeper
 
 app = FastAPI(title="Auth Service", version="1.0.0")
 
@@ -21,11 +25,26 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(MetricsMiddleware)
+
 @app.on_event("startup")
 async def startup_event():
     init_db()
     init_test_data()
+    db = SessionLocal()
+    try:
+        loaded = session_index.load(db)
+    finally:
+        db.close()
     print("✅ Auth Service: Database initialized")
+    print(f"✅ Auth Service: {loaded} active sessions loaded into memory")
+    app.state.session_sweeper = asyncio.create_task(run_session_sweeper())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    app.state.session_sweeper.cancel()
+    auth_utils.worker_pool.shutdown(wait=False)
+    await dispose_db()
 
 @app.get("/")
 async def root():
@@ -35,35 +54,24 @@ async def root():
 async def health():
     return {"status": "healthy"}
 
+@app.get("/metrics")
+async def metrics():
+    return metrics_response()
+
+@app.get("/metrics/db")
+async def db_metrics():
+    return get_db_metrics()
+
 @app.post("/api/auth/login", response_model=schemas.LoginResponse)
 async def login(login_data: schemas.LoginRequest, db: Session = Depends(get_db)):
-    admin = auth_utils.authenticate_admin(db, login_data.username, login_data.password)
-    if not admin:
+    result = await auth_utils.login_admin(db, login_data.username, login_data.password)
+    if not result:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    
-    access_token_expires = timedelta(minutes=auth_utils.ACCESS_TOKEN_EXPIRE_MINUTES)
-    expires_at = datetime.now() + access_token_expires
-    
-    access_token = auth_utils.create_access_token(
-        data={
-            "sub": admin.username,
-            "user_id": admin.id,
-            "user_type": "admin"
-        },
-        expires_delta=access_token_expires
-    )
-    
-    session_create = schemas.SessionCreate(
-        user_id=admin.id,
-        user_type="admin",
-        token=access_token,
-        expires_at=expires_at
-    )
-    crud.create_session(db, session_create)
+    admin, access_token = result
     
     return {
         "access_token": access_token,
@@ -74,18 +82,17 @@ async def login(login_data: schemas.LoginRequest, db: Session = Depends(get_db))
 
 @app.post("/api/auth/logout")
 async def logout(token: str, db: Session = Depends(get_db)):
-    crud.delete_session(db, token)
+    await run_db(crud.delete_session, db, token)
     return {"message": "Logged out successfully"}
 
 @app.post("/api/auth/verify", response_model=schemas.VerifyTokenResponse)
-async def verify_token(request: schemas.VerifyTokenRequest, db: Session = Depends(get_db)):
+async def verify_token(request: schemas.VerifyTokenRequest):
     token_data = auth_utils.verify_token(request.token)
     
     if not token_data:
         return schemas.VerifyTokenResponse(valid=False)
     
-    session = crud.get_session_by_token(db, request.token)
-    if not session or session.expires_at < datetime.now():
+    if not session_index.is_active(request.token):
         return schemas.VerifyTokenResponse(valid=False)
     
     return schemas.VerifyTokenResponse(
@@ -95,6 +102,42 @@ async def verify_token(request: schemas.VerifyTokenRequest, db: Session = Depend
         username=token_data.username
     )
 
+@app.post("/api/auth/verify-batch", response_model=schemas.VerifyTokenBatchResponse)
+async def verify_token_batch(request: schemas.VerifyTokenBatchRequest):
+    """
+    Проверка нескольких токенов за один запрос: каждый токен декодируется один раз,
+    сессии проверяются по индексу в памяти.
+    Результаты возвращаются в порядке переданных токенов.
+    """
+    decoded = {token: auth_utils.verify_token(token) for token in set(request.tokens)}
+    now = datetime.now()
+
+    results = []
+    for token in request.tokens:
+        token_data = decoded[token]
+        if not token_data or not session_index.is_active(token, now):
+            results.append(schemas.VerifyTokenResponse(valid=False))
+            continue
+        results.append(schemas.VerifyTokenResponse(
+            valid=True,
+            user_id=token_data.user_id,
+            user_type=token_data.user_type,
+            username=token_data.username
+        ))
+
+    return schemas.VerifyTokenBatchResponse(results=results)
+
+@app.get("/api/auth/revoked", response_model=schemas.RevokedTokensResponse)
+async def get_revoked_tokens(db: Session = Depends(get_db)):
+    """
+    Компактный список SHA-256 отпечатков отозванных, но еще не истекших токенов.
+    Используется сервисами, проверяющими JWT локально (AUTH_VERIFY_MODE=local).
+    """
+    return schemas.RevokedTokensResponse(
+        tokens=await run_db(crud.get_revoked_token_hashes, db),
+        generated_at=datetime.now()
+    )
+
 @app.post("/api/auth/refresh", response_model=schemas.Token)
 async def refresh_token(token: str, db: Session = Depends(get_db)):
     token_data = auth_utils.verify_token(token)
@@ -105,7 +148,7 @@ async def refresh_token(token: str, db: Session = Depends(get_db)):
             detail="Invalid token"
         )
     
-    crud.delete_session(db, token)
+    await run_db(crud.delete_session, db, token)
     
     access_token_expires = timedelta(minutes=auth_utils.ACCESS_TOKEN_EXPIRE_MINUTES)
     expires_at = datetime.now() + access_token_expires
@@ -125,7 +168,7 @@ async def refresh_token(token: str, db: Session = Depends(get_db)):
         token=new_token,
         expires_at=expires_at
     )
-    crud.create_session(db, session_create)
+    await run_db(crud.create_session, db, session_create)
     
     return {
         "access_token": new_token,
@@ -139,23 +182,23 @@ async def get_admins(
     limit: int = 100,
     db: Session = Depends(get_db)
 ):
-    return crud.get_admins(db, skip=skip, limit=limit)
+    return await run_db(crud.get_admins, db, skip=skip, limit=limit)
 
 @app.get("/api/admins/{admin_id}", response_model=schemas.Admin)
 async def get_admin(admin_id: int, db: Session = Depends(get_db)):
-    admin = crud.get_admin_by_id(db, admin_id)
+    admin = await run_db(crud.get_admin_by_id, db, admin_id)
     if not admin:
         raise HTTPException(status_code=404, detail="Admin not found")
     return admin
 
 @app.post("/api/admins", response_model=schemas.Admin)
 async def create_admin(admin: schemas.AdminCreate, db: Session = Depends(get_db)):
-    existing = crud.get_admin_by_username(db, admin.username)
+    existing = await auth_utils.run_db_in_worker(crud.get_admin_by_username, db, admin.username)
     if existing:
         raise HTTPException(status_code=400, detail="Username already exists")
     
-    hashed_password = auth_utils.get_password_hash(admin.password)
-    return crud.create_admin(db, admin, hashed_password)
+    hashed_password = await auth_utils.run_in_worker(auth_utils.get_password_hash, admin.password)
+    return await auth_utils.run_db_in_worker(crud.create_admin, db, admin, hashed_password)
 
 @app.put("/api/admins/{admin_id}", response_model=schemas.Admin)
 async def update_admin(
@@ -165,22 +208,22 @@ async def update_admin(
 ):
     hashed_password = None
     if admin.password:
-        hashed_password = auth_utils.get_password_hash(admin.password)
+        hashed_password = await auth_utils.run_in_worker(auth_utils.get_password_hash, admin.password)
     
-    updated = crud.update_admin(db, admin_id, admin, hashed_password)
+    updated = await auth_utils.run_db_in_worker(crud.update_admin, db, admin_id, admin, hashed_password)
     if not updated:
         raise HTTPException(status_code=404, detail="Admin not found")
     return updated
 
 @app.delete("/api/admins/{admin_id}")
 async def delete_admin(admin_id: int, db: Session = Depends(get_db)):
-    if not crud.delete_admin(db, admin_id):
+    if not await run_db(crud.delete_admin, db, admin_id):
         raise HTTPException(status_code=404, detail="Admin not found")
     return {"message": "Admin deleted successfully"}
 
 @app.delete("/api/sessions/cleanup")
 async def cleanup_sessions(db: Session = Depends(get_db)):
-    count = crud.delete_expired_sessions(db)
+    count = await run_db(crud.delete_expired_sessions, db)
     return {"message": f"Deleted {count} expired sessions"}
 
 if __name__ == "__main__":
@@ -1,6 +1,6 @@
 from datetime import datetime
-from typing import Optional
-from pydantic import BaseModel
+from typing import List, Optional
+from pydantic import BaseModel, Field
 
 class AdminBase(BaseModel):
     username: str
@@ -54,7 +54,7 @@ class Session(BaseModel):
     id: int
     user_id: int
     user_type: str
-    token: str
+    token_hash: str
     expires_at: datetime
     created_at: datetime
 
@@ -70,3 +70,13 @@ class VerifyTokenResponse(BaseModel):
     user_type: Optional[str] = None
     username: Optional[str] = None
 
+
+class VerifyTokenBatchRequest(BaseModel):
+    tokens: List[str] = Field(..., max_length=500)
+
+class VerifyTokenBatchResponse(BaseModel):
+    results: List[VerifyTokenResponse]
+
+class RevokedTokensResponse(BaseModel):
+    tokens: List[str]
+    generated_at: datetime
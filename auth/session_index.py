@@ -0,0 +1,74 @@
+"""
+Индекс активных сессий в памяти процесса.
+
+Ключ - SHA-256 отпечаток токена фиксированной длины (32 байта), значение -
+время истечения сессии. Индекс загружается из таблицы sessions при старте,
+а все изменения сессий в crud записываются сначала в БД, затем в индекс,
+поэтому /api/auth/verify отвечает без обращения к Postgres.
+
+Индекс принадлежит одному процессу: сервис запускается одним воркером uvicorn.
+"""
+import hashlib
+import threading
+from datetime import datetime
+from typing import Dict, Optional
+
+from sqlalchemy.orm import Session
+
+import models
+
+
+def _key(token: str) -> bytes:
+    return hashlib.sha256(token.encode("utf-8")).digest()
+
+
+class SessionIndex:
+    def __init__(self):
+        self._sessions: Dict[bytes, datetime] = {}
+        self._lock = threading.Lock()
+
+    def load(self, db: Session) -> int:
+        """Загрузить все неистекшие сессии из БД"""
+        now = datetime.now()
+        rows = db.query(models.Session.token_hash, models.Session.expires_at).filter(
+            models.Session.expires_at >= now
+        ).all()
+        sessions = {bytes.fromhex(row.token_hash): row.expires_at for row in rows}
+        with self._lock:
+            self._sessions = sessions
+        return len(sessions)
+
+    def add(self, token: str, expires_at: datetime) -> None:
+        with self._lock:
+            self._sessions[_key(token)] = expires_at
+
+    def remove(self, token: str) -> None:
+        with self._lock:
+            self._sessions.pop(_key(token), None)
+
+    def remove_hashes(self, token_hashes) -> None:
+        """Удалить сессии по hex-отпечаткам токенов (из таблицы sessions)"""
+        with self._lock:
+            for token_hash in token_hashes:
+                self._sessions.pop(bytes.fromhex(token_hash), None)
+
+    def get_expires_at(self, token: str) -> Optional[datetime]:
+        return self._sessions.get(_key(token))
+
+    def is_active(self, token: str, now: Optional[datetime] = None) -> bool:
+        expires_at = self.get_expires_at(token)
+        return expires_at is not None and expires_at >= (now or datetime.now())
+
+    def remove_expired(self, now: Optional[datetime] = None) -> int:
+        now = now or datetime.now()
+        with self._lock:
+            expired = [key for key, expires_at in self._sessions.items() if expires_at < now]
+            for key in expired:
+                del self._sessions[key]
+        return len(expired)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
+session_index = SessionIndex()
@@ -0,0 +1,48 @@
+"""
+Фоновая очистка истекших сессий.
+
+Раз в SESSION_SWEEP_INTERVAL_SECONDS удаляет истекшие сессии и отозванные
+токены порциями по SESSION_SWEEP_BATCH_SIZE строк, чтобы таблица sessions
+и ее индекс не росли бесконечно и не блокировались надолго.
+"""
+import asyncio
+import os
+from typing import Tuple
+
+import auth_utils
+import crud
+from database import SessionLocal
+
+SESSION_SWEEP_INTERVAL_SECONDS = float(os.getenv("SESSION_SWEEP_INTERVAL_SECONDS", "300"))
+SESSION_SWEEP_BATCH_SIZE = int(os.getenv("SESSION_SWEEP_BATCH_SIZE", "1000"))
+
+
+def sweep_expired_sessions(batch_size: int = SESSION_SWEEP_BATCH_SIZE) -> Tuple[int, int]:
+    """
+    Удалить все истекшие сессии и отозванные токены порциями, вернуть число
+    удаленных тех и других. Отозванных токенов бывает больше, чем сессий
+    (массовый logout, удаление администратора), поэтому проход идет, пока
+    не закончатся и те, и другие
+    """
+    sessions = revoked = 0
+    db = SessionLocal()
+    try:
+        while True:
+            deleted_sessions, deleted_revoked = crud.delete_expired_sessions_batch(db, batch_size)
+            sessions += deleted_sessions
+            revoked += deleted_revoked
+            if deleted_sessions < batch_size and deleted_revoked < batch_size:
+                return sessions, revoked
+    finally:
+        db.close()
+
+
+async def run_session_sweeper() -> None:
+    while True:
+        await asyncio.sleep(SESSION_SWEEP_INTERVAL_SECONDS)
+        try:
+            sessions, revoked = await auth_utils.run_in_worker(sweep_expired_sessions)
+            if sessions or revoked:
+                print(f"🧹 Auth Service: deleted {sessions} expired sessions, {revoked} expired revoked tokens")
+        except Exception as e:
+            print(f"⚠️ Ошибка очистки сессий: {e}")
@@ -6,7 +6,7 @@ from aiomax import Router
 from aiomax.buttons import CallbackButton, KeyboardBuilder
 
 from app.bot.keyboards import go_to_menu_kb
-from app.services.applicants_service import extract_programs, format_rating_list, get_applicants_by_program, get_applicants_by_user_id
+from app.services.applicants_service import extract_programs, format_rating_list, get_applicants_by_user_id, get_rating_window
 from app.utils.access_control import access_control
 
 
@@ -65,14 +65,14 @@ async def certificates_raiting_handler(cb: aiomax.Callback, user_info):
     await cb.message.edit("🔄 Получаю рейтинговый список...")
 
     async with aiohttp.ClientSession() as session:
-        applicants = await get_applicants_by_program(session, program)
+        rating = await get_rating_window(session, program, app_id)
 
-    if not applicants:
+    if not rating or not rating["entries"]:
         kb = KeyboardBuilder().row(CallbackButton("⬅️ Назад", "applicants"))
-        await cb.message.edit("❗ По этому направлению никто не найден.", keyboard=kb)
+        return await cb.message.edit("❗ По этому направлению никто не найден.", keyboard=kb)
 
     kb = KeyboardBuilder().row(CallbackButton("⬅️ Назад", "applicants"))
-    text = format_rating_list(applicants, app_id)
+    text = format_rating_list(rating, app_id)
 
     await cb.message.edit(text, keyboard=kb)
     # async with aiohttp.ClientSession() as session:
@@ -3,17 +3,19 @@ from app.services.auth_service import auth_service
 from app.utils.url_helper import get_service_url
 
 BASE_URL = f"{get_service_url(8004)}/api/applicants/applicants"
+RATING_URL = f"{get_service_url(8004)}/api/applicants/applicants-rating"
 
 
-async def get_applicants_by_program(session: aiohttp.ClientSession, program: str):
+async def get_rating_window(session: aiohttp.ClientSession, program: str, app_id: str):
+    """Место абитуриента в рейтинге программы: начало и конец списка и соседи"""
     access_token = await auth_service.get_token()
 
     headers = {"Authorization": f"Bearer {access_token}"}
-    params = {"program": program, "sort_by_exam_results": "true"}
+    params = {"program": program, "applicant_id": app_id, "top": 3, "neighbours": 1, "bottom": 3}
 
-    async with session.get(BASE_URL, headers=headers, params=params) as resp:
+    async with session.get(RATING_URL, headers=headers, params=params) as resp:
         if resp.status != 200:
-            return []
+            return None
         return await resp.json()
 
 async def get_applicants_by_user_id(session: aiohttp.ClientSession, max_user_id: int):
@@ -37,71 +39,19 @@ def extract_programs(my_applications):
 
     return programs
 
-def format_rating_list(applicants: list, app_id: str) -> str:
-    applicants_sorted = sorted(
-        applicants,
-        key=lambda a: a["exam_results"] or 0,
-        reverse=True
-    )
-
-    n = len(applicants_sorted)
-
-    my_index = next(
-        (i for i, a in enumerate(applicants_sorted)
-         if a.get("applicant_id") == app_id),
-        None
-    )
-
-    def line(i, a):
-        score = a["exam_results"] if a["exam_results"] is not None else 0
-        name = "🟦 Вы" if a.get("applicant_id") == app_id else a["name"]
-        limit = a.get("program_limit") or 0
-
-        status = " — проходит" if i <= limit else ""
-
-        return f"{i}. {name} — {score}"
-
-    segments = []
+def format_rating_list(rating: dict, app_id: str) -> str:
+    def line(entry):
+        score = entry["exam_results"] if entry["exam_results"] is not None else 0
+        name = "🟦 Вы" if entry["applicant_id"] == app_id else entry["name"]
 
-    top_end = min(3, n)
-    top = list(range(0, top_end))
-    segments.append(top)
-
-    around = []
-    if my_index is not None:
-        if my_index >= top_end:
-            start = max(0, my_index - 1)
-            end = min(n, my_index + 2)
-            around = list(range(start, end))
-            segments.append(around)
-
-    bottom_raw = list(range(max(0, n - 3), n))
-
-    used = set()
-    cleaned_segments = []
-
-    for seg in segments:
-        clean = [i for i in seg if i not in used]
-        if clean:
-            cleaned_segments.append(clean)
-            used.update(clean)
-
-    if cleaned_segments:
-        last_used = max(max(seg) for seg in cleaned_segments)
-    else:
-        last_used = -1
-
-    bottom = [i for i in bottom_raw if i > last_used]
-
-    if bottom:
-        cleaned_segments.append(bottom)
+        return f"{entry['rank']}. {name} — {score}"
 
     result_lines = []
-    for idx, seg in enumerate(cleaned_segments):
-        if idx > 0:
+    previous_rank = None
+    for entry in rating["entries"]:
+        if previous_rank is not None and entry["rank"] > previous_rank + 1:
             result_lines.append("...")
-
-        for i in seg:
-            result_lines.append(line(i + 1, applicants_sorted[i]))
+        result_lines.append(line(entry))
+        previous_rank = entry["rank"]
 
     return "\n".join(result_lines)
@@ -6,9 +6,15 @@ from sqlalchemy.orm import Session
 import models
 import schemas
 import crud
-from database import get_db, init_db
+from database import get_db, run_db, init_db, get_db_metrics, dispose_db
+from common.instrumentation import MetricsMiddleware, metrics_response
 from init_data import init_test_data
-from auth_dependency import get_current_user
+from auth_dependency import (
+    get_current_user,
+    get_auth_metrics,
+    startup_auth_client,
+    shutdown_auth_client,
+)
 
 app = FastAPI(title="Certificates Service", version="1.0.0")
 
@@ -20,12 +26,20 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(MetricsMiddleware)
+
 @app.on_event("startup")
 async def startup_event():
     init_db()
     init_test_data()
+    await startup_auth_client()
     print("✅ Certificates Service: Database initialized")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    await shutdown_auth_client()
+    await dispose_db()
+
 @app.get("/")
 async def root():
     return {"service": "certificates", "version": "1.0.0", "status": "running"}
@@ -34,6 +48,18 @@ async def root():
 async def health():
     return {"status": "healthy"}
 
+@app.get("/metrics/auth")
+async def auth_metrics():
+    return get_auth_metrics()
+
+@app.get("/metrics")
+async def metrics():
+    return metrics_response()
+
+@app.get("/metrics/db")
+async def db_metrics():
+    return get_db_metrics()
+
 @app.get("/api/certificates", response_model=List[schemas.Certificate])
 async def get_certificates(
     max_user_id: Optional[int] = None,
@@ -44,7 +70,8 @@ async def get_certificates(
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    return crud.get_certificates(
+    return await run_db(
+        crud.get_certificates,
         db,
         max_user_id=max_user_id,
         certificate_type=certificate_type,
@@ -55,7 +82,7 @@ async def get_certificates(
 
 @app.get("/api/certificates/{certificate_id}", response_model=schemas.Certificate)
 async def get_certificate(certificate_id: int, db: Session = Depends(get_db)):
-    certificate = crud.get_certificate_by_id(db, certificate_id)
+    certificate = await run_db(crud.get_certificate_by_id, db, certificate_id)
     if not certificate:
         raise HTTPException(status_code=404, detail="Certificate not found")
     return certificate
@@ -66,7 +93,7 @@ async def create_certificate(
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    return crud.create_certificate(db, certificate)
+    return await run_db(crud.create_certificate, db, certificate)
 
 @app.put("/api/certificates/{certificate_id}", response_model=schemas.Certificate)
 async def update_certificate(
@@ -75,14 +102,14 @@ async def update_certificate(
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    updated = crud.update_certificate(db, certificate_id, certificate)
+    updated = await run_db(crud.update_certificate, db, certificate_id, certificate)
     if not updated:
         raise HTTPException(status_code=404, detail="Certificate not found")
     return updated
 
 @app.delete("/api/certificates/{certificate_id}")
 async def delete_certificate(certificate_id: int, db: Session = Depends(get_db)):
-    if not crud.delete_certificate(db, certificate_id):
+    if not await run_db(crud.delete_certificate, db, certificate_id):
         raise HTTPException(status_code=404, detail="Certificate not found")
     return {"message": "Certificate deleted successfully"}
 
@@ -94,11 +121,11 @@ async def get_certificate_types(
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    return crud.get_certificate_types(db, is_active=is_active, skip=skip, limit=limit)
+    return await run_db(crud.get_certificate_types, db, is_active=is_active, skip=skip, limit=limit)
 
 @app.get("/api/certificate-types/{cert_type_id}", response_model=schemas.CertificateType)
 async def get_certificate_type(cert_type_id: int, db: Session = Depends(get_db)):
-    cert_type = crud.get_certificate_type_by_id(db, cert_type_id)
+    cert_type = await run_db(crud.get_certificate_type_by_id, db, cert_type_id)
     if not cert_type:
         raise HTTPException(status_code=404, detail="Certificate type not found")
     return cert_type
@@ -109,7 +136,7 @@ async def create_certificate_type(
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    return crud.create_certificate_type(db, cert_type)
+    return await run_db(crud.create_certificate_type, db, cert_type)
 
 @app.put("/api/certificate-types/{cert_type_id}", response_model=schemas.CertificateType)
 async def update_certificate_type(
@@ -118,20 +145,20 @@ async def update_certificate_type(
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    updated = crud.update_certificate_type(db, cert_type_id, cert_type)
+    updated = await run_db(crud.update_certificate_type, db, cert_type_id, cert_type)
     if not updated:
         raise HTTPException(status_code=404, detail="Certificate type not found")
     return updated
 
 @app.delete("/api/certificate-types/{cert_type_id}")
 async def delete_certificate_type(cert_type_id: int, db: Session = Depends(get_db)):
-    if not crud.delete_certificate_type(db, cert_type_id):
+    if not await run_db(crud.delete_certificate_type, db, cert_type_id):
         raise HTTPException(status_code=404, detail="Certificate type not found")
     return {"message": "Certificate type deleted successfully"}
 
 @app.get("/api/statistics", response_model=schemas.CertificateStatistics)
 async def get_statistics(db: Session = Depends(get_db)):
-    return crud.get_certificate_statistics(db)
+    return await run_db(crud.get_certificate_statistics, db)
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,9 @@
+"""
+Модули, общие для сервисов: проверка токенов (auth_client, jwt_tokens),
+метрики запросов (instrumentation), пул соединений с БД (db_pool),
+сохранение загрузок (file_storage) и основа очистки каталогов загрузок
+(storage_janitor).
+
+Каталог копируется в образ каждого сервиса (см. Dockerfile сервисов) и
+импортируется как пакет common.
+"""
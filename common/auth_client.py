@@ -0,0 +1,493 @@
+"""
+Проверка токенов запросов для сервисов (зависимость get_current_user).
+
+Режим задается AUTH_VERIFY_MODE: remote - запрос к /api/auth/verify для
+каждого токена (с необязательным кэшем успешных проверок), batch -
+одновременные проверки объединяются в запрос к /api/auth/verify-batch,
+local - подпись и срок действия проверяются на месте по общему секрету
+(common.jwt_tokens), а отозванные токены - по списку, периодически
+загружаемому из auth. Сервисы подключают модуль через свой auth_dependency.
+
+Отзыв токена (logout, refresh, удаление администратора) сервис узнает из
+списка /api/auth/revoked, который обновляется раз в
+AUTH_REVOCATION_REFRESH_SECONDS, поэтому отозванный токен может еще
+некоторое время приниматься:
+- remote с кэшем - до AUTH_REVOCATION_REFRESH_SECONDS: запись кэша живет не
+  дольше этого интервала и при каждом попадании сверяется со списком;
+- local - до AUTH_REVOCATION_REFRESH_SECONDS, а если список не удается
+  обновить - до AUTH_REVOCATION_MAX_AGE_SECONDS, после чего токены
+  проверяет auth.
+В режимах remote без кэша и batch отозванный токен отклоняется сразу.
+"""
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import httpx
+from fastapi import HTTPException, Depends, status
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from jose import JWTError, jwt
+
+from common import jwt_tokens
+from common.jwt_tokens import token_digest
+
+security = HTTPBearer()
+
+AUTH_SERVICE_URL = os.getenv("AUTH_SERVICE_URL", "http://auth:8001")
+
+# remote - каждый токен проверяется запросом к /api/auth/verify
+# batch  - одновременные проверки объединяются в один запрос к /api/auth/verify-batch
+# local  - подпись и срок действия проверяются на месте, у auth запрашивается
+#          только периодически обновляемый список отозванных токенов
+AUTH_VERIFY_MODE = os.getenv("AUTH_VERIFY_MODE", "remote")
+
+REVOCATION_REFRESH_SECONDS = float(os.getenv("AUTH_REVOCATION_REFRESH_SECONDS", "30"))
+# Список отозванных токенов старше этого (обновления не удаются) не используется:
+# кэш обходится, локальная проверка заменяется проверкой через auth
+REVOCATION_MAX_AGE_SECONDS = float(os.getenv("AUTH_REVOCATION_MAX_AGE_SECONDS", str(REVOCATION_REFRESH_SECONDS * 2)))
+
+# Кэш успешных проверок токенов (режим remote); по умолчанию выключен (размер 0).
+# Время жизни записи не больше интервала обновления списка отозванных токенов
+TOKEN_CACHE_SIZE = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "0"))
+TOKEN_CACHE_TTL_SECONDS = min(
+    float(os.getenv("AUTH_TOKEN_CACHE_TTL_SECONDS", "60")), REVOCATION_REFRESH_SECONDS
+)
+
+# Пул соединений с сервисом auth
+AUTH_HTTP_MAX_CONNECTIONS = int(os.getenv("AUTH_HTTP_MAX_CONNECTIONS", "100"))
+AUTH_HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("AUTH_HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+AUTH_HTTP_KEEPALIVE_EXPIRY = float(os.getenv("AUTH_HTTP_KEEPALIVE_EXPIRY", "30"))
+AUTH_HTTP2 = os.getenv("AUTH_HTTP2", "false").lower() in ("1", "true", "yes")
+AUTH_HTTP_TIMEOUT = float(os.getenv("AUTH_HTTP_TIMEOUT", "5"))
+
+# Окно накопления и максимальный размер пачки для режима batch
+AUTH_BATCH_WINDOW_MS = float(os.getenv("AUTH_BATCH_WINDOW_MS", "5"))
+AUTH_BATCH_MAX_SIZE = int(os.getenv("AUTH_BATCH_MAX_SIZE", "100"))
+
+
+def decode_token(token: str) -> Optional[dict]:
+    """Локальная проверка JWT: данные пользователя в формате ответа /api/auth/verify"""
+    claims = jwt_tokens.decode_token(token)
+    return dict(claims, valid=True) if claims else None
+
+
+class AuthClient:
+    """
+    Долгоживущий HTTP-клиент для запросов к сервису auth.
+    Создается при старте сервиса и закрывается при остановке,
+    соединения переиспользуются между запросами (keep-alive).
+    """
+
+    def __init__(self):
+        self._client: Optional[httpx.AsyncClient] = None
+        self.requests = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def start(self) -> None:
+        if self._client is not None:
+            return
+        self._client = httpx.AsyncClient(
+            base_url=AUTH_SERVICE_URL,
+            timeout=AUTH_HTTP_TIMEOUT,
+            http2=AUTH_HTTP2,
+            limits=httpx.Limits(
+                max_connections=AUTH_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=AUTH_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=AUTH_HTTP_KEEPALIVE_EXPIRY,
+            ),
+        )
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def request(self, method: str, path: str, **kwargs) -> httpx.Response:
+        # Клиент создается лениво, если сервис не вызвал start() при старте
+        self.start()
+        self.requests += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            return await self._client.request(method, path, **kwargs)
+        except httpx.HTTPError:
+            self.errors += 1
+            raise
+        finally:
+            self.in_flight -= 1
+
+    def stats(self) -> dict:
+        connections = []
+        if self._client is not None:
+            pool = getattr(self._client._transport, "_pool", None)
+            connections = list(getattr(pool, "connections", []))
+        idle = sum(1 for connection in connections if connection.is_idle())
+        return {
+            "started": self._client is not None,
+            "http2": AUTH_HTTP2,
+            "max_connections": AUTH_HTTP_MAX_CONNECTIONS,
+            "max_keepalive_connections": AUTH_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            "keepalive_expiry": AUTH_HTTP_KEEPALIVE_EXPIRY,
+            "connections": len(connections),
+            "idle_connections": idle,
+            "active_connections": len(connections) - idle,
+            "requests": self.requests,
+            "errors": self.errors,
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+        }
+
+
+auth_client = AuthClient()
+
+
+async def startup_auth_client() -> None:
+    auth_client.start()
+
+
+async def shutdown_auth_client() -> None:
+    await batch_verifier.close()
+    await auth_client.close()
+
+
+class BatchVerifier:
+    """
+    Объединяет проверки токенов, пришедшие в течение короткого окна,
+    в один запрос к /api/auth/verify-batch. Одинаковые токены в окне
+    проверяются один раз.
+    """
+
+    def __init__(self, window_ms: float, max_size: int):
+        self.window = window_ms / 1000
+        self.max_size = max_size
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # Отправляемые пачки: event loop хранит задачи только по слабой ссылке,
+        # без этого задача может быть собрана сборщиком мусора, а ожидающие ее
+        # запросы - зависнуть
+        self._tasks: Set[asyncio.Task] = set()
+        self.batches = 0
+        self.tokens = 0
+        self.coalesced = 0
+
+    async def verify(self, token: str) -> Optional[dict]:
+        """Возвращает данные пользователя или None, если токен невалиден"""
+        future = self._pending.get(token)
+        if future is not None:
+            self.coalesced += 1
+        else:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._pending[token] = future
+            if len(self._pending) >= self.max_size:
+                self._flush()
+            elif self._timer is None:
+                self._timer = loop.call_later(self.window, self._flush)
+
+        # shield: отмена одного запроса не должна отменять проверку для остальных
+        return await asyncio.shield(future)
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, {}
+        task = asyncio.get_running_loop().create_task(self._send(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def close(self) -> None:
+        """Отправить накопленные проверки и дождаться ответов (при остановке сервиса)"""
+        self._flush()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _send(self, batch: Dict[str, asyncio.Future]) -> None:
+        tokens: List[str] = list(batch)
+        self.batches += 1
+        self.tokens += len(tokens)
+        try:
+            response = await auth_client.request(
+                "POST", "/api/auth/verify-batch", json={"tokens": tokens}
+            )
+            # Ошибка auth - не повод считать токены пачки невалидными
+            if response.status_code >= 500:
+                raise _unavailable(f"status {response.status_code}")
+            results = response.json()["results"] if response.status_code == 200 else []
+        except (httpx.RequestError, HTTPException) as e:
+            error = e if isinstance(e, HTTPException) else _unavailable(str(e))
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(error)
+            return
+        except Exception as e:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for index, token in enumerate(tokens):
+            user_data = results[index] if index < len(results) else None
+            future = batch[token]
+            if not future.done():
+                future.set_result(user_data if user_data and user_data.get("valid") else None)
+
+    def stats(self) -> dict:
+        return {
+            "window_ms": self.window * 1000,
+            "max_size": self.max_size,
+            "batches": self.batches,
+            "tokens": self.tokens,
+            "coalesced": self.coalesced,
+            "avg_batch_size": round(self.tokens / self.batches, 2) if self.batches else 0.0,
+        }
+
+
+batch_verifier = BatchVerifier(AUTH_BATCH_WINDOW_MS, AUTH_BATCH_MAX_SIZE)
+
+
+def _token_expiry(token: str) -> Optional[float]:
+    """Время истечения токена (exp) без проверки подписи"""
+    try:
+        exp = jwt.get_unverified_claims(token).get("exp")
+    except JWTError:
+        return None
+    return float(exp) if exp is not None else None
+
+
+class TokenCache:
+    """
+    LRU-кэш успешных проверок токенов с ограниченным временем жизни.
+    Ключ - SHA-256 отпечаток токена, запись истекает по TTL или по exp токена,
+    в зависимости от того, что наступит раньше.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, dict]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0 and self.ttl > 0
+
+    def get(self, digest: str) -> Optional[dict]:
+        entry = self._entries.get(digest)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, user_data = entry
+        if expires_at <= time.time():
+            del self._entries[digest]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(digest)
+        self.hits += 1
+        return user_data
+
+    def put(self, digest: str, user_data: dict, token_expires_at: Optional[float] = None) -> None:
+        expires_at = time.time() + self.ttl
+        if token_expires_at is not None:
+            expires_at = min(expires_at, token_expires_at)
+
+        self._entries[digest] = (expires_at, user_data)
+        self._entries.move_to_end(digest)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, digests: Iterable[str]) -> None:
+        for digest in digests:
+            if self._entries.pop(digest, None) is not None:
+                self.invalidations += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+token_cache = TokenCache(TOKEN_CACHE_SIZE, TOKEN_CACHE_TTL_SECONDS)
+
+
+class RevocationList:
+    """Список отпечатков отозванных токенов, периодически загружаемый из auth"""
+
+    def __init__(self, refresh_seconds: float, max_age_seconds: float):
+        self.refresh_seconds = refresh_seconds
+        self.max_age_seconds = max_age_seconds
+        self._tokens: Set[str] = set()
+        self._loaded_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+
+    def __len__(self) -> int:
+        return len(self._tokens)
+
+    def is_stale(self) -> bool:
+        return self._loaded_at is None or time.monotonic() - self._loaded_at >= self.refresh_seconds
+
+    def is_expired(self) -> bool:
+        """Список не загружен или не обновлялся дольше max_age_seconds: ему нельзя доверять"""
+        return self._loaded_at is None or time.monotonic() - self._loaded_at >= self.max_age_seconds
+
+    def age(self) -> Optional[float]:
+        return None if self._loaded_at is None else round(time.monotonic() - self._loaded_at, 1)
+
+    def is_revoked(self, digest: str) -> bool:
+        return digest in self._tokens
+
+    async def refresh(self) -> None:
+        """
+        Загружает список из auth. Ошибка пробрасывается только если список
+        еще ни разу не загружался: до этого отозванные токены отличить нельзя.
+        """
+        async with self._lock:
+            if not self.is_stale():
+                return
+            try:
+                response = await auth_client.request("GET", "/api/auth/revoked")
+                response.raise_for_status()
+                self._tokens = set(response.json()["tokens"])
+                self._loaded_at = time.monotonic()
+            except (httpx.HTTPError, KeyError, ValueError) as e:
+                if self._loaded_at is None:
+                    raise _unavailable(str(e))
+                print(f"⚠️ Не удалось обновить список отозванных токенов: {e}")
+                return
+
+        # Записи отозванных токенов не дожидаются истечения TTL
+        token_cache.invalidate(self._tokens)
+
+
+revocation_list = RevocationList(REVOCATION_REFRESH_SECONDS, REVOCATION_MAX_AGE_SECONDS)
+
+
+def _unavailable(reason: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=f"Authentication service unavailable: {reason}",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+def _unauthorized() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid or expired authentication token",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+async def _verify_locally(token: str) -> dict:
+    user_data = decode_token(token)
+    if not user_data:
+        raise _unauthorized()
+
+    if revocation_list.is_stale():
+        await revocation_list.refresh()
+    if revocation_list.is_expired():
+        # Список давно не обновлялся: отзыв токена мог пройти мимо, проверяет auth
+        return await _verify_remotely(token)
+    if revocation_list.is_revoked(token_digest(token)):
+        raise _unauthorized()
+
+    return user_data
+
+
+async def _verify_cached(token: str) -> dict:
+    digest = token_digest(token)
+
+    try:
+        if revocation_list.is_stale():
+            await revocation_list.refresh()
+    except HTTPException:
+        # Без списка отозванных токенов кэшу доверять нельзя
+        return await _verify_remotely(token)
+    if revocation_list.is_expired():
+        # Список давно не обновлялся: кэш обходится, пока обновление не удастся
+        return await _verify_remotely(token)
+
+    if revocation_list.is_revoked(digest):
+        raise _unauthorized()
+
+    user_data = token_cache.get(digest)
+    if user_data is not None:
+        return user_data
+
+    user_data = await _verify_remotely(token)
+    token_cache.put(digest, user_data, _token_expiry(token))
+    return user_data
+
+
+async def _verify_remotely(token: str) -> dict:
+    if AUTH_VERIFY_MODE == "batch":
+        user_data = await batch_verifier.verify(token)
+        if user_data is None:
+            raise _unauthorized()
+        return user_data
+
+    try:
+        response = await auth_client.request("POST", "/api/auth/verify", json={"token": token})
+    except httpx.RequestError as e:
+        raise _unavailable(str(e))
+
+    if response.status_code >= 500:
+        raise _unavailable(f"status {response.status_code}")
+    if response.status_code == 200:
+        user_data = response.json()
+        if user_data.get("valid"):
+            return user_data
+
+    raise _unauthorized()
+
+
+async def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+) -> dict:
+    token = credentials.credentials
+
+    try:
+        if AUTH_VERIFY_MODE == "local":
+            return await _verify_locally(token)
+        if token_cache.enabled:
+            return await _verify_cached(token)
+        return await _verify_remotely(token)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Authentication error: {str(e)}",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+
+def get_auth_metrics() -> dict:
+    return {
+        "mode": AUTH_VERIFY_MODE,
+        "token_cache": token_cache.stats(),
+        "revoked_tokens": len(revocation_list),
+        "revoked_tokens_age_seconds": revocation_list.age(),
+        "http_pool": auth_client.stats(),
+        "batching": batch_verifier.stats(),
+    }
@@ -0,0 +1,120 @@
+"""
+Настройки пула соединений с БД и его метрики.
+
+Параметры пула задаются переменными окружения и одинаково применяются к
+синхронному и асинхронному движку. Пулы считают время ожидания соединения
+и таймауты; состояние отдается эндпоинтом /metrics/db.
+"""
+import os
+import threading
+import time
+from typing import Any, Dict
+
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+# Сколько секунд ждать свободное соединение, прежде чем вернуть ошибку
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Соединения старше DB_POOL_RECYCLE секунд пересоздаются (-1 - никогда)
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+# Проверка соединения перед выдачей: переживает перезапуск контейнера Postgres
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+# statement_timeout в Postgres, 0 - без ограничения
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))
+
+
+class PoolStats:
+    """Счетчики выдачи соединений из пула"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record(self, waited: float, timed_out: bool) -> None:
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+    def as_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            attempts = self.checkouts + self.timeouts
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_ms_avg": round(self.wait_seconds_total / attempts * 1000, 3) if attempts else 0.0,
+                "wait_ms_max": round(self.wait_seconds_max * 1000, 3),
+                "wait_ms_total": round(self.wait_seconds_total * 1000, 3),
+            }
+
+
+sync_pool_stats = PoolStats()
+async_pool_stats = PoolStats()
+
+
+class _InstrumentedPoolMixin:
+    # Счетчики хранятся вне экземпляра: пул пересоздается при dispose()
+    stats: PoolStats
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.stats.record(time.perf_counter() - started, timed_out=True)
+            raise
+        self.stats.record(time.perf_counter() - started, timed_out=False)
+        return connection
+
+
+class InstrumentedQueuePool(_InstrumentedPoolMixin, QueuePool):
+    stats = sync_pool_stats
+
+
+class InstrumentedAsyncAdaptedQueuePool(_InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    stats = async_pool_stats
+
+
+def engine_options(url: str, is_async: bool = False) -> Dict[str, Any]:
+    """Аргументы create_engine / create_async_engine с настройками пула"""
+    options: Dict[str, Any] = {
+        "poolclass": InstrumentedAsyncAdaptedQueuePool if is_async else InstrumentedQueuePool,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+    if DB_STATEMENT_TIMEOUT_MS > 0 and url.startswith("postgresql"):
+        if is_async:
+            options["connect_args"] = {
+                "server_settings": {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}
+            }
+        else:
+            options["connect_args"] = {"options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"}
+    return options
+
+
+def pool_metrics(engine) -> Dict[str, Any]:
+    """Состояние пула движка и счетчики ожидания соединений"""
+    pool = engine.pool
+    metrics: Dict[str, Any] = {
+        "pool_size": pool.size(),
+        "max_overflow": DB_MAX_OVERFLOW,
+        "checked_out": pool.checkedout(),
+        "idle": pool.checkedin(),
+        # QueuePool хранит переполнение со смещением -pool_size
+        "overflow": max(pool.overflow(), 0),
+    }
+    stats = getattr(pool, "stats", None)
+    if stats is not None:
+        metrics.update(stats.as_dict())
+    return metrics
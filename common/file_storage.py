@@ -0,0 +1,71 @@
+"""
+Потоковое сохранение загружаемых файлов.
+
+Файл читается из запроса частями по UPLOAD_CHUNK_SIZE байт и пишется на диск
+асинхронно (aiofiles), поэтому ни память процесса, ни event loop не зависят
+от размера файла. По ходу записи считается SHA-256 и проверяется лимит
+размера. Запись идет во временный файл рядом с итоговым, который
+переименовывается только после успешной записи: недописанный файл никогда
+не оказывается по отдаваемому пути.
+"""
+import hashlib
+import os
+import uuid
+from contextlib import suppress
+from dataclasses import dataclass
+from pathlib import Path
+
+import aiofiles
+import aiofiles.os
+from fastapi import HTTPException, UploadFile
+from fastapi.concurrency import run_in_threadpool
+
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+
+MB = 1024 * 1024
+
+
+@dataclass
+class StoredFile:
+    """Сохраненный файл: имя в каталоге, размер в байтах и SHA-256 (hex)"""
+    filename: str
+    size: int
+    sha256: str
+
+
+def _too_large(max_bytes: int) -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"Файл слишком большой: максимальный размер {max_bytes / MB:.0f} МБ"
+    )
+
+
+async def save_upload(file: UploadFile, directory: Path, max_bytes: int) -> StoredFile:
+    """
+    Сохранить загруженный файл в directory под уникальным именем с исходным
+    расширением. Файл больше max_bytes отклоняется с 413.
+    """
+    # Размер известен, если multipart уже разобран: большой файл отклоняется без записи
+    if file.size is not None and file.size > max_bytes:
+        raise _too_large(max_bytes)
+
+    filename = f"{uuid.uuid4()}{Path(file.filename or '').suffix}"
+    temp_path = directory / f".{filename}.part"
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        async with aiofiles.open(temp_path, "wb") as out:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise _too_large(max_bytes)
+                digest.update(chunk)
+                await out.write(chunk)
+            await out.flush()
+            await run_in_threadpool(os.fsync, out.fileno())
+        await aiofiles.os.replace(temp_path, directory / filename)
+    except BaseException:
+        with suppress(FileNotFoundError):
+            await aiofiles.os.remove(temp_path)
+        raise
+    return StoredFile(filename=filename, size=size, sha256=digest.hexdigest())
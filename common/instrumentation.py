@@ -0,0 +1,227 @@
+"""
+Метрики запросов: задержка по шаблону маршрута и коду ответа, число и время
+SQL-запросов на один HTTP-запрос.
+
+MetricsMiddleware открывает для запроса счетчик в contextvar, события движка
+SQLAlchemy (instrument_engine) добавляют в него каждый выполненный запрос.
+Запросы дольше SLOW_REQUEST_MS или с числом SQL-запросов больше
+SLOW_REQUEST_QUERY_COUNT (признак N+1) логируются (логгер common.instrumentation,
+уровень WARNING) и считаются отдельно.
+Все метрики отдаются в формате Prometheus эндпоинтом /metrics.
+"""
+import contextvars
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from fastapi.responses import PlainTextResponse
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "500"))
+SLOW_REQUEST_QUERY_COUNT = int(os.getenv("SLOW_REQUEST_QUERY_COUNT", "20"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+# Маршрут не найден или обработан не APIRoute (например, /uploads)
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+class RequestDbStats:
+    """SQL-запросы одного HTTP-запроса"""
+
+    __slots__ = ("queries", "seconds", "finished")
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+        # После отправки ответа запросы фоновых задач не учитываются
+        self.finished = False
+
+
+_request_db_stats: contextvars.ContextVar[Optional[RequestDbStats]] = contextvars.ContextVar(
+    "request_db_stats", default=None
+)
+
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.total += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latency: Dict[Tuple[str, str, str], Histogram] = {}
+        self.db_queries: Dict[Tuple[str, str, str], Histogram] = {}
+        self.db_seconds: Dict[Tuple[str, str, str], float] = {}
+        self.slow: Dict[Tuple[str, str, str], int] = {}
+
+    def record(self, method: str, route: str, status: int, seconds: float, db: RequestDbStats) -> List[str]:
+        """Учесть запрос; возвращает причины, по которым он считается медленным"""
+        key = (method, route, str(status))
+        reasons = []
+        if seconds * 1000 > SLOW_REQUEST_MS:
+            reasons.append("duration")
+        if db.queries > SLOW_REQUEST_QUERY_COUNT:
+            reasons.append("queries")
+
+        with self._lock:
+            self.latency.setdefault(key, Histogram(LATENCY_BUCKETS)).observe(seconds)
+            self.db_queries.setdefault(key, Histogram(QUERY_COUNT_BUCKETS)).observe(db.queries)
+            self.db_seconds[key] = self.db_seconds.get(key, 0.0) + db.seconds
+            for reason in reasons:
+                slow_key = (method, route, reason)
+                self.slow[slow_key] = self.slow.get(slow_key, 0) + 1
+        return reasons
+
+    def render(self) -> str:
+        lines: List[str] = []
+        with self._lock:
+            _render_histogram(
+                lines, "http_request_duration_seconds",
+                "Request latency by route template and status code", self.latency,
+            )
+            _render_histogram(
+                lines, "http_request_db_queries",
+                "SQL statements executed per request", self.db_queries,
+            )
+            lines.append("# HELP http_request_db_seconds_total Time spent in SQL statements")
+            lines.append("# TYPE http_request_db_seconds_total counter")
+            for key, value in sorted(self.db_seconds.items()):
+                lines.append(f"http_request_db_seconds_total{{{_labels(key)}}} {value:.6f}")
+            lines.append("# HELP http_slow_requests_total Requests over SLOW_REQUEST_MS or SLOW_REQUEST_QUERY_COUNT")
+            lines.append("# TYPE http_slow_requests_total counter")
+            for (method, route, reason), value in sorted(self.slow.items()):
+                labels = f'method="{method}",route="{_escape(route)}",reason="{reason}"'
+                lines.append(f"http_slow_requests_total{{{labels}}} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+
+def _labels(key: Tuple[str, str, str]) -> str:
+    method, route, status = key
+    return f'method="{method}",route="{_escape(route)}",status="{status}"'
+
+
+def _render_histogram(lines: List[str], name: str, help_text: str, series: Dict[Tuple[str, str, str], Histogram]) -> None:
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} histogram")
+    for key, histogram in sorted(series.items()):
+        labels = _labels(key)
+        for bound, count in zip(histogram.buckets, histogram.counts):
+            lines.append(f'{name}_bucket{{{labels},le="{bound:g}"}} {count}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+        lines.append(f"{name}_sum{{{labels}}} {histogram.total:.6f}")
+        lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+
+
+registry = MetricsRegistry()
+
+
+def _is_event_stream(message) -> bool:
+    return any(
+        name.lower() == b"content-type" and value.startswith(b"text/event-stream")
+        for name, value in message.get("headers", [])
+    )
+
+
+class MetricsMiddleware:
+    """ASGI middleware: время ответа и SQL-запросы для каждого HTTP-запроса"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        db_stats = RequestDbStats()
+        token = _request_db_stats.set(db_stats)
+        started = time.perf_counter()
+        status_code = 500
+        recorded = False
+
+        def finish():
+            nonlocal recorded
+            if recorded:
+                return
+            recorded = True
+            db_stats.finished = True
+            elapsed = time.perf_counter() - started
+            # Starlette записывает найденный APIRoute в scope при маршрутизации
+            route = scope.get("route")
+            template = getattr(route, "path", None) or UNMATCHED_ROUTE
+            reasons = registry.record(scope["method"], template, status_code, elapsed, db_stats)
+            if reasons:
+                logger.warning(
+                    "Slow request: %s %s -> %s, %.1f ms, %d SQL (%.1f ms)",
+                    scope["method"], template, status_code,
+                    elapsed * 1000, db_stats.queries, db_stats.seconds * 1000,
+                )
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+            # Время считается до конца тела ответа, без фоновых задач. Поток
+            # событий (SSE) открыт долго по назначению: для него - до начала ответа
+            if message["type"] == "http.response.start" and _is_event_stream(message):
+                finish()
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                finish()
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            finish()
+            _request_db_stats.reset(token)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_started_at"].pop()
+    db_stats = _request_db_stats.get()
+    if db_stats is not None and not db_stats.finished:
+        db_stats.queries += 1
+        db_stats.seconds += time.perf_counter() - started
+
+
+def _handle_error(exception_context):
+    # after_cursor_execute не вызывается для упавшего запроса
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("query_started_at"):
+        conn.info["query_started_at"].pop()
+
+
+def instrument_engine(engine) -> None:
+    """Подписать синхронный движок (или AsyncEngine.sync_engine) на учет SQL-запросов"""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+def metrics_response() -> PlainTextResponse:
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,38 @@
+"""
+JWT-токены сервисов: общий секрет подписи, SHA-256 отпечаток токена и
+проверка подписи и срока действия. Используется сервисом auth при выдаче
+и проверке токенов и остальными сервисами при локальной проверке
+(common.auth_client, AUTH_VERIFY_MODE=local).
+"""
+import hashlib
+import os
+from typing import Optional
+
+from jose import JWTError, jwt
+
+# Секрет должен совпадать во всех сервисах
+JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "your-secret-key-here-change-in-production")
+JWT_ALGORITHM = "HS256"
+
+
+def token_digest(token: str) -> str:
+    """SHA-256 отпечаток токена (используется в списке отозванных токенов)"""
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def decode_token(token: str) -> Optional[dict]:
+    """Данные пользователя из токена (username, user_id, user_type) или None, если токен невалиден"""
+    try:
+        payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
+    except JWTError:
+        return None
+
+    username = payload.get("sub")
+    if username is None:
+        return None
+
+    return {
+        "username": username,
+        "user_id": payload.get("user_id"),
+        "user_type": payload.get("user_type"),
+    }
@@ -0,0 +1,112 @@
+"""
+Основа очистки каталогов загрузок.
+
+Фоновая задача раз в STORAGE_JANITOR_INTERVAL_SECONDS вызывает проход
+очистки сервиса (StorageJanitor.clean): сервис по данным своей БД решает,
+какие файлы больше не нужны. Общее правило для всех сервисов - файлы, на
+которые не ссылается ни одна строка БД (например, замененные или
+недописанные), удаляются, если они старше UPLOAD_ORPHAN_GRACE_HOURS: запись
+в БД может появиться позже файла.
+
+Использование каталогов и итоги последнего прохода отдаются на /metrics/storage.
+"""
+import asyncio
+import os
+from contextlib import suppress
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from fastapi.concurrency import run_in_threadpool
+
+STORAGE_JANITOR_ENABLED = os.getenv("STORAGE_JANITOR_ENABLED", "true").lower() == "true"
+STORAGE_JANITOR_INTERVAL_SECONDS = float(os.getenv("STORAGE_JANITOR_INTERVAL_SECONDS", "600"))
+UPLOAD_ORPHAN_GRACE_HOURS = float(os.getenv("UPLOAD_ORPHAN_GRACE_HOURS", "24"))
+
+MB = 1024 * 1024
+
+
+def list_files(directory: Path) -> List[os.DirEntry]:
+    if not directory.is_dir():
+        return []
+    with os.scandir(directory) as entries:
+        return [entry for entry in entries if entry.is_file()]
+
+
+def remove_file(entry: os.DirEntry) -> int:
+    """Удалить файл; возвращает освобожденные байты"""
+    with suppress(FileNotFoundError):
+        size = entry.stat().st_size
+        os.remove(entry.path)
+        return size
+    return 0
+
+
+def referenced_names(urls: Iterable[Optional[str]]) -> Set[str]:
+    """Имена файлов по их URL (/uploads/.../<имя>)"""
+    return {url.rsplit("/", 1)[-1] for url in urls if url}
+
+
+def directory_usage(directory: Path) -> Dict:
+    files = list_files(directory)
+    return {"files": len(files), "bytes": sum(entry.stat().st_size for entry in files)}
+
+
+class StorageJanitor:
+    """
+    Проход очистки с общими счетчиками. Сервис переопределяет clean (что
+    удалить) и directories (каталоги для /metrics/storage)
+    """
+
+    def __init__(self, session_factory: Callable):
+        self.session_factory = session_factory
+        self.last_run: Optional[Dict] = None
+
+    def directories(self) -> Dict[str, Path]:
+        raise NotImplementedError
+
+    def clean(self, db, grace_deadline: float, stats: Dict) -> None:
+        """Удалить ненужные файлы, увеличивая счетчики stats"""
+        raise NotImplementedError
+
+    def run_once(self) -> Dict:
+        db = self.session_factory()
+        try:
+            grace_deadline = (datetime.now() - timedelta(hours=UPLOAD_ORPHAN_GRACE_HOURS)).timestamp()
+            stats = {"orphans_removed": 0, "freed_bytes": 0}
+            self.clean(db, grace_deadline, stats)
+            stats["finished_at"] = datetime.now().isoformat()
+            self.last_run = stats
+            return stats
+        finally:
+            db.close()
+
+    def remove_orphans(self, directory: Path, referenced: Set[str], grace_deadline: float, stats: Dict) -> None:
+        """Удалить файлы каталога, которых нет среди referenced и которые старше grace_deadline"""
+        for entry in list_files(directory):
+            if entry.name not in referenced and entry.stat().st_mtime < grace_deadline:
+                stats["freed_bytes"] += remove_file(entry)
+                stats["orphans_removed"] += 1
+
+    def usage(self) -> Dict:
+        """Использование каталогов и итоги последнего прохода для /metrics/storage"""
+        usage: Dict = {"enabled": STORAGE_JANITOR_ENABLED}
+        for name, directory in self.directories().items():
+            usage[name] = directory_usage(directory)
+        usage["orphan_grace_hours"] = UPLOAD_ORPHAN_GRACE_HOURS
+        usage["last_run"] = self.last_run
+        return usage
+
+
+async def run_storage_janitor(janitor: StorageJanitor) -> None:
+    """Фоновая задача очистки каталогов"""
+    while True:
+        try:
+            stats = await run_in_threadpool(janitor.run_once)
+            removed = {name: value for name, value in stats.items() if name not in ("freed_bytes", "finished_at")}
+            if any(removed.values()):
+                counts = ", ".join(f"{name}={value}" for name, value in removed.items())
+                print(f"✅ Storage janitor: {counts}, {stats['freed_bytes'] / MB:.1f} MB freed")
+        except Exception as e:
+            print(f"❌ Storage janitor failed: {e}")
+        await asyncio.sleep(STORAGE_JANITOR_INTERVAL_SECONDS)
@@ -1,49 +1,11 @@
-import os
-import httpx
-from fastapi import HTTPException, Depends, status
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-
-security = HTTPBearer()
-
-AUTH_SERVICE_URL = os.getenv("AUTH_SERVICE_URL", "http://auth:8001")
-
-
-async def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security)
-) -> dict:
-    token = credentials.credentials
-    
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{AUTH_SERVICE_URL}/api/auth/verify",
-                json={"token": token},
-                timeout=5.0
-            )
-            
-            if response.status_code == 200:
-                user_data = response.json()
-                if user_data.get("valid"):
-                    return user_data
-            
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid or expired authentication token",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
-            
-    except httpx.RequestError as e:
-        raise HTTPException(
-            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail=f"Authentication service unavailable: {str(e)}",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Authentication error: {str(e)}",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-
+"""
+Проверка токенов запросов через сервис auth. Реализация общая для всех
+сервисов - common.auth_client; режим проверки и кэш настраиваются
+переменными AUTH_* (см. README сервиса auth).
+"""
+from common.auth_client import (  # noqa: F401
+    get_auth_metrics,
+    get_current_user,
+    shutdown_auth_client,
+    startup_auth_client,
+)
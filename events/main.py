@@ -7,9 +7,15 @@ from sqlalchemy.orm import Session
 import models
 import schemas
 import crud
-from database import get_db, init_db
+from database import get_db, run_db, init_db, get_db_metrics, dispose_db
+from common.instrumentation import MetricsMiddleware, metrics_response
 from init_data import init_test_data
-from auth_dependency import get_current_user
+from auth_dependency import (
+    get_current_user,
+    get_auth_metrics,
+    startup_auth_client,
+    shutdown_auth_client,
+)
 
 app = FastAPI(title="Events Service", version="1.0.0")
 
@@ -21,12 +27,20 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(MetricsMiddleware)
+
 @app.on_event("startup")
 async def startup_event():
     init_db()
     init_test_data()
+    await startup_auth_client()
     print("✅ Events Service: Database initialized")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    await shutdown_auth_client()
+    await dispose_db()
+
 @app.get("/")
 async def root():
     return {"service": "events", "version": "1.0.0", "status": "running"}
@@ -35,6 +49,18 @@ async def root():
 async def health():
     return {"status": "healthy"}
 
+@app.get("/metrics/auth")
+async def auth_metrics():
+    return get_auth_metrics()
+
+@app.get("/metrics")
+async def metrics():
+    return metrics_response()
+
+@app.get("/metrics/db")
+async def db_metrics():
+    return get_db_metrics()
+
 @app.get("/api/events/events", response_model=List[schemas.Event])
 async def get_events(
     category: Optional[str] = None,
@@ -46,7 +72,8 @@ async def get_events(
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    return crud.get_events(
+    return await run_db(
+        crud.get_events,
         db,
         category=category,
         status=status,
@@ -58,14 +85,14 @@ async def get_events(
 
 @app.get("/api/events/events/{event_id}", response_model=schemas.Event)
 async def get_event(event_id: int, db: Session = Depends(get_db)):
-    event = crud.get_event_by_id(db, event_id)
+    event = await run_db(crud.get_event_by_id, db, event_id)
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
     return event
 
 @app.post("/api/events/events", response_model=schemas.Event)
 async def create_event(event: schemas.EventCreate, db: Session = Depends(get_db)):
-    return crud.create_event(db, event)
+    return await run_db(crud.create_event, db, event)
 
 @app.put("/api/events/events/{event_id}", response_model=schemas.Event)
 async def update_event(
@@ -74,20 +101,20 @@ async def update_event(
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    updated = crud.update_event(db, event_id, event)
+    updated = await run_db(crud.update_event, db, event_id, event)
     if not updated:
         raise HTTPException(status_code=404, detail="Event not found")
     return updated
 
 @app.delete("/api/events/events/{event_id}")
 async def delete_event(event_id: int, db: Session = Depends(get_db)):
-    if not crud.delete_event(db, event_id):
+    if not await run_db(crud.delete_event, db, event_id):
         raise HTTPException(status_code=404, detail="Event not found")
     return {"message": "Event deleted successfully"}
 
 @app.get("/api/events/statistics", response_model=schemas.EventStatistics)
 async def get_statistics(db: Session = Depends(get_db)):
-    return crud.get_event_statistics(db)
+    return await run_db(crud.get_event_statistics, db)
 
 if __name__ == "__main__":
     import uvicorn
@@ -60,7 +60,7 @@ export default function ApplicantsMain() {
   const [showEnrollmentModal, setShowEnrollmentModal] = useState(false);
   const [enrollmentTaskId, setEnrollmentTaskId] = useState(null);
   const [enrollmentStatus, setEnrollmentStatus] = useState(null);
-  const [enrollmentInterval, setEnrollmentInterval] = useState(null);
+  const [enrollmentStream, setEnrollmentStream] = useState(null);
 
   // Уведомления
   const [notification, setNotification] = useState({
@@ -205,28 +205,29 @@ export default function ApplicantsMain() {
       });
       setShowEnrollmentModal(true);
       
-      // Начинаем опрос статуса
-      const interval = setInterval(async () => {
-        try {
-          const status = await applicantsService.getEnrollmentStatus(result.task_id);
+      // Получаем прогресс потоком событий сервера до завершения расчета
+      const stream = new AbortController();
+      setEnrollmentStream(stream);
+      let finalStatus = null;
+      try {
+        await applicantsService.streamEnrollmentProgress(result.task_id, (status) => {
           setEnrollmentStatus(status);
-          
           if (status.status === "completed" || status.status === "error") {
-            clearInterval(interval);
-            setEnrollmentInterval(null);
-            
-            if (status.status === "completed") {
-              showNotification("success", "Расчет завершен успешно!");
-            } else {
-              showNotification("error", `Ошибка: ${status.error || "Неизвестная ошибка"}`);
-            }
+            finalStatus = status;
           }
-        } catch (err) {
-          console.error("Ошибка проверки статуса:", err);
+        }, stream.signal);
+      } catch (err) {
+        if (err.name !== "AbortError") {
+          console.error("Ошибка получения прогресса:", err);
         }
-      }, 1000); // Проверяем каждую секунду
+      }
+      setEnrollmentStream(null);
       
-      setEnrollmentInterval(interval);
+      if (finalStatus?.status === "completed") {
+        showNotification("success", "Расчет завершен успешно!");
+      } else if (finalStatus?.status === "error") {
+        showNotification("error", `Ошибка: ${finalStatus.error || "Неизвестная ошибка"}`);
+      }
     } catch (err) {
       showNotification("error", `Ошибка запуска расчета: ${err.message}`);
     }
@@ -242,23 +243,23 @@ export default function ApplicantsMain() {
   };
 
   const handleCloseEnrollmentModal = () => {
-    if (enrollmentInterval) {
-      clearInterval(enrollmentInterval);
-      setEnrollmentInterval(null);
+    if (enrollmentStream) {
+      enrollmentStream.abort();
+      setEnrollmentStream(null);
     }
     setShowEnrollmentModal(false);
     setEnrollmentTaskId(null);
     setEnrollmentStatus(null);
   };
 
-  // Очистка интервала при размонтировании
+  // Закрытие потока прогресса при размонтировании
   useEffect(() => {
     return () => {
-      if (enrollmentInterval) {
-        clearInterval(enrollmentInterval);
+      if (enrollmentStream) {
+        enrollmentStream.abort();
       }
     };
-  }, [enrollmentInterval]);
+  }, [enrollmentStream]);
 
   const handleEdit = (applicant) => {
     setSelectedApplicant(applicant);
@@ -1013,6 +1014,9 @@ function EnrollmentCalculationModal({ status, onClose, onDownload }) {
               </span>
               <span className="text-sm font-semibold text-slate-600">
                 {status.progress || 0}%
+                {isProcessing && status.eta_seconds != null && (
+                  <span className="font-normal text-slate-500"> · осталось ~{Math.ceil(status.eta_seconds)} с</span>
+                )}
               </span>
             </div>
             <div className="w-full bg-slate-200 rounded-full h-4 overflow-hidden">
@@ -470,6 +470,46 @@ class ApplicantsService {
     }
   }
 
+  // Прогресс расчета потоком Server-Sent Events. onEvent вызывается с объектом
+  // статуса на каждое событие; промис завершается после события completed/error
+  // или при отмене через signal (AbortController)
+  async streamEnrollmentProgress(taskId, onEvent, signal) {
+    const response = await fetchWithAuth(`${API_ENDPOINTS.applicants}/applicants/enrollment/progress/${taskId}`, {
+      headers: { 'Accept': 'text/event-stream' },
+      signal,
+    });
+
+    if (!response.ok) {
+      throw new Error('Failed to get enrollment progress');
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    for (;;) {
+      const { done, value } = await reader.read();
+      if (done) {
+        return;
+      }
+      buffer += decoder.decode(value, { stream: true });
+
+      // События разделяются пустой строкой; строки ": ..." - keepalive
+      let boundary;
+      while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+        const block = buffer.slice(0, boundary);
+        buffer = buffer.slice(boundary + 2);
+        const data = block
+          .split('\n')
+          .filter((line) => line.startsWith('data: '))
+          .map((line) => line.slice(6))
+          .join('\n');
+        if (data) {
+          onEvent(JSON.parse(data));
+        }
+      }
+    }
+  }
+
   async downloadEnrollmentFile(filename) {
     try {
       const token = getAuthToken();
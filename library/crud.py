@@ -56,12 +56,31 @@ def update_book(
     update_data = book.model_dump(exclude_unset=True)
     for key, value in update_data.items():
         setattr(db_book, key, value)
+    # Хеш относится к загруженному файлу, а не к ссылке, заданной вручную
+    if "pdf_url" in update_data:
+        db_book.pdf_sha256 = None
     
     db_book.updated_at = datetime.now()
     db.commit()
     db.refresh(db_book)
     return db_book
 
+def set_book_pdf(
+    db: Session, book_id: int, pdf_url: str, pdf_sha256: str, is_electronic: bool
+) -> Optional[models.Book]:
+    """Привязать к книге загруженный PDF"""
+    db_book = get_book_by_id(db, book_id)
+    if not db_book:
+        return None
+
+    db_book.pdf_url = pdf_url
+    db_book.pdf_sha256 = pdf_sha256
+    db_book.is_electronic = is_electronic
+    db_book.updated_at = datetime.now()
+    db.commit()
+    db.refresh(db_book)
+    return db_book
+
 def delete_book(db: Session, book_id: int) -> bool:
     db_book = get_book_by_id(db, book_id)
     if not db_book:
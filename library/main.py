@@ -1,17 +1,28 @@
+import asyncio
 from typing import List, Optional
 from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File, Form
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-import uuid
+import os
 from pathlib import Path
 
 import models
 import schemas
 import crud
-from database import get_db, init_db
+from common.file_storage import MB, save_upload
+from database import get_db, run_db, init_db, get_db_metrics, dispose_db
+from common.instrumentation import MetricsMiddleware, metrics_response
 from init_data import init_test_data
-from auth_dependency import get_current_user
+from common.storage_janitor import STORAGE_JANITOR_ENABLED, run_storage_janitor
+from storage_janitor import LibraryStorageJanitor
+from auth_dependency import (
+    get_current_user,
+    get_auth_metrics,
+    startup_auth_client,
+    shutdown_auth_client,
+)
 
 app = FastAPI(title="Library Service", version="1.0.0")
 
@@ -19,6 +30,9 @@ app = FastAPI(title="Library Service", version="1.0.0")
 UPLOAD_DIR = Path("uploads/books")
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 
+# Максимальный размер PDF книги, МБ
+BOOK_PDF_MAX_MB = int(os.getenv("BOOK_PDF_MAX_MB", "100"))
+
 # Подключаем статические файлы для доступа к загруженным файлам
 app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
 
@@ -30,12 +44,26 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(MetricsMiddleware)
+
+storage_janitor = LibraryStorageJanitor(UPLOAD_DIR)
+
 @app.on_event("startup")
 async def startup_event():
     init_db()
     init_test_data()
+    await startup_auth_client()
+    if STORAGE_JANITOR_ENABLED:
+        app.state.storage_janitor = asyncio.create_task(run_storage_janitor(storage_janitor))
     print("✅ Library Service: Database initialized")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    if STORAGE_JANITOR_ENABLED:
+        app.state.storage_janitor.cancel()
+    await shutdown_auth_client()
+    await dispose_db()
+
 @app.get("/")
 async def root():
     return {"service": "library", "version": "1.0.0", "status": "running"}
@@ -44,6 +72,22 @@ async def root():
 async def health():
     return {"status": "healthy"}
 
+@app.get("/metrics/auth")
+async def auth_metrics():
+    return get_auth_metrics()
+
+@app.get("/metrics")
+async def metrics():
+    return metrics_response()
+
+@app.get("/metrics/db")
+async def db_metrics():
+    return get_db_metrics()
+
+@app.get("/metrics/storage")
+async def storage_metrics():
+    return await run_in_threadpool(storage_janitor.usage)
+
 @app.get("/api/books", response_model=List[schemas.Book])
 async def get_books(
     category: Optional[str] = None,
@@ -55,7 +99,8 @@ async def get_books(
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    return crud.get_books(
+    return await run_db(
+        crud.get_books,
         db,
         category=category,
         author=author,
@@ -71,7 +116,7 @@ async def get_book(
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    book = crud.get_book_by_id(db, book_id)
+    book = await run_db(crud.get_book_by_id, db, book_id)
     if not book:
         raise HTTPException(status_code=404, detail="Book not found")
     return book
@@ -82,7 +127,7 @@ async def create_book(
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    return crud.create_book(db, book)
+    return await run_db(crud.create_book, db, book)
 
 @app.put("/api/books/{book_id}", response_model=schemas.Book)
 async def update_book(
@@ -91,7 +136,7 @@ async def update_book(
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    updated = crud.update_book(db, book_id, book)
+    updated = await run_db(crud.update_book, db, book_id, book)
     if not updated:
         raise HTTPException(status_code=404, detail="Book not found")
     return updated
@@ -102,7 +147,7 @@ async def delete_book(
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    if not crud.delete_book(db, book_id):
+    if not await run_db(crud.delete_book, db, book_id):
         raise HTTPException(status_code=404, detail="Book not found")
     return {"message": "Book deleted successfully"}
 
@@ -120,30 +165,22 @@ async def upload_book_pdf(
             raise HTTPException(status_code=400, detail="Файл должен быть в формате PDF")
         
         # Проверяем существование книги
-        book = crud.get_book_by_id(db, book_id)
+        book = await run_db(crud.get_book_by_id, db, book_id)
         if not book:
             raise HTTPException(status_code=404, detail="Book not found")
         
-        # Генерируем уникальное имя файла
-        file_extension = Path(file.filename).suffix
-        unique_filename = f"{uuid.uuid4()}{file_extension}"
-        file_path = UPLOAD_DIR / unique_filename
-        
-        # Сохраняем файл
-        with open(file_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
+        # Сохраняем файл потоково под уникальным именем
+        stored = await save_upload(file, UPLOAD_DIR, BOOK_PDF_MAX_MB * MB)
         
         # Формируем URL для доступа к файлу
-        pdf_url = f"/uploads/books/{unique_filename}"
+        pdf_url = f"/uploads/books/{stored.filename}"
         
         # Обновляем книгу с URL PDF
         # Не меняем is_electronic, если у книги есть бумажные экземпляры
         # is_electronic=True только если книга ТОЛЬКО электронная (без бумажных экземпляров)
-        book = crud.get_book_by_id(db, book_id)
+        book = await run_db(crud.get_book_by_id, db, book_id)
         is_electronic_only = book.total_copies == 0
-        update_data = schemas.BookUpdate(pdf_url=pdf_url, is_electronic=is_electronic_only)
-        updated_book = crud.update_book(db, book_id, update_data)
+        updated_book = await run_db(crud.set_book_pdf, db, book_id, pdf_url, stored.sha256, is_electronic_only)
         
         return updated_book
     except HTTPException:
@@ -153,7 +190,7 @@ async def upload_book_pdf(
 
 @app.get("/api/statistics", response_model=schemas.LibraryStatistics)
 async def get_statistics(db: Session = Depends(get_db)):
-    return crud.get_library_statistics(db)
+    return await run_db(crud.get_library_statistics, db)
 
 if __name__ == "__main__":
     import uvicorn
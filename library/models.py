@@ -17,6 +17,7 @@ class Book(Base):
     description = Column(Text, nullable=True)
     cover_url = Column(String(500), nullable=True)
     pdf_url = Column(String(500), nullable=True)
+    pdf_sha256 = Column(String(64), nullable=True)  # SHA-256 загруженного PDF, hex
     total_copies = Column(Integer, default=1)
     available_copies = Column(Integer, default=1)
     is_electronic = Column(Boolean, default=False)
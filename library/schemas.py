@@ -39,6 +39,8 @@ class BookUpdate(BaseModel):
 
 class Book(BookBase):
     id: int
+    # Заполняется сервисом при загрузке PDF (/upload-pdf)
+    pdf_sha256: Optional[str] = None
     created_at: datetime
     updated_at: datetime
 
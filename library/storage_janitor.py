@@ -0,0 +1,32 @@
+"""
+Очистка каталога загрузок книг (основа - common.storage_janitor).
+
+Проход очистки удаляет файлы, на которые не ссылается ни одна книга
+(например, прежний PDF после повторной загрузки или недописанный файл).
+"""
+from pathlib import Path
+from typing import Dict
+
+from sqlalchemy import or_
+
+import models
+from common.storage_janitor import StorageJanitor, referenced_names
+from database import SessionLocal
+
+
+class LibraryStorageJanitor(StorageJanitor):
+    """Очистка каталога файлов книг"""
+
+    def __init__(self, books_dir: Path):
+        super().__init__(SessionLocal)
+        self.books_dir = books_dir
+
+    def directories(self) -> Dict[str, Path]:
+        return {"books": self.books_dir}
+
+    def clean(self, db, grace_deadline: float, stats: Dict) -> None:
+        urls = db.query(models.Book.pdf_url, models.Book.cover_url).filter(
+            or_(models.Book.pdf_url.isnot(None), models.Book.cover_url.isnot(None))
+        )
+        referenced = referenced_names(url for row in urls for url in row)
+        self.remove_orphans(self.books_dir, referenced, grace_deadline, stats)
@@ -5,9 +5,15 @@ from sqlalchemy.orm import Session
 
 import schemas
 import crud
-from database import get_db, init_db
+from database import get_db, run_db, init_db, get_db_metrics, dispose_db
+from common.instrumentation import MetricsMiddleware, metrics_response
 from init_data import init_test_data
-from auth_dependency import get_current_user
+from auth_dependency import (
+    get_current_user,
+    get_auth_metrics,
+    startup_auth_client,
+    shutdown_auth_client,
+)
 
 app = FastAPI(title="Staff Service", version="1.0.0")
 
@@ -19,12 +25,20 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(MetricsMiddleware)
+
 @app.on_event("startup")
 async def startup_event():
     init_db()
     init_test_data()
+    await startup_auth_client()
     print("✅ Staff Service: Database initialized")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    await shutdown_auth_client()
+    await dispose_db()
+
 @app.get("/")
 async def root():
     return {"service": "staff", "version": "1.0.0", "status": "running"}
@@ -33,6 +47,18 @@ async def root():
 async def health():
     return {"status": "healthy"}
 
+@app.get("/metrics/auth")
+async def auth_metrics():
+    return get_auth_metrics()
+
+@app.get("/metrics")
+async def metrics():
+    return metrics_response()
+
+@app.get("/metrics/db")
+async def db_metrics():
+    return get_db_metrics()
+
 @app.get("/api/staff/students", response_model=List[schemas.Student])
 async def get_students(
     group_name: Optional[str] = None,
@@ -47,14 +73,15 @@ async def get_students(
     current_user: dict = Depends(get_current_user)
 ):
     if student_number:
-        student = crud.get_student_by_number(db, student_number)
+        student = await run_db(crud.get_student_by_number, db, student_number)
         return [student] if student else []
     
     if max_user_id:
-        student = crud.get_student_by_max_id(db, max_user_id)
+        student = await run_db(crud.get_student_by_max_id, db, max_user_id)
         return [student] if student else []
     
-    return crud.get_students(
+    return await run_db(
+        crud.get_students,
         db,
         group_name=group_name,
         status=status,
@@ -70,7 +97,7 @@ async def get_student(
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    student = crud.get_student_by_id(db, student_id)
+    student = await run_db(crud.get_student_by_id, db, student_id)
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
     return student
@@ -82,7 +109,7 @@ async def create_student(
     current_user: dict = Depends(get_current_user)
 ):
     try:
-        return crud.create_student(db, student)
+        return await run_db(crud.create_student, db, student)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -94,7 +121,7 @@ async def update_student(
     current_user: dict = Depends(get_current_user)
 ):
     try:
-        updated = crud.update_student(db, student_id, student)
+        updated = await run_db(crud.update_student, db, student_id, student)
         if not updated:
             raise HTTPException(status_code=404, detail="Student not found")
         return updated
@@ -107,7 +134,7 @@ async def delete_student(
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    if not crud.delete_student(db, student_id):
+    if not await run_db(crud.delete_student, db, student_id):
         raise HTTPException(status_code=404, detail="Student not found")
     return {"message": "Student deleted successfully"}
 
@@ -122,7 +149,7 @@ async def update_student_max_id_by_phone(
     If max_user_id is None, it will be set to None (clearing the value).
     This endpoint does not require authentication for bot first-time login
     """
-    student = crud.update_student_max_id_by_phone(db, data.phone, data.max_user_id)
+    student = await run_db(crud.update_student_max_id_by_phone, db, data.phone, data.max_user_id)
     if not student:
         raise HTTPException(status_code=404, detail="Student not found with this phone number")
     return student
@@ -139,14 +166,15 @@ async def get_teachers(
     current_user: dict = Depends(get_current_user)
 ):
     if teacher_number:
-        teacher = crud.get_teacher_by_number(db, teacher_number)
+        teacher = await run_db(crud.get_teacher_by_number, db, teacher_number)
         return [teacher] if teacher else []
     
     if max_user_id:
-        teacher = crud.get_teacher_by_max_id(db, max_user_id)
+        teacher = await run_db(crud.get_teacher_by_max_id, db, max_user_id)
         return [teacher] if teacher else []
     
-    return crud.get_teachers(
+    return await run_db(
+        crud.get_teachers,
         db,
         department=department,
         status=status,
@@ -160,7 +188,7 @@ async def get_teacher(
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    teacher = crud.get_teacher_by_id(db, teacher_id)
+    teacher = await run_db(crud.get_teacher_by_id, db, teacher_id)
     if not teacher:
         raise HTTPException(status_code=404, detail="Teacher not found")
     return teacher
@@ -172,7 +200,7 @@ async def create_teacher(
     current_user: dict = Depends(get_current_user)
 ):
     try:
-        return crud.create_teacher(db, teacher)
+        return await run_db(crud.create_teacher, db, teacher)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -184,7 +212,7 @@ async def update_teacher(
     current_user: dict = Depends(get_current_user)
 ):
     try:
-        updated = crud.update_teacher(db, teacher_id, teacher)
+        updated = await run_db(crud.update_teacher, db, teacher_id, teacher)
         if not updated:
             raise HTTPException(status_code=404, detail="Teacher not found")
         return updated
@@ -197,7 +225,7 @@ async def delete_teacher(
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    if not crud.delete_teacher(db, teacher_id):
+    if not await run_db(crud.delete_teacher, db, teacher_id):
         raise HTTPException(status_code=404, detail="Teacher not found")
     return {"message": "Teacher deleted successfully"}
 
@@ -212,7 +240,7 @@ async def update_teacher_max_id_by_phone(
     If max_user_id is None, it will be set to None (clearing the value).
     This endpoint does not require authentication for bot first-time login
     """
-    teacher = crud.update_teacher_max_id_by_phone(db, data.phone, data.max_user_id)
+    teacher = await run_db(crud.update_teacher_max_id_by_phone, db, data.phone, data.max_user_id)
     if not teacher:
         raise HTTPException(status_code=404, detail="Teacher not found with this phone number")
     return teacher
@@ -222,7 +250,7 @@ async def get_statistics(
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    return crud.get_staff_statistics(db)
+    return await run_db(crud.get_staff_statistics, db)
 
 @app.get("/api/staff/groups")
 async def get_groups(
@@ -230,7 +258,7 @@ async def get_groups(
     current_user: dict = Depends(get_current_user)
 ):
     """Получить список всех уникальных групп"""
-    groups = crud.get_all_groups(db)
+    groups = await run_db(crud.get_all_groups, db)
     return {"groups": groups}
 
 @app.get("/api/staff/departments")
@@ -239,7 +267,7 @@ async def get_departments(
     current_user: dict = Depends(get_current_user)
 ):
     """Получить список всех уникальных кафедр"""
-    departments = crud.get_all_departments(db)
+    departments = await run_db(crud.get_all_departments, db)
     return {"departments": departments}
 
 if __name__ == "__main__":
@@ -6,9 +6,15 @@ from sqlalchemy.orm import Session
 
 import schemas
 import crud
-from database import get_db, init_db
+from database import get_db, run_db, init_db, get_db_metrics, dispose_db
+from common.instrumentation import MetricsMiddleware, metrics_response
 from init_data import init_test_data
-from auth_dependency import get_current_user
+from auth_dependency import (
+    get_current_user,
+    get_auth_metrics,
+    startup_auth_client,
+    shutdown_auth_client,
+)
 
 app = FastAPI(title="Timetable Service", version="1.0.0")
 
@@ -20,12 +26,20 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(MetricsMiddleware)
+
 @app.on_event("startup")
 async def startup_event():
     init_db()
     init_test_data()
+    await startup_auth_client()
     print("✅ Timetable Service: Database initialized")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    await shutdown_auth_client()
+    await dispose_db()
+
 @app.get("/")
 async def root():
     return {"service": "timetable", "version": "1.0.0", "status": "running"}
@@ -34,6 +48,18 @@ async def root():
 async def health():
     return {"status": "healthy"}
 
+@app.get("/metrics/auth")
+async def auth_metrics():
+    return get_auth_metrics()
+
+@app.get("/metrics")
+async def metrics():
+    return metrics_response()
+
+@app.get("/metrics/db")
+async def db_metrics():
+    return get_db_metrics()
+
 @app.get("/api/timetable/schedule", response_model=List[schemas.Schedule])
 async def get_schedules(
     group_name: Optional[str] = None,
@@ -45,7 +71,8 @@ async def get_schedules(
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    return crud.get_schedules(
+    return await run_db(
+        crud.get_schedules,
         db,
         group_name=group_name,
         day_of_week=day_of_week,
@@ -61,7 +88,7 @@ async def get_schedule(
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    schedule = crud.get_schedule_by_id(db, schedule_id)
+    schedule = await run_db(crud.get_schedule_by_id, db, schedule_id)
     if not schedule:
         raise HTTPException(status_code=404, detail="Schedule not found")
     return schedule
@@ -72,7 +99,7 @@ async def create_schedule(
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    return crud.create_schedule(db, schedule)
+    return await run_db(crud.create_schedule, db, schedule)
 
 @app.put("/api/timetable/schedule/{schedule_id}", response_model=schemas.Schedule)
 async def update_schedule(
@@ -81,7 +108,7 @@ async def update_schedule(
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    updated = crud.update_schedule(db, schedule_id, schedule)
+    updated = await run_db(crud.update_schedule, db, schedule_id, schedule)
     if not updated:
         raise HTTPException(status_code=404, detail="Schedule not found")
     return updated
@@ -92,7 +119,7 @@ async def delete_schedule(
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    if not crud.delete_schedule(db, schedule_id):
+    if not await run_db(crud.delete_schedule, db, schedule_id):
         raise HTTPException(status_code=404, detail="Schedule not found")
     return {"message": "Schedule deleted successfully"}
 
@@ -104,7 +131,7 @@ async def get_templates(
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    return crud.get_templates(db, is_active=is_active, skip=skip, limit=limit)
+    return await run_db(crud.get_templates, db, is_active=is_active, skip=skip, limit=limit)
 
 @app.get("/api/timetable/templates/{template_id}", response_model=schemas.ScheduleTemplate)
 async def get_template(
@@ -112,7 +139,7 @@ async def get_template(
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    template = crud.get_template_by_id(db, template_id)
+    template = await run_db(crud.get_template_by_id, db, template_id)
     if not template:
         raise HTTPException(status_code=404, detail="Template not found")
     return template
@@ -123,7 +150,7 @@ async def create_template(
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    return crud.create_template(db, template)
+    return await run_db(crud.create_template, db, template)
 
 @app.put("/api/timetable/templates/{template_id}", response_model=schemas.ScheduleTemplate)
 async def update_template(
@@ -132,7 +159,7 @@ async def update_template(
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    updated = crud.update_template(db, template_id, template)
+    updated = await run_db(crud.update_template, db, template_id, template)
     if not updated:
         raise HTTPException(status_code=404, detail="Template not found")
     return updated
@@ -143,7 +170,7 @@ async def delete_template(
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    if not crud.delete_template(db, template_id):
+    if not await run_db(crud.delete_template, db, template_id):
         raise HTTPException(status_code=404, detail="Template not found")
     return {"message": "Template deleted successfully"}
 
@@ -156,7 +183,8 @@ async def get_changes(
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    return crud.get_changes(
+    return await run_db(
+        crud.get_changes,
         db,
         schedule_id=schedule_id,
         date_from=date_from,
@@ -170,7 +198,7 @@ async def get_change(
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    change = crud.get_change_by_id(db, change_id)
+    change = await run_db(crud.get_change_by_id, db, change_id)
     if not change:
         raise HTTPException(status_code=404, detail="Change not found")
     return change
@@ -181,7 +209,7 @@ async def create_change(
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    return crud.create_change(db, change)
+    return await run_db(crud.create_change, db, change)
 
 @app.put("/api/timetable/changes/{change_id}", response_model=schemas.ScheduleChange)
 async def update_change(
@@ -190,7 +218,7 @@ async def update_change(
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    updated = crud.update_change(db, change_id, change)
+    updated = await run_db(crud.update_change, db, change_id, change)
     if not updated:
         raise HTTPException(status_code=404, detail="Change not found")
     return updated
@@ -201,7 +229,7 @@ async def delete_change(
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    if not crud.delete_change(db, change_id):
+    if not await run_db(crud.delete_change, db, change_id):
         raise HTTPException(status_code=404, detail="Change not found")
     return {"message": "Change deleted successfully"}
 
@@ -215,7 +243,7 @@ async def get_groups(
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    return crud.get_groups(db, is_active=is_active, skip=skip, limit=limit)
+    return await run_db(crud.get_groups, db, is_active=is_active, skip=skip, limit=limit)
 
 @app.get("/api/timetable/groups/{group_id}", response_model=schemas.Group)
 async def get_group(
@@ -223,7 +251,7 @@ async def get_group(
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    group = crud.get_group_by_id(db, group_id)
+    group = await run_db(crud.get_group_by_id, db, group_id)
     if not group:
         raise HTTPException(status_code=404, detail="Group not found")
     return group
@@ -235,10 +263,10 @@ async def create_group(
     current_user: dict = Depends(get_current_user)
 ):
     # Проверяем, не существует ли уже группа с таким именем
-    existing_group = crud.get_group_by_name(db, group.name)
+    existing_group = await run_db(crud.get_group_by_name, db, group.name)
     if existing_group:
         raise HTTPException(status_code=400, detail="Group with this name already exists")
-    return crud.create_group(db, group)
+    return await run_db(crud.create_group, db, group)
 
 @app.put("/api/timetable/groups/{group_id}", response_model=schemas.Group)
 async def update_group(
@@ -249,11 +277,11 @@ async def update_group(
 ):
     # Если обновляется имя, проверяем уникальность
     if group.name:
-        existing_group = crud.get_group_by_name(db, group.name)
+        existing_group = await run_db(crud.get_group_by_name, db, group.name)
         if existing_group and existing_group.id != group_id:
             raise HTTPException(status_code=400, detail="Group with this name already exists")
     
-    updated = crud.update_group(db, group_id, group)
+    updated = await run_db(crud.update_group, db, group_id, group)
     if not updated:
         raise HTTPException(status_code=404, detail="Group not found")
     return updated
@@ -264,7 +292,7 @@ async def delete_group(
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    if not crud.delete_group(db, group_id):
+    if not await run_db(crud.delete_group, db, group_id):
         raise HTTPException(status_code=404, detail="Group not found")
     return {"message": "Group deleted successfully"}
 
@@ -278,7 +306,7 @@ async def get_subjects(
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    return crud.get_subjects(db, is_active=is_active, skip=skip, limit=limit)
+    return await run_db(crud.get_subjects, db, is_active=is_active, skip=skip, limit=limit)
 
 @app.get("/api/timetable/subjects/{subject_id}", response_model=schemas.Subject)
 async def get_subject(
@@ -286,7 +314,7 @@ async def get_subject(
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    subject = crud.get_subject_by_id(db, subject_id)
+    subject = await run_db(crud.get_subject_by_id, db, subject_id)
     if not subject:
         raise HTTPException(status_code=404, detail="Subject not found")
     return subject
@@ -298,10 +326,10 @@ async def create_subject(
     current_user: dict = Depends(get_current_user)
 ):
     # Проверяем, не существует ли уже предмет с таким именем
-    existing_subject = crud.get_subject_by_name(db, subject.name)
+    existing_subject = await run_db(crud.get_subject_by_name, db, subject.name)
     if existing_subject:
         raise HTTPException(status_code=400, detail="Subject with this name already exists")
-    return crud.create_subject(db, subject)
+    return await run_db(crud.create_subject, db, subject)
 
 @app.put("/api/timetable/subjects/{subject_id}", response_model=schemas.Subject)
 async def update_subject(
@@ -312,11 +340,11 @@ async def update_subject(
 ):
     # Если обновляется имя, проверяем уникальность
     if subject.name:
-        existing_subject = crud.get_subject_by_name(db, subject.name)
+        existing_subject = await run_db(crud.get_subject_by_name, db, subject.name)
         if existing_subject and existing_subject.id != subject_id:
             raise HTTPException(status_code=400, detail="Subject with this name already exists")
     
-    updated = crud.update_subject(db, subject_id, subject)
+    updated = await run_db(crud.update_subject, db, subject_id, subject)
     if not updated:
         raise HTTPException(status_code=404, detail="Subject not found")
     return updated
@@ -327,7 +355,7 @@ async def delete_subject(
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    if not crud.delete_subject(db, subject_id):
+    if not await run_db(crud.delete_subject, db, subject_id):
         raise HTTPException(status_code=404, detail="Subject not found")
     return {"message": "Subject deleted successfully"}
 